@@ -0,0 +1,15 @@
+"""
+===========================================
+Cart App Config
+===========================================
+"""
+from django.apps import AppConfig
+
+
+class CartConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.cart'
+    verbose_name = 'ตะกร้าสินค้า'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -10,6 +10,20 @@ from django.db import models
 from apps.products.models import Product
 
 
+class CartQuerySet(models.QuerySet):
+    def for_display(self):
+        """
+        โหลดรายการในตะกร้าพร้อมสินค้า (หมวดหมู่, ผู้ขาย) ใน query เดียว
+        ยอดรวม (total_items / total_price) คำนวณจากรายการที่ prefetch ไว้ จำนวน query คงที่ทุกขนาดตะกร้า
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                'items',
+                queryset=CartItem.objects.select_related('product__category', 'product__seller').order_by('pk'),
+            )
+        )
+
+
 class Cart(models.Model):
     """ตะกร้าสินค้าของผู้ใช้"""
     
@@ -22,6 +36,8 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='สร้างเมื่อ')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='อัพเดทเมื่อ')
     
+    objects = CartQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'ตะกร้าสินค้า'
         verbose_name_plural = 'ตะกร้าสินค้า'
@@ -29,6 +45,7 @@ class Cart(models.Model):
     def __str__(self):
         return f"Cart - {self.user.email}"
     
+    # ยอดรวมคำนวณจาก items.all() ถ้าโหลดด้วย for_display จะใช้รายการที่ prefetch ไว้ ไม่ query เพิ่ม
     @property
     def total_items(self):
         return sum(item.quantity for item in self.items.all())
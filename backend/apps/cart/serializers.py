@@ -27,6 +27,16 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'product_id', 'quantity', 'total']
 
 
+class CartLineSerializer(serializers.ModelSerializer):
+    """Serializer รายการในตะกร้าแบบย่อ (delta response ไม่ส่งข้อมูลสินค้าซ้ำ)"""
+    
+    total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    
+    class Meta:
+        model = CartItem
+        fields = ['id', 'product_id', 'quantity', 'total']
+
+
 class CartSerializer(serializers.ModelSerializer):
     """Serializer สำหรับตะกร้าสินค้า"""
     
@@ -47,25 +57,31 @@ class SyncCartSerializer(serializers.Serializer):
     )
     
     def validate_items(self, items):
-        validated_items = []
+        """
+        คืนค่า {product: quantity} ของสินค้าที่ยังขายอยู่ (โหลดสินค้าทั้งหมดใน query เดียว)
+        ข้ามสินค้าที่ไม่พบ/ปิดขาย ปรับ quantity ให้ไม่เกิน stock และถ้าสินค้าซ้ำใช้รายการหลังสุด
+        """
+        requested = {}
         for item in items:
-            product_id = item.get('product_id')
-            quantity = item.get('quantity', 1)
-            
-            if not product_id:
+            try:
+                product_id = int(item.get('product_id') or 0)
+                quantity = int(item.get('quantity', 1))
+            except (TypeError, ValueError):
                 continue
             
-            try:
-                product = Product.objects.get(id=product_id, is_active=True)
-                # ปรับ quantity ให้ไม่เกิน stock
-                quantity = min(quantity, product.stock)
-                if quantity > 0:
-                    validated_items.append({
-                        'product': product,
-                        'quantity': quantity
-                    })
-            except Product.DoesNotExist:
+            if product_id:
+                requested[product_id] = quantity
+        
+        products = Product.objects.filter(is_active=True).in_bulk(list(requested))
+        validated_items = {}
+        for product_id, quantity in requested.items():
+            product = products.get(product_id)
+            if product is None:
                 continue
+            # ปรับ quantity ให้ไม่เกิน stock
+            quantity = min(quantity, product.stock)
+            if quantity > 0:
+                validated_items[product] = quantity
         
         return validated_items
 
@@ -76,19 +92,16 @@ class AddToCartSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1, default=1)
     
-    def validate_product_id(self, value):
-        try:
-            product = Product.objects.get(id=value, is_active=True)
-        except Product.DoesNotExist:
-            raise serializers.ValidationError('สินค้าไม่พบหรือไม่พร้อมขาย')
-        return value
-    
     def validate(self, attrs):
-        product = Product.objects.get(id=attrs['product_id'])
+        # โหลดสินค้าครั้งเดียว view ใช้ต่อจาก attrs['product']
+        product = Product.objects.filter(id=attrs['product_id'], is_active=True).first()
+        if product is None:
+            raise serializers.ValidationError({'product_id': 'สินค้าไม่พบหรือไม่พร้อมขาย'})
         if product.stock < attrs['quantity']:
             raise serializers.ValidationError({
                 'quantity': f'สินค้ามีไม่พอ (เหลือ {product.stock} ชิ้น)'
             })
+        attrs['product'] = product
         return attrs
 
 
@@ -0,0 +1,22 @@
+"""
+===========================================
+Cart App - Signals
+===========================================
+"""
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.products.models import Product
+
+from .models import CartItem
+from .summary import invalidate_cart_summaries
+
+
+@receiver(post_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def invalidate_product_cart_summaries(sender, instance, created=False, update_fields=None, **kwargs):
+    """สินค้าถูกแก้ไขหรือลบ: ล้างสรุปตะกร้าของผู้ใช้ที่มีสินค้านั้น (ยอดรวมคิดจากราคาปัจจุบัน)"""
+    if created or (update_fields is not None and not {'price', 'is_active'} & set(update_fields)):
+        return
+    user_ids = CartItem.objects.filter(product=instance).values_list('cart__user_id', flat=True)
+    invalidate_cart_summaries(list(user_ids))
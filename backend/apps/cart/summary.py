@@ -0,0 +1,71 @@
+"""
+===========================================
+Cart App - Cart Summary
+===========================================
+สรุปตะกร้า (จำนวนชิ้น / ยอดรวม) สำหรับ badge ตะกร้าที่ header ทุกหน้า
+
+- GET /api/cart/summary/ อ่านจาก cache ต่อผู้ใช้ ไม่แตะฐานข้อมูลเมื่อ cache hit
+- ทุกการแก้ไขตะกร้าคำนวณสรุปใหม่ด้วย aggregate query เดียวแล้วเขียนทับ cache
+  (ค่าเดียวกันใช้ตอบใน delta response ของการแก้ไขนั้น)
+- สินค้าถูกแก้ไข (ราคาเปลี่ยน / ปิดขาย) ลบสรุปของผู้ใช้ที่มีสินค้านั้นในตะกร้า (apps/cart/signals.py)
+
+ตั้งค่าใน settings.CART_SUMMARY:
+    TIMEOUT     วินาทีที่เก็บสรุปของแต่ละผู้ใช้
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import CartItem
+
+KEY_PREFIX = 'cart_summary'
+
+
+def get_cart_summary_settings():
+    config = {
+        'TIMEOUT': 60 * 60,
+    }
+    config.update(getattr(settings, 'CART_SUMMARY', {}))
+    return config
+
+
+def summary_key(user_id):
+    return f'{KEY_PREFIX}:{user_id}'
+
+
+def compute_cart_summary(user_id):
+    """สรุปตะกร้าจากฐานข้อมูลใน query เดียว"""
+    totals = CartItem.objects.filter(cart__user_id=user_id).aggregate(
+        lines=Count('pk'),
+        total_items=Sum('quantity'),
+        total_price=Sum(F('quantity') * F('product__price')),
+    )
+    return {
+        'lines': totals['lines'],
+        'total_items': totals['total_items'] or 0,
+        'total_price': str((totals['total_price'] or Decimal('0')).quantize(Decimal('0.01'))),
+    }
+
+
+def get_cart_summary(user_id):
+    summary = cache.get(summary_key(user_id))
+    if summary is None:
+        summary = refresh_cart_summary(user_id)
+    return summary
+
+
+def refresh_cart_summary(user_id):
+    """คำนวณสรุปใหม่แล้วเขียนทับ cache (เรียกหลังแก้ไขตะกร้า) คืนค่าสรุปใหม่"""
+    summary = compute_cart_summary(user_id)
+    cache.set(summary_key(user_id), summary, get_cart_summary_settings()['TIMEOUT'])
+    return summary
+
+
+def invalidate_cart_summaries(user_ids):
+    """ลบสรุปของผู้ใช้หลัง commit (คำนวณใหม่เมื่อมีการอ่านครั้งถัดไป)"""
+    keys = [summary_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,47 @@
+"""
+===========================================
+Cart App - Cart Sync
+===========================================
+sync ตะกร้าบน server ให้ตรงกับตะกร้าใน localStorage (เรียกทุกครั้งที่ login / เปิดหน้าใหม่)
+
+เทียบกับรายการเดิมแล้วแก้เฉพาะส่วนที่ต่าง:
+    - สินค้าใหม่      -> bulk_create ครั้งเดียว
+    - จำนวนเปลี่ยน    -> bulk_update ครั้งเดียว
+    - สินค้าที่ไม่มีแล้ว -> DELETE ครั้งเดียว
+ตะกร้าที่ไม่เปลี่ยนใช้แค่ query อ่านรายการเดิม ไม่เขียนอะไรเลย (id ของรายการเดิมไม่เปลี่ยน)
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CartItem
+
+
+def sync_cart_items(cart, quantities):
+    """
+    ทำให้ตะกร้ามีสินค้าตาม quantities ({product: quantity}) พอดี
+    คืนค่า (จำนวนที่เพิ่ม, จำนวนที่แก้, จำนวนที่ลบ)
+    """
+    with transaction.atomic():
+        existing = {item.product_id: item for item in CartItem.objects.filter(cart=cart)}
+
+        to_create = []
+        to_update = []
+        now = timezone.now()
+        for product, quantity in quantities.items():
+            item = existing.pop(product.pk, None)
+            if item is None:
+                to_create.append(CartItem(cart=cart, product=product, quantity=quantity))
+            elif item.quantity != quantity:
+                item.quantity = quantity
+                # bulk_update ไม่อัพเดท auto_now ให้
+                item.updated_at = now
+                to_update.append(item)
+
+        if existing:
+            CartItem.objects.filter(pk__in=[item.pk for item in existing.values()]).delete()
+        if to_create:
+            CartItem.objects.bulk_create(to_create)
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ['quantity', 'updated_at'])
+
+    return len(to_create), len(to_update), len(existing)
@@ -0,0 +1,226 @@
+"""
+===========================================
+Cart App - Tests
+===========================================
+"""
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.products.models import Category, Product
+
+from .models import Cart, CartItem
+from .serializers import SyncCartSerializer
+from .sync import sync_cart_items
+
+User = get_user_model()
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def buyer_user():
+    return User.objects.create_user(
+        email='buyer@example.com',
+        username='buyer',
+        password='buyerpass123',
+        role='buyer'
+    )
+
+
+@pytest.fixture
+def seller_user():
+    return User.objects.create_user(
+        email='seller@example.com',
+        username='seller',
+        password='sellerpass123',
+        role='seller',
+        shop_name='Test Shop'
+    )
+
+
+@pytest.fixture
+def products(seller_user):
+    category = Category.objects.create(name='Test', slug='test')
+    return [
+        Product.objects.create(
+            seller=seller_user,
+            category=category,
+            name=f'Product {i}',
+            slug=f'product-{i}',
+            price=100 + i,
+            stock=10
+        )
+        for i in range(4)
+    ]
+
+
+@pytest.mark.django_db
+class TestSyncCart:
+    """ทดสอบ sync ตะกร้าจาก localStorage"""
+    
+    def sync(self, api_client, items):
+        return api_client.post(reverse('cart-sync'), {'items': items}, format='json')
+    
+    def test_sync_applies_diff(self, api_client, buyer_user, products):
+        """ทดสอบ sync แก้เฉพาะรายการที่ต่าง รายการเดิมคง id เดิม"""
+        api_client.force_authenticate(user=buyer_user)
+        cart = Cart.objects.create(user=buyer_user)
+        kept = CartItem.objects.create(cart=cart, product=products[0], quantity=1)
+        changed = CartItem.objects.create(cart=cart, product=products[1], quantity=1)
+        CartItem.objects.create(cart=cart, product=products[2], quantity=1)
+    
+        response = self.sync(api_client, [
+            {'product_id': products[0].id, 'quantity': 1},
+            {'product_id': products[1].id, 'quantity': 3},
+            {'product_id': products[3].id, 'quantity': 50},
+            {'product_id': 99999, 'quantity': 1},
+        ])
+    
+        assert response.status_code == status.HTTP_200_OK
+        items = {item.product_id: item for item in cart.items.all()}
+        assert set(items) == {products[0].id, products[1].id, products[3].id}
+        assert items[products[0].id].pk == kept.pk
+        assert items[products[1].id].pk == changed.pk
+        assert items[products[1].id].quantity == 3
+        # จำนวนเกิน stock ถูกปรับลง
+        assert items[products[3].id].quantity == 10
+    
+    def test_unchanged_cart_does_not_write(self, buyer_user, products):
+        """ทดสอบตะกร้าที่ไม่เปลี่ยนใช้ query อ่านอย่างเดียว"""
+        cart = Cart.objects.create(user=buyer_user)
+        for product in products:
+            CartItem.objects.create(cart=cart, product=product, quantity=2)
+    
+        with CaptureQueriesContext(connection) as queries:
+            result = sync_cart_items(cart, {product: 2 for product in products})
+    
+        assert result == (0, 0, 0)
+        assert not [query for query in queries if not query['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))]
+    
+    def test_validation_loads_products_once(self, products):
+        """ทดสอบตรวจสินค้าทั้งหมดด้วย query เดียว"""
+        serializer = SyncCartSerializer(data={
+            'items': [{'product_id': product.id, 'quantity': 2} for product in products]
+        })
+    
+        with CaptureQueriesContext(connection) as queries:
+            assert serializer.is_valid()
+    
+        assert len(queries) == 1
+        assert serializer.validated_data['items'] == {product: 2 for product in products}
+    
+    def test_changed_quantities_single_update(self, buyer_user, products):
+        """ทดสอบแก้จำนวนหลายรายการด้วย UPDATE เดียว"""
+        cart = Cart.objects.create(user=buyer_user)
+        for product in products:
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+    
+        with CaptureQueriesContext(connection) as queries:
+            result = sync_cart_items(cart, {product: 3 for product in products[:3]})
+    
+        assert result == (0, 3, 1)
+        writes = [
+            query['sql'].split()[0] for query in queries if query['sql'].startswith(('UPDATE', 'DELETE', 'INSERT'))
+        ]
+        assert writes == ['DELETE', 'UPDATE']
+
+
+@pytest.mark.django_db
+class TestCartQueries:
+    """ทดสอบจำนวน query ของการแสดงตะกร้า"""
+    
+    def cart_queries(self, api_client):
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(reverse('cart'))
+        return len(queries), response
+    
+    def test_constant_queries(self, api_client, buyer_user, products):
+        """ทดสอบตะกร้า 1 กับ 4 รายการใช้ query เท่ากัน พร้อมยอดรวมที่ถูกต้อง"""
+        api_client.force_authenticate(user=buyer_user)
+        cart = Cart.objects.create(user=buyer_user)
+        CartItem.objects.create(cart=cart, product=products[0], quantity=2)
+        single, _ = self.cart_queries(api_client)
+        
+        for product in products[1:]:
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+        many, response = self.cart_queries(api_client)
+        
+        assert many == single
+        assert response.data['total_items'] == 5
+        assert float(response.data['total_price']) == 2 * 100 + 101 + 102 + 103
+        assert response.data['items'][0]['product']['seller_name'] == 'Test Shop'
+    
+    def test_mutation_response_constant_queries(self, api_client, buyer_user, products):
+        """ทดสอบ response ของการแก้ไขตะกร้าใช้ query คงที่"""
+        api_client.force_authenticate(user=buyer_user)
+        cart = Cart.objects.create(user=buyer_user)
+        item = CartItem.objects.create(cart=cart, product=products[0], quantity=1)
+        url = reverse('cart-item', args=[item.pk])
+        
+        with CaptureQueriesContext(connection) as single:
+            api_client.put(url, {'quantity': 2}, format='json')
+        for product in products[1:]:
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+        with CaptureQueriesContext(connection) as many:
+            response = api_client.put(url, {'quantity': 3}, format='json')
+        
+        assert len(many) == len(single)
+        assert response.data['cart']['total_items'] == 6
+
+
+@pytest.mark.django_db
+class TestCartSummary:
+    """ทดสอบสรุปตะกร้าและ delta response"""
+    
+    def test_summary_served_from_cache(self, api_client, buyer_user, products):
+        """ทดสอบสรุปตะกร้าอัพเดทตามการแก้ไข และอ่านซ้ำไม่ query ตะกร้า"""
+        api_client.force_authenticate(user=buyer_user)
+        api_client.post(reverse('cart-add'), {'product_id': products[0].id, 'quantity': 2}, format='json')
+        api_client.post(reverse('cart-add'), {'product_id': products[1].id, 'quantity': 1}, format='json')
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(reverse('cart-summary'))
+        
+        assert response.data == {'lines': 2, 'total_items': 3, 'total_price': '301.00'}
+        assert not [query for query in queries if 'cart' in query['sql']]
+    
+    def test_delta_response(self, api_client, buyer_user, products):
+        """ทดสอบ ?delta=true ส่งเฉพาะรายการที่เปลี่ยนและสรุปใหม่"""
+        api_client.force_authenticate(user=buyer_user)
+        added = api_client.post(
+            reverse('cart-add') + '?delta=true', {'product_id': products[0].id, 'quantity': 1}, format='json'
+        )
+        item_id = added.data['item']['id']
+        
+        updated = api_client.put(
+            reverse('cart-item', args=[item_id]) + '?delta=true', {'quantity': 4}, format='json'
+        )
+        removed = api_client.delete(reverse('cart-item', args=[item_id]) + '?delta=true')
+        
+        assert 'cart' not in added.data
+        assert updated.data['item'] == {'id': item_id, 'product_id': products[0].id, 'quantity': 4, 'total': '400.00'}
+        assert updated.data['summary']['total_items'] == 4
+        assert removed.data['item'] is None
+        assert removed.data['removed_item_id'] == item_id
+        assert removed.data['summary'] == {'lines': 0, 'total_items': 0, 'total_price': '0.00'}
+    
+    def test_price_change_invalidates_summary(
+        self, api_client, buyer_user, products, django_capture_on_commit_callbacks
+    ):
+        """ทดสอบราคาสินค้าเปลี่ยนแล้วสรุปตะกร้าคำนวณใหม่"""
+        api_client.force_authenticate(user=buyer_user)
+        api_client.post(reverse('cart-add'), {'product_id': products[0].id, 'quantity': 2}, format='json')
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            products[0].price = 150
+            products[0].save()
+        
+        assert api_client.get(reverse('cart-summary')).data['total_price'] == '300.00'
@@ -5,10 +5,11 @@ Cart App - URLs
 """
 from django.urls import path
 
-from .views import AddToCartView, CartItemView, CartView, SyncCartView, ClearCartView
+from .views import AddToCartView, CartItemView, CartSummaryView, CartView, SyncCartView, ClearCartView
 
 urlpatterns = [
     path('', CartView.as_view(), name='cart'),
+    path('summary/', CartSummaryView.as_view(), name='cart-summary'),
     path('sync/', SyncCartView.as_view(), name='cart-sync'),
     path('add/', AddToCartView.as_view(), name='cart-add'),
     path('clear/', ClearCartView.as_view(), name='cart-clear'),  # เพิ่มบรรทัดนี้
@@ -5,37 +5,73 @@ from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from apps.products.models import Product
-
 from .models import Cart, CartItem
 from .serializers import (
     AddToCartSerializer,
+    CartLineSerializer,
     CartSerializer,
     SyncCartSerializer,
     UpdateCartItemSerializer,
 )
+from .summary import get_cart_summary, refresh_cart_summary
+from .sync import sync_cart_items
+
+
+def serialize_cart(request, cart_id):
+    """ข้อมูลตะกร้าสำหรับ response (2 query: ตะกร้า + รายการพร้อมสินค้า ไม่ขึ้นกับจำนวนรายการ)"""
+    cart = Cart.objects.for_display().get(pk=cart_id)
+    return CartSerializer(cart, context={'request': request}).data
+
+
+def mutation_response(request, message, cart_id, item=None, removed_item_id=None):
+    """
+    response ของการแก้ไขตะกร้า (อัพเดทสรุปตะกร้าใน cache ทุกครั้ง)
+    ?delta=true: ส่งเฉพาะรายการที่เปลี่ยนกับสรุปใหม่ แทนตะกร้าทั้งใบ
+    """
+    summary = refresh_cart_summary(request.user.pk)
+    if request.query_params.get('delta', '').lower() in ('true', '1', 'yes'):
+        return Response({
+            'message': message,
+            'item': CartLineSerializer(item).data if item is not None else None,
+            'removed_item_id': removed_item_id,
+            'summary': summary,
+        })
+    return Response({
+        'message': message,
+        'cart': serialize_cart(request, cart_id)
+    })
 
 
 class CartView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
+        cart, _ = Cart.objects.for_display().get_or_create(user=request.user)
         serializer = CartSerializer(cart, context={'request': request})
         return Response(serializer.data)
 
     def delete(self, request):
         cart, _ = Cart.objects.get_or_create(user=request.user)
         cart.items.all().delete()
+        refresh_cart_summary(request.user.pk)
         return Response({'message': 'cleared'})
 
 
+class CartSummaryView(APIView):
+    """จำนวนชิ้นและยอดรวมของตะกร้า (สำหรับ badge ที่ header อ่านจาก cache)"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(get_cart_summary(request.user.pk))
+
+
 class ClearCartView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def delete(self, request):
         cart, _ = Cart.objects.get_or_create(user=request.user)
         cart.items.all().delete()
+        refresh_cart_summary(request.user.pk)
         return Response({'message': 'cleared'}, status=status.HTTP_200_OK)
 
     def post(self, request):
@@ -50,18 +86,13 @@ class SyncCartView(APIView):
         serializer.is_valid(raise_exception=True)
 
         cart, _ = Cart.objects.get_or_create(user=request.user)
-        cart.items.all().delete()
-
-        for item_data in serializer.validated_data['items']:
-            CartItem.objects.create(
-                cart=cart,
-                product=item_data['product'],
-                quantity=item_data['quantity']
-            )
+        # แก้เฉพาะรายการที่ต่างจากเดิม (ตะกร้าที่ไม่เปลี่ยนไม่มีการเขียน)
+        sync_cart_items(cart, serializer.validated_data['items'])
+        refresh_cart_summary(request.user.pk)
 
         return Response({
             'message': 'synced',
-            'cart': CartSerializer(cart, context={'request': request}).data
+            'cart': serialize_cart(request, cart.pk)
         })
 
 
@@ -73,7 +104,7 @@ class AddToCartView(APIView):
         serializer.is_valid(raise_exception=True)
 
         cart, _ = Cart.objects.get_or_create(user=request.user)
-        product = Product.objects.get(id=serializer.validated_data['product_id'])
+        product = serializer.validated_data['product']
         quantity = serializer.validated_data['quantity']
 
         cart_item, created = CartItem.objects.get_or_create(
@@ -91,10 +122,7 @@ class AddToCartView(APIView):
             cart_item.quantity = new_quantity
             cart_item.save()
 
-        return Response({
-            'message': 'added',
-            'cart': CartSerializer(cart, context={'request': request}).data
-        })
+        return mutation_response(request, 'added', cart.pk, item=cart_item)
 
 
 class CartItemView(APIView):
@@ -102,7 +130,7 @@ class CartItemView(APIView):
 
     def get_cart_item(self, request, item_id):
         try:
-            return CartItem.objects.get(
+            return CartItem.objects.select_related('product').get(
                 id=item_id,
                 cart__user=request.user
             )
@@ -122,8 +150,10 @@ class CartItemView(APIView):
 
         quantity = serializer.validated_data['quantity']
 
+        item_id = cart_item.pk
         if quantity == 0:
             cart_item.delete()
+            changed, removed_item_id = None, item_id
         else:
             if quantity > cart_item.product.stock:
                 return Response({
@@ -131,12 +161,11 @@ class CartItemView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
             cart_item.quantity = quantity
             cart_item.save()
+            changed, removed_item_id = cart_item, None
 
-        cart = Cart.objects.get(user=request.user)
-        return Response({
-            'message': 'updated',
-            'cart': CartSerializer(cart, context={'request': request}).data
-        })
+        return mutation_response(
+            request, 'updated', cart_item.cart_id, item=changed, removed_item_id=removed_item_id
+        )
 
     def delete(self, request, item_id):
         cart_item = self.get_cart_item(request, item_id)
@@ -146,10 +175,7 @@ class CartItemView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        item_id = cart_item.pk
         cart_item.delete()
-        cart = Cart.objects.get(user=request.user)
 
-        return Response({
-            'message': 'deleted',
-            'cart': CartSerializer(cart, context={'request': request}).data
-        })
\ No newline at end of file
+        return mutation_response(request, 'deleted', cart_item.cart_id, removed_item_id=item_id)
\ No newline at end of file
@@ -5,14 +5,17 @@ Orders App - Admin
 """
 from django.contrib import admin
 
-from .models import Order, OrderItem
+from .fulfilment import sync_seller_orders
+from .models import CheckoutTicket, InvoiceExport, Order, OrderItem, SellerOrder, StockReservation
 
 
 class OrderItemInline(admin.TabularInline):
     """Inline สำหรับรายการสินค้าในคำสั่งซื้อ"""
     model = OrderItem
     extra = 0
-    readonly_fields = ['product', 'seller', 'product_name', 'product_price', 'quantity', 'total']
+    readonly_fields = [
+        'product', 'seller', 'product_name', 'product_price', 'product_slug', 'product_image_url', 'quantity', 'total'
+    ]
 
 
 @admin.register(Order)
@@ -30,6 +33,11 @@ class OrderAdmin(admin.ModelAdmin):
     
     readonly_fields = ['order_number', 'subtotal', 'total']
     
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'status' in form.changed_data:
+            sync_seller_orders([obj.pk], obj.status)
+    
     fieldsets = (
         ('ข้อมูลคำสั่งซื้อ', {
             'fields': ('order_number', 'buyer', 'status')
@@ -56,4 +64,47 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'product_name', 'seller', 'quantity', 'product_price', 'total']
     list_filter = ['order__status', 'seller']
     search_fields = ['order__order_number', 'product_name', 'seller__email']
-    raw_id_fields = ['order', 'product', 'seller']
\ No newline at end of file
+    raw_id_fields = ['order', 'product', 'seller']
+
+
+@admin.register(SellerOrder)
+class SellerOrderAdmin(admin.ModelAdmin):
+    """Admin สำหรับคำสั่งซื้อแยกตามผู้ขาย"""
+    
+    list_display = ['order', 'seller', 'subtotal', 'items_count', 'status', 'created_at']
+    list_filter = ['status']
+    search_fields = ['order__order_number', 'seller__email', 'seller__shop_name']
+    raw_id_fields = ['order', 'seller']
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    """Admin สำหรับการจองสต็อก (ดูอย่างเดียว สถานะเปลี่ยนผ่าน apps/orders/reservations.py)"""
+    
+    list_display = ['token', 'buyer', 'product', 'quantity', 'status', 'order', 'expires_at']
+    list_filter = ['status']
+    search_fields = ['token', 'buyer__email', 'order__order_number']
+    raw_id_fields = ['buyer', 'product', 'order']
+    readonly_fields = ['token', 'buyer', 'product', 'order', 'quantity', 'status', 'expires_at', 'created_at']
+
+
+@admin.register(CheckoutTicket)
+class CheckoutTicketAdmin(admin.ModelAdmin):
+    """Admin สำหรับคิว checkout ของสินค้า sale_mode"""
+    
+    list_display = ['id', 'buyer', 'product', 'status', 'order', 'created_at', 'processed_at']
+    list_filter = ['status']
+    search_fields = ['id', 'buyer__email', 'order__order_number']
+    raw_id_fields = ['buyer', 'product', 'order']
+    readonly_fields = ['id', 'payload', 'errors', 'created_at', 'processed_at']
+
+
+@admin.register(InvoiceExport)
+class InvoiceExportAdmin(admin.ModelAdmin):
+    """Admin สำหรับงาน export ใบสั่งซื้อ"""
+    
+    list_display = ['id', 'requested_by', 'status', 'done', 'total', 'created_at', 'finished_at']
+    list_filter = ['status']
+    search_fields = ['id', 'requested_by__email']
+    raw_id_fields = ['requested_by']
+    readonly_fields = ['id', 'order_ids', 'total', 'done', 'file_path', 'error', 'created_at', 'finished_at']
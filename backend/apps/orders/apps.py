@@ -0,0 +1,15 @@
+"""
+===========================================
+Orders App Config
+===========================================
+"""
+from django.apps import AppConfig
+
+
+class OrdersConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.orders'
+    verbose_name = 'คำสั่งซื้อ'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,206 @@
+"""
+===========================================
+Orders App - Checkout Queue
+===========================================
+คิว checkout สำหรับสินค้าที่เปิด sale_mode (สินค้าตัวเดียวที่คนแห่มาซื้อพร้อมกัน)
+
+ปกติทุก POST /api/orders/ แย่งล็อกแถว Product เดียวกัน และ gunicorn worker ค้างรอล็อกจนเต็ม
+เมื่อตะกร้ามีสินค้า sale_mode:
+    1. view ตรวจข้อมูลแล้วสร้าง CheckoutTicket ตอบ 202 พร้อม ticket ทันที (ไม่แตะแถว Product)
+    2. Celery task process_checkout_queue (queue 'checkout' แยกจากงานอื่น) ดึง ticket ของสินค้านั้นทีละชุด
+       ล็อกทุกสินค้าในตะกร้าของชุดครั้งเดียว (เรียงตาม id) ตัดสต็อกรวมด้วย UPDATE เดียว
+       แล้วสร้าง Order ให้ทุก ticket ตามลำดับที่เข้าคิว
+       (แต่ละ ticket อยู่ใน savepoint ของตัวเอง ticket ที่สต็อกไม่พอไม่กระทบ ticket อื่น)
+    ระหว่าง sale จองสต็อกล่วงหน้า (POST /api/orders/reserve/) สินค้านั้นไม่ได้ ทุก checkout จึงผ่านคิว
+    3. ผลลัพธ์ดูได้ที่ GET /api/orders/tickets/<id>/ หรือรอรับผ่าน WebSocket ws/orders/tickets/<id>/
+
+สินค้าหนึ่งตัวมี worker ประมวลผลคิวได้ทีละตัว (lock ใน cache) ticket ที่ค้างเพราะ task หาย
+จะถูกปลุกโดย drain_checkout_queues ใน Celery beat
+
+ตั้งค่าใน settings.CHECKOUT_QUEUE:
+    ENABLED        ปิดเพื่อให้ทุก checkout ทำงานแบบเดิมแม้สินค้าเปิด sale_mode
+    BATCH_SIZE     จำนวน ticket ต่อ transaction
+    LOCK_TIMEOUT   วินาทีที่ถือ lock ของคิวสินค้า
+    STALE_AFTER    วินาทีที่ ticket รอคิวก่อน beat จะสั่งประมวลผลซ้ำ
+"""
+import logging
+from datetime import timedelta
+from types import SimpleNamespace
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from apps.products.models import Product
+
+from .models import CheckoutTicket, StockReservation
+from .reservations import merge_quantities, release_reservations, reserve_many
+from .stock import StockError
+
+logger = logging.getLogger(__name__)
+
+
+def get_checkout_queue_settings():
+    config = {
+        'ENABLED': True,
+        'BATCH_SIZE': 50,
+        'LOCK_TIMEOUT': 60,
+        'STALE_AFTER': 10,
+    }
+    config.update(getattr(settings, 'CHECKOUT_QUEUE', {}))
+    return config
+
+
+def find_sale_product(product_ids):
+    """id ของสินค้า sale_mode ตัวแรกในตะกร้า (None = checkout ตามปกติ)"""
+    if not get_checkout_queue_settings()['ENABLED']:
+        return None
+    return (
+        Product.objects.filter(pk__in=product_ids, sale_mode=True, is_active=True)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+        .first()
+    )
+
+
+def enqueue_checkout(buyer, product_id, payload):
+    """สร้าง ticket แล้วสั่ง worker ประมวลผลคิวของสินค้าหลัง commit"""
+    ticket = CheckoutTicket.objects.create(buyer=buyer, product_id=product_id, payload=payload)
+    transaction.on_commit(lambda: schedule_queue(product_id))
+    return ticket
+
+
+def schedule_queue(product_id):
+    from .tasks import process_checkout_queue
+
+    process_checkout_queue.delay(product_id)
+
+
+def ticket_group(ticket_id):
+    return f'checkout_ticket_{ticket_id}'
+
+
+def ticket_result(ticket):
+    return {
+        'ticket': str(ticket.pk),
+        'status': ticket.status,
+        'order_id': ticket.order_id,
+        'errors': ticket.errors,
+    }
+
+
+# ===========================================
+# Worker
+# ===========================================
+def process_queue(product_id, batch_size=None):
+    """
+    ประมวลผลคิวของสินค้าจนหมด คืนค่าจำนวน ticket ที่ประมวลผล
+    ถ้ามี worker อื่นถือ lock ของสินค้านี้อยู่ คืนค่า 0 ทันที (worker นั้นจะเก็บ ticket ใหม่ไปด้วย)
+    """
+    config = get_checkout_queue_settings()
+    batch_size = batch_size or config['BATCH_SIZE']
+    lock_key = f'checkout_queue:lock:{product_id}'
+    queued = CheckoutTicket.objects.filter(product_id=product_id, status=CheckoutTicket.Status.QUEUED)
+
+    processed = 0
+    while cache.add(lock_key, 1, config['LOCK_TIMEOUT']):
+        try:
+            while True:
+                tickets = process_batch(product_id, batch_size)
+                if not tickets:
+                    break
+                processed += len(tickets)
+        finally:
+            cache.delete(lock_key)
+        # ticket ที่เข้ามาระหว่างปล่อย lock: task ของมันอาจเจอ lock แล้วออกไปก่อน
+        if not queued.exists():
+            break
+    return processed
+
+
+def process_batch(product_id, batch_size):
+    """
+    สร้าง Order ให้ ticket ชุดถัดไปของสินค้าใน transaction เดียว คืนค่า ticket ที่ประมวลผล
+    จองสต็อกของทั้งชุดด้วย reserve_many() (ล็อกทุกสินค้าในตะกร้าของชุดครั้งเดียวเรียงตาม id และตัดสต็อกด้วย
+    UPDATE เดียว) แล้วสร้าง Order ของแต่ละ ticket จากการจองนั้นใน savepoint ของตัวเอง
+    """
+    from .serializers import CreateOrderSerializer, out_of_stock_error
+
+    with transaction.atomic():
+        tickets = list(
+            CheckoutTicket.objects.select_related('buyer')
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(product_id=product_id, status=CheckoutTicket.Status.QUEUED)
+            .order_by('created_at')[:batch_size]
+        )
+        if not tickets:
+            return []
+
+        now = timezone.now()
+        pending = []
+        for ticket in tickets:
+            ticket.processed_at = now
+            serializer = CreateOrderSerializer(
+                data=ticket.payload,
+                context={'request': SimpleNamespace(user=ticket.buyer)},
+            )
+            if serializer.is_valid():
+                pending.append((ticket, serializer))
+            else:
+                fail_ticket(ticket, serializers.ValidationError(serializer.errors))
+
+        tokens = reserve_many([
+            (ticket.buyer, merge_quantities(serializer.validated_data['items'])) for ticket, serializer in pending
+        ])
+        for (ticket, serializer), token in zip(pending, tokens):
+            if isinstance(token, StockError):
+                fail_ticket(ticket, out_of_stock_error(token))
+                continue
+            try:
+                ticket.order = serializer.save(reservation_token=token)
+                ticket.status = CheckoutTicket.Status.SUCCEEDED
+            except Exception as e:
+                fail_ticket(ticket, e)
+                release_reservations(StockReservation.objects.filter(token=token))
+
+        CheckoutTicket.objects.bulk_update(tickets, ['status', 'order', 'errors', 'processed_at'])
+        transaction.on_commit(lambda: notify_tickets(tickets))
+    return tickets
+
+
+def fail_ticket(ticket, error):
+    ticket.status = CheckoutTicket.Status.FAILED
+    if isinstance(error, serializers.ValidationError):
+        ticket.errors = serializers.as_serializer_error(error)
+    else:
+        logger.error('Checkout ticket %s failed', ticket.pk, exc_info=error)
+        ticket.errors = {'non_field_errors': ['เกิดข้อผิดพลาด กรุณาลองใหม่อีกครั้ง']}
+
+
+def notify_tickets(tickets):
+    """ส่งผลลัพธ์ไปยัง WebSocket ของแต่ละ ticket (ข้ามถ้าไม่ได้ตั้ง CHANNEL_LAYERS)"""
+    from channels.layers import get_channel_layer
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    group_send = async_to_sync(channel_layer.group_send)
+    for ticket in tickets:
+        try:
+            group_send(ticket_group(ticket.pk), {'type': 'ticket.result', 'result': ticket_result(ticket)})
+        except Exception:
+            # ผู้ซื้อยัง poll ผลได้
+            logger.warning('Failed to push checkout ticket %s', ticket.pk, exc_info=True)
+
+
+def stale_queues():
+    """id ของสินค้าที่มี ticket รอคิวนานเกิน STALE_AFTER วินาที"""
+    cutoff = timezone.now() - timedelta(seconds=get_checkout_queue_settings()['STALE_AFTER'])
+    return list(
+        CheckoutTicket.objects.filter(status=CheckoutTicket.Status.QUEUED, created_at__lte=cutoff)
+        .values_list('product_id', flat=True)
+        .distinct()
+    )
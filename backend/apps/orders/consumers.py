@@ -0,0 +1,56 @@
+"""
+===========================================
+Orders Consumers (WebSocket)
+===========================================
+"""
+import json
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.core.exceptions import ValidationError
+
+from .checkout_queue import ticket_group, ticket_result
+from .models import CheckoutTicket
+
+
+class CheckoutTicketConsumer(AsyncWebsocketConsumer):
+    """WebSocket Consumer สำหรับรอผล checkout ที่เข้าคิว (ws/orders/tickets/<id>/)"""
+
+    async def connect(self):
+        """เชื่อมต่อ WebSocket (เฉพาะเจ้าของ ticket)"""
+        self.ticket_id = self.scope['url_route']['kwargs']['ticket_id']
+        self.group_name = ticket_group(self.ticket_id)
+        self.user = self.scope['user']
+
+        ticket = await self.get_ticket()
+        if ticket is None:
+            await self.close()
+            return
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        # ประมวลผลเสร็จก่อนเชื่อมต่อ: ส่งผลทันที
+        if ticket.status != CheckoutTicket.Status.QUEUED:
+            await self.send_result(ticket_result(ticket))
+
+    async def disconnect(self, close_code):
+        """ยกเลิกการเชื่อมต่อ WebSocket"""
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def ticket_result(self, event):
+        """รับผลจาก worker (apps/orders/checkout_queue.notify_tickets)"""
+        await self.send_result(event['result'])
+
+    async def send_result(self, result):
+        await self.send(text_data=json.dumps(result))
+        await self.close()
+
+    @database_sync_to_async
+    def get_ticket(self):
+        if not self.user.is_authenticated:
+            return None
+        try:
+            return CheckoutTicket.objects.filter(pk=self.ticket_id, buyer=self.user).first()
+        except ValidationError:
+            return None
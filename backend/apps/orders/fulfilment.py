@@ -0,0 +1,75 @@
+"""
+===========================================
+Orders App - Seller Fulfilment
+===========================================
+SellerOrder: ส่วนของคำสั่งซื้อที่ seller แต่ละรายรับผิดชอบ
+
+- checkout สร้าง SellerOrder ของทุก seller ใน Order ด้วย INSERT เดียว (build_seller_orders)
+- seller อัพเดทสถานะเฉพาะส่วนของตัวเอง Order จะเปลี่ยนตามเมื่อทุก seller อยู่สถานะเดียวกัน
+- การเปลี่ยนสถานะทั้ง Order (admin, ชำระเงิน, ยกเลิกเพราะไม่ชำระ) คัดลอกไปทุก SellerOrder
+  (ชำระเงินไม่แตะส่วนที่ seller ยกเลิกไปแล้ว)
+- seller ยกเลิกส่วนของตัวเอง: ยอดรวมของ Order คำนวณใหม่จากส่วนที่เหลือ
+"""
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Order, SellerOrder
+
+
+def build_seller_orders(order, items):
+    """SellerOrder ของแต่ละ seller จากรายการสินค้า (ยังไม่บันทึก)"""
+    seller_orders = {}
+    for item in items:
+        if item.seller_id is None:
+            continue
+        seller_order = seller_orders.get(item.seller_id)
+        if seller_order is None:
+            seller_order = seller_orders[item.seller_id] = SellerOrder(
+                order=order,
+                seller_id=item.seller_id,
+                status=order.status,
+                created_at=order.created_at,
+            )
+        seller_order.subtotal += item.total
+        seller_order.items_count += 1
+    return list(seller_orders.values())
+
+
+def sync_seller_orders(order_ids, status, keep_cancelled=False):
+    """คัดลอกสถานะของ Order ไปยังทุก SellerOrder (keep_cancelled=True: ข้ามส่วนที่ถูกยกเลิกแล้ว)"""
+    seller_orders = SellerOrder.objects.filter(order_id__in=order_ids)
+    if keep_cancelled:
+        seller_orders = seller_orders.exclude(status=Order.Status.CANCELLED)
+    return seller_orders.update(status=status, updated_at=timezone.now())
+
+
+def recompute_order_totals(order):
+    """
+    ยอดรวมของ Order จากส่วนของ seller ที่ยังไม่ถูกยกเลิก (หลัง seller ยกเลิกบางส่วน)
+    ถ้ายกเลิกครบทุกส่วนแล้วคงยอดเดิมไว้
+    """
+    subtotal = SellerOrder.objects.filter(order_id=order.pk).exclude(
+        status=Order.Status.CANCELLED
+    ).aggregate(total=Sum('subtotal'))['total']
+    if subtotal is None:
+        return order
+    order.subtotal = subtotal
+    order.total = subtotal + order.shipping_fee
+    Order.objects.filter(pk=order.pk).update(subtotal=order.subtotal, total=order.total, updated_at=timezone.now())
+    return order
+
+
+def set_seller_order_status(seller_order, status):
+    """
+    seller อัพเดทสถานะส่วนของตัวเอง
+    ถ้าทุก seller ของ Order อยู่สถานะเดียวกันแล้ว Order จะเปลี่ยนเป็นสถานะนั้นด้วย คืนค่าสถานะของ Order
+    """
+    seller_order.status = status
+    seller_order.save(update_fields=['status', 'updated_at'])
+
+    order = seller_order.order
+    statuses = set(SellerOrder.objects.filter(order_id=order.pk).values_list('status', flat=True))
+    if statuses == {status} and order.status != status:
+        order.status = status
+        Order.objects.filter(pk=order.pk).update(status=status, updated_at=timezone.now())
+    return order.status
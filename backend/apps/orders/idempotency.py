@@ -0,0 +1,133 @@
+"""
+===========================================
+Orders App - Idempotency Keys
+===========================================
+กัน checkout / ชำระเงินซ้ำเมื่อ client (แอปมือถือ) ส่ง request เดิมซ้ำหลัง timeout
+
+client ส่ง header Idempotency-Key (ค่าสุ่มต่อการกดหนึ่งครั้ง) มากับ request:
+    - ครั้งแรก: ทำงานตามปกติ แล้วเก็บ (status, data) ไว้ใน cache ตาม TTL
+    - ส่งซ้ำ: ตอบผลที่เก็บไว้โดยไม่ทำงานซ้ำ (header Idempotent-Replayed: true)
+    - ส่งซ้ำระหว่างที่ครั้งแรกยังทำงานอยู่: รอผลของครั้งแรก (lock ใน cache) แทนการแข่งกันทำ
+    - ใช้ key เดิมกับข้อมูลต่างจากเดิม: 422
+
+key แยกตามผู้ใช้และ path ของ endpoint ไม่มี header = ทำงานแบบเดิม
+เก็บเฉพาะผลที่ไม่ใช่ 5xx (error ฝั่ง server ให้ลองใหม่ได้)
+ต้องใช้ cache ที่แชร์กันทุก worker (Redis) ถึงจะกันซ้ำข้าม process ได้
+
+ตั้งค่าใน settings.IDEMPOTENCY:
+    TTL            วินาทีที่จำผลของแต่ละ key
+    LOCK_TIMEOUT   วินาทีสูงสุดที่ถือ lock ระหว่างทำงาน
+    WAIT_TIMEOUT   วินาทีที่ request ซ้ำรอผลของครั้งแรก ก่อนตอบ 409
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+KEY_PREFIX = 'idempotency'
+MAX_KEY_LENGTH = 255
+WAIT_STEP = 0.05
+
+
+def get_idempotency_settings():
+    config = {
+        'TTL': 24 * 60 * 60,
+        'LOCK_TIMEOUT': 60,
+        'WAIT_TIMEOUT': 30,
+    }
+    config.update(getattr(settings, 'IDEMPOTENCY', {}))
+    return config
+
+
+def request_fingerprint(request):
+    """hash ของข้อมูลใน request ใช้ตรวจว่า key เดิมถูกใช้กับข้อมูลเดิม"""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method}:{body}'.encode('utf-8')).hexdigest()
+
+
+def storage_key(request, idempotency_key):
+    raw = f'{request.user.pk}:{request.method}:{request.path}:{idempotency_key}'
+    return f'{KEY_PREFIX}:{hashlib.sha256(raw.encode("utf-8")).hexdigest()}'
+
+
+def replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return Response(
+            {'error': f'{HEADER} นี้ถูกใช้กับคำขออื่นแล้ว'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    response = Response(stored['data'], status=stored['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """decorator สำหรับ action ของ ViewSet ที่ต้องกันการทำงานซ้ำ"""
+
+    @wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        idempotency_key = request.headers.get(HEADER)
+        if not idempotency_key:
+            return view(self, request, *args, **kwargs)
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{HEADER} ยาวได้ไม่เกิน {MAX_KEY_LENGTH} ตัวอักษร'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        config = get_idempotency_settings()
+        key = storage_key(request, idempotency_key)
+        fingerprint = request_fingerprint(request)
+
+        stored = cache.get(key)
+        if stored is not None:
+            return replay(stored, fingerprint)
+
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, 1, timeout=config['LOCK_TIMEOUT']):
+            try:
+                # request แรกอาจเพิ่งเสร็จระหว่าง get กับ add
+                stored = cache.get(key)
+                if stored is not None:
+                    return replay(stored, fingerprint)
+
+                try:
+                    response = view(self, request, *args, **kwargs)
+                except Exception as exc:
+                    # ValidationError ฯลฯ ให้เป็น response แล้วเก็บเหมือนผลปกติ (error อื่นจะ raise ต่อ)
+                    response = self.handle_exception(exc)
+                if response.status_code < 500:
+                    cache.set(key, {
+                        'fingerprint': fingerprint,
+                        'status': response.status_code,
+                        'data': response.data,
+                    }, timeout=config['TTL'])
+                return response
+            finally:
+                cache.delete(lock_key)
+
+        # request เดียวกันกำลังทำงานอยู่: รอผลแทนการทำซ้ำ
+        deadline = time.monotonic() + config['WAIT_TIMEOUT']
+        while stored is None and time.monotonic() < deadline:
+            time.sleep(WAIT_STEP)
+            stored = cache.get(key)
+            if stored is None and cache.get(lock_key) is None:
+                # ครั้งแรกจบโดยไม่เก็บผล (5xx)
+                break
+        if stored is None:
+            return Response(
+                {'error': 'คำขอเดียวกันกำลังดำเนินการอยู่ กรุณาลองใหม่อีกครั้ง'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return replay(stored, fingerprint)
+
+    return wrapper
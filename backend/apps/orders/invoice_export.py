@@ -0,0 +1,209 @@
+"""
+===========================================
+Orders App - Invoice Export
+===========================================
+export ใบสั่งซื้อหลายใบเป็นไฟล์ ZIP (ใบละหนึ่ง PDF ชื่อตามเลขที่คำสั่งซื้อ)
+
+- Celery task และ management command สร้าง PDF ใน process pool (ReportLab ใช้ CPU ล้วน thread ไม่ช่วยเพราะ GIL)
+  แต่ละ process ใช้ get_order_pdf จึงได้ไฟล์ที่ cache ไว้แล้วทันที และเก็บไฟล์ที่สร้างใหม่ไว้ให้ครั้งถัดไป
+  ส่วน stream ใน request สร้างใน process ของ web worker เอง (ไม่ fork จาก web worker)
+- เขียน PDF ลง ZIP ทีละใบตามลำดับที่ได้ ไม่เก็บทุกใบไว้ในหน่วยความจำ
+- ชุดเล็ก (ไม่เกิน SYNC_LIMIT ใบ) stream ZIP กลับใน response ทันที
+  ชุดใหญ่สร้าง InvoiceExport แล้วให้ Celery task export_invoices เขียนไฟล์ลง EXPORT_DIR
+  พร้อมอัพเดทความคืบหน้า (done / total) ทุก PROGRESS_EVERY ใบ
+
+ตั้งค่าใน settings.INVOICE_EXPORT:
+    PROCESSES       จำนวน process ที่สร้าง PDF (0 หรือ 1 = สร้างใน process เดียว)
+    SYNC_LIMIT      จำนวนใบสูงสุดที่ stream กลับใน request
+    MAX_ORDERS      จำนวนใบสูงสุดต่อการ export
+    EXPORT_DIR      โฟลเดอร์เก็บไฟล์ ZIP ของงานที่ทำใน worker
+    PROGRESS_EVERY  อัพเดทความคืบหน้าทุกกี่ใบ
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import InvoiceExport, Order
+from .pdf_generator import get_order_pdf
+
+logger = logging.getLogger(__name__)
+
+# จำนวนใบที่โหลดจากฐานข้อมูลต่อครั้งเมื่อสร้างใน process เดียว
+LOAD_BATCH = 50
+
+
+def get_invoice_export_settings():
+    config = {
+        'PROCESSES': min(os.cpu_count() or 1, 4),
+        'SYNC_LIMIT': 20,
+        'MAX_ORDERS': 1000,
+        'EXPORT_DIR': os.path.join(settings.MEDIA_ROOT, 'invoice_exports'),
+        'PROGRESS_EVERY': 10,
+    }
+    config.update(getattr(settings, 'INVOICE_EXPORT', {}))
+    return config
+
+
+def exportable_orders(user, order_ids=None, date_from=None, date_to=None):
+    """
+    id ของคำสั่งซื้อที่ผู้ใช้ export ได้ เรียงตาม id
+    admin: ทุกคำสั่งซื้อ, seller: คำสั่งซื้อที่มีสินค้าของตัวเอง, buyer: คำสั่งซื้อของตัวเอง
+    """
+    queryset = Order.objects.all()
+    if user is not None and not user.is_staff:
+        if user.is_seller:
+            queryset = queryset.filter(seller_orders__seller=user)
+        else:
+            queryset = queryset.filter(buyer=user)
+    if order_ids:
+        queryset = queryset.filter(pk__in=order_ids)
+    if date_from:
+        queryset = queryset.filter(created_at__date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(created_at__date__lte=date_to)
+    return list(queryset.order_by('pk').values_list('pk', flat=True))
+
+
+def invoice_filename(order_number):
+    return f'{order_number}.pdf'
+
+
+# ===========================================
+# Rendering
+# ===========================================
+def render_invoice(order_id):
+    """สร้าง (หรืออ่านจาก cache) PDF ของคำสั่งซื้อหนึ่งใบ ใช้ใน process ลูก"""
+    order = Order.objects.for_display().get(pk=order_id)
+    return order.order_number, get_order_pdf(order)
+
+
+def render_invoices(order_ids, processes=None):
+    """PDF ของคำสั่งซื้อตามลำดับ order_ids คืนค่าทีละ (order_number, pdf)"""
+    if processes is None:
+        processes = get_invoice_export_settings()['PROCESSES']
+    processes = min(processes, len(order_ids))
+
+    if processes <= 1:
+        for start in range(0, len(order_ids), LOAD_BATCH):
+            batch = order_ids[start:start + LOAD_BATCH]
+            orders = Order.objects.for_display().in_bulk(batch)
+            for order_id in batch:
+                order = orders[order_id]
+                yield order.order_number, get_order_pdf(order)
+        return
+
+    # process ลูกต้องเปิด connection ฐานข้อมูลของตัวเอง ห้ามใช้ socket เดียวกับ process แม่
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with context.Pool(processes) as pool:
+        # imap คืนผลตามลำดับทีละใบ ผลที่ยังไม่ถูกอ่านจะรออยู่ใน queue ของ pool
+        yield from pool.imap(render_invoice, order_ids, chunksize=4)
+
+
+def write_invoice_zip(fileobj, order_ids, processes=None, progress=None):
+    """เขียน ZIP ของใบสั่งซื้อลง fileobj เรียก progress(จำนวนที่เสร็จ) หลังแต่ละใบ คืนค่าจำนวนใบ"""
+    done = 0
+    # PDF บีบอัดไว้แล้ว เก็บแบบไม่บีบอัดซ้ำ
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for order_number, pdf in render_invoices(order_ids, processes):
+            archive.writestr(invoice_filename(order_number), pdf)
+            done += 1
+            if progress is not None:
+                progress(done)
+    return done
+
+
+class ZipStream:
+    """file-like ที่เขียนได้อย่างเดียว (ไม่มี seek/tell) ZipFile จะเขียนแบบ streaming"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_invoice_zip(order_ids):
+    """
+    ZIP ของใบสั่งซื้อเป็นชิ้น ๆ สำหรับ StreamingHttpResponse (ส่งออกทีละใบ)
+    สร้าง PDF ใน process ของ web worker เสมอ ห้าม fork pool จาก generator ที่ถูกอ่านระหว่างส่ง response
+    (process pool ใช้ได้เฉพาะ Celery task และ management command)
+    """
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for order_number, pdf in render_invoices(order_ids, processes=1):
+            archive.writestr(invoice_filename(order_number), pdf)
+            yield stream.pop()
+    yield stream.pop()
+
+
+# ===========================================
+# Background export
+# ===========================================
+def create_export(user, order_ids):
+    """สร้างงาน export แล้วสั่ง worker หลัง commit"""
+    from .tasks import export_invoices
+
+    export = InvoiceExport.objects.create(requested_by=user, order_ids=order_ids, total=len(order_ids))
+    transaction.on_commit(lambda: export_invoices.delay(str(export.pk)))
+    return export
+
+
+def run_export(export, processes=None):
+    """สร้างไฟล์ ZIP ของงาน export (ใน Celery worker) เขียนไฟล์ชั่วคราวแล้ว rename เมื่อเสร็จ"""
+    config = get_invoice_export_settings()
+    export_dir = config['EXPORT_DIR']
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, f'invoices-{export.pk}.zip')
+
+    InvoiceExport.objects.filter(pk=export.pk).update(status=InvoiceExport.Status.RUNNING, done=0)
+    export.status = InvoiceExport.Status.RUNNING
+
+    def progress(done):
+        if done % config['PROGRESS_EVERY'] == 0:
+            InvoiceExport.objects.filter(pk=export.pk).update(done=done)
+
+    descriptor, temp_path = tempfile.mkstemp(dir=export_dir, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as fileobj:
+            export.done = write_invoice_zip(fileobj, export.order_ids, processes, progress)
+        os.replace(temp_path, path)
+    except Exception as e:
+        logger.exception('Invoice export %s failed', export.pk)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        export.status = InvoiceExport.Status.FAILED
+        export.error = str(e)
+    else:
+        export.status = InvoiceExport.Status.DONE
+        export.file_path = path
+
+    export.finished_at = timezone.now()
+    export.save(update_fields=['status', 'done', 'file_path', 'error', 'finished_at'])
+    return export
+
+
+def export_progress(export):
+    return {
+        'id': str(export.pk),
+        'status': export.status,
+        'total': export.total,
+        'done': export.done,
+        'progress': round(export.done * 100 / export.total) if export.total else 100,
+        'error': export.error or None,
+    }
@@ -0,0 +1,45 @@
+"""
+===========================================
+Backfill Order Item Snapshots Command
+===========================================
+เติม slug และรูปของสินค้าให้ OrderItem ที่สร้างก่อนมี snapshot (product_slug / product_image_url)
+อัพเดทเป็นช่วง id ทีละ --batch-size แถวด้วย UPDATE ... = (SELECT ...) ไม่ต้องโหลดแถวมาใน Python
+
+การใช้งาน:
+    python manage.py backfill_order_item_snapshots
+    python manage.py backfill_order_item_snapshots --batch-size 5000 --overwrite
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min, OuterRef, Q, Subquery
+
+from apps.orders.models import OrderItem
+from apps.products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'เติม snapshot slug และรูปสินค้าให้ OrderItem เดิม'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--overwrite', action='store_true', help='อัพเดทแม้มี snapshot อยู่แล้ว')
+
+    def handle(self, *args, **options):
+        items = OrderItem.objects.filter(product__isnull=False)
+        if not options['overwrite']:
+            items = items.filter(Q(product_slug='') | Q(product_image_url=''))
+
+        bounds = items.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            self.stdout.write(self.style.SUCCESS('✅ ไม่มีรายการที่ต้องเติม'))
+            return
+
+        product = Product.objects.filter(pk=OuterRef('product_id'))
+        batch_size = options['batch_size']
+        updated = 0
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            updated += items.filter(pk__gte=start, pk__lt=start + batch_size).update(
+                product_slug=Subquery(product.values('slug')[:1]),
+                product_image_url=Subquery(product.values('main_image_url')[:1]),
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'✅ เติม snapshot ให้ {updated} รายการ'))
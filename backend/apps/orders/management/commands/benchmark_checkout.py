@@ -0,0 +1,211 @@
+"""
+===========================================
+Checkout Benchmark Command
+===========================================
+ยิง checkout พร้อมกันหลาย thread ใส่สินค้าชิ้นเดียว แล้วตรวจว่าไม่ขายเกินสต็อก
+พร้อมวัด throughput และเวลาตอบต่อ request ภายใต้การแย่งสต็อก (ควรรันกับ PostgreSQL SQLite ล็อกทั้งไฟล์)
+
+การใช้งาน:
+    python manage.py benchmark_checkout --threads 16 --orders 50 --stock 500
+    python manage.py benchmark_checkout --strategy naive    # วิธีเดิม (อ่าน-แก้-เขียน ไม่ล็อก) ไว้เปรียบเทียบ
+    python manage.py benchmark_checkout --strategy queued   # sale_mode: request สร้าง ticket
+                                                            # แล้ว worker สร้าง Order เป็นชุด
+
+เทียบ orders/s สูงสุดของ locked กับ queued ที่ --threads เท่ากัน
+(queued นับเวลาจนกว่า worker จะประมวลผลทุก ticket เสร็จ)
+"""
+import threading
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+from rest_framework import serializers
+
+from apps.orders.checkout_queue import process_queue
+from apps.orders.models import CheckoutTicket, Order, OrderItem
+from apps.orders.serializers import CreateOrderSerializer
+from apps.products.models import Category, Product
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'วัดผล checkout พร้อมกัน (ตรวจ oversell และ throughput)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=25, help='จำนวน checkout ต่อ thread')
+        parser.add_argument('--stock', type=int, default=100)
+        parser.add_argument('--quantity', type=int, default=1)
+        parser.add_argument('--strategy', choices=['locked', 'naive', 'queued'], default='locked')
+        parser.add_argument('--keep', action='store_true', help='ไม่ลบข้อมูลที่สร้างขึ้นหลังรันเสร็จ')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                '⚠️  SQLite ล็อกทั้งฐานข้อมูล ผลที่ได้ไม่สะท้อน production (ใช้ PostgreSQL)'
+            ))
+
+        run_id = uuid.uuid4().hex[:8]
+        seller, buyer, category, product = self.setup(run_id, options['stock'], options['strategy'] == 'queued')
+        checkout = {
+            'locked': self.locked_checkout,
+            'naive': self.naive_checkout,
+            'queued': self.queued_checkout,
+        }[options['strategy']]
+
+        outcomes = Counter()
+        latencies = []
+        outcomes_lock = threading.Lock()
+        barrier = threading.Barrier(options['threads'])
+        submitting = threading.Event()
+        submitting.set()
+
+        def worker():
+            local = Counter()
+            local_latencies = []
+            try:
+                barrier.wait()
+                for _ in range(options['orders']):
+                    request_started = time.perf_counter()
+                    try:
+                        checkout(buyer, product.pk, options['quantity'])
+                        local['success'] += 1
+                    except serializers.ValidationError:
+                        local['out_of_stock'] += 1
+                    except Exception:
+                        local['error'] += 1
+                    local_latencies.append(time.perf_counter() - request_started)
+            finally:
+                connection.close()
+                with outcomes_lock:
+                    outcomes.update(local)
+                    latencies.extend(local_latencies)
+
+        def queue_worker():
+            """จำลอง Celery worker ของ queue 'checkout': ประมวลผลคิวจนกว่าทุก request ส่งครบและคิวว่าง"""
+            try:
+                while True:
+                    still_submitting = submitting.is_set()
+                    try:
+                        processed = process_queue(product.pk)
+                    except Exception:
+                        # SQLite: database is locked ลองชุดนั้นใหม่
+                        processed = 1
+                        with outcomes_lock:
+                            outcomes['queue_error'] += 1
+                    if not processed and not still_submitting:
+                        break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        drainer = threading.Thread(target=queue_worker) if options['strategy'] == 'queued' else None
+        started = time.perf_counter()
+        if drainer:
+            drainer.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if drainer:
+            submitting.clear()
+            drainer.join()
+            # request ได้แค่ ticket ผลจริงอยู่ที่ ticket
+            tickets = Counter(CheckoutTicket.objects.filter(product=product).values_list('status', flat=True))
+            outcomes['success'] = tickets[CheckoutTicket.Status.SUCCEEDED.value]
+            outcomes['out_of_stock'] = tickets[CheckoutTicket.Status.FAILED.value]
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db()
+        sold = OrderItem.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+        oversold = max(sold - options['stock'], 0)
+        consistent = product.stock == options['stock'] - sold
+        attempts = options['threads'] * options['orders']
+
+        self.stdout.write(f"\n📊 strategy={options['strategy']} threads={options['threads']} attempts={attempts}")
+        errors = outcomes['error'] + outcomes['queue_error']
+        self.stdout.write(
+            f"   สำเร็จ {outcomes['success']} | สต็อกไม่พอ {outcomes['out_of_stock']} | error {errors}"
+        )
+        self.stdout.write(f"   ขายไป {sold} ชิ้น จากสต็อก {options['stock']} | สต็อกคงเหลือ {product.stock}")
+        self.stdout.write(
+            f"   เวลา {elapsed:.2f}s | {attempts / elapsed:.1f} checkout/s | "
+            f"{outcomes['success'] / elapsed:.1f} orders/s"
+        )
+        if latencies:
+            latencies.sort()
+            p50 = latencies[len(latencies) // 2] * 1000
+            p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000
+            self.stdout.write(f"   เวลาตอบต่อ request p50 {p50:.1f}ms | p95 {p95:.1f}ms")
+        if oversold or not consistent:
+            self.stdout.write(self.style.ERROR(f'❌ ขายเกิน {oversold} ชิ้น / สต็อกไม่ตรงกับยอดขาย'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ ไม่มีการขายเกินสต็อก'))
+
+        if not options['keep']:
+            CheckoutTicket.objects.filter(buyer=buyer).delete()
+            Order.objects.filter(buyer=buyer).delete()
+            product.delete()
+            category.delete()
+            User.objects.filter(pk__in=[seller.pk, buyer.pk]).delete()
+
+    def setup(self, run_id, stock, sale_mode=False):
+        seller = User.objects.create_user(
+            email=f'bench-seller-{run_id}@example.com', username=f'bench-seller-{run_id}',
+            password=uuid.uuid4().hex, role='seller', shop_name=f'Bench {run_id}'
+        )
+        buyer = User.objects.create_user(
+            email=f'bench-buyer-{run_id}@example.com', username=f'bench-buyer-{run_id}',
+            password=uuid.uuid4().hex, role='buyer'
+        )
+        category = Category.objects.create(name=f'Benchmark {run_id}')
+        product = Product.objects.create(
+            seller=seller, category=category, name=f'Benchmark {run_id}', price=100, stock=stock,
+            sale_mode=sale_mode
+        )
+        return seller, buyer, category, product
+
+    def checkout_serializer(self, buyer, product_id, quantity):
+        serializer = CreateOrderSerializer(
+            data={
+                'shipping_name': 'Benchmark',
+                'shipping_phone': '0800000000',
+                'shipping_address': 'Benchmark',
+                'payment_method': 'cod',
+                'items': [{'product_id': product_id, 'quantity': quantity}],
+            },
+            context={'request': SimpleNamespace(user=buyer)},
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer
+
+    def locked_checkout(self, buyer, product_id, quantity):
+        self.checkout_serializer(buyer, product_id, quantity).save()
+
+    def queued_checkout(self, buyer, product_id, quantity):
+        """สิ่งที่ POST /api/orders/ ทำกับสินค้า sale_mode (ไม่สั่ง Celery: queue_worker ประมวลผลแทน)"""
+        serializer = self.checkout_serializer(buyer, product_id, quantity)
+        CheckoutTicket.objects.create(buyer=buyer, product_id=product_id, payload=serializer.validated_data)
+
+    @transaction.atomic
+    def naive_checkout(self, buyer, product_id, quantity):
+        """วิธีเดิม: อ่านสต็อกโดยไม่ล็อก แล้ว stock -= q; save() (ไว้เปรียบเทียบ)"""
+        product = Product.objects.get(pk=product_id)
+        if product.stock < quantity:
+            raise serializers.ValidationError('out of stock')
+        order = Order.objects.create(
+            buyer=buyer, shipping_name='Benchmark', shipping_phone='0800000000',
+            shipping_address='Benchmark', payment_method='cod', shipping_fee=40
+        )
+        OrderItem.objects.create(
+            order=order, product=product, seller_id=product.seller_id,
+            product_name=product.name, product_price=product.price, quantity=quantity
+        )
+        product.stock -= quantity
+        product.save(update_fields=['stock'])
@@ -0,0 +1,57 @@
+"""
+===========================================
+Export Invoices Command
+===========================================
+export ใบสั่งซื้อหลายใบเป็นไฟล์ ZIP (สร้าง PDF ใน process pool ดู apps/orders/invoice_export.py)
+
+การใช้งาน:
+    python manage.py export_invoices --output invoices.zip --date-from 2026-10-01 --date-to 2026-10-17
+    python manage.py export_invoices --output invoices.zip --ids 12 13 14 --processes 8
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.orders.invoice_export import exportable_orders, get_invoice_export_settings, write_invoice_zip
+
+
+class Command(BaseCommand):
+    help = 'export ใบสั่งซื้อเป็นไฟล์ ZIP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', required=True, help='ไฟล์ ZIP ที่จะสร้าง')
+        parser.add_argument('--ids', type=int, nargs='+', help='id ของคำสั่งซื้อ')
+        parser.add_argument('--date-from', help='วันที่สั่งซื้อเริ่มต้น (YYYY-MM-DD)')
+        parser.add_argument('--date-to', help='วันที่สั่งซื้อสิ้นสุด (YYYY-MM-DD)')
+        parser.add_argument('--processes', type=int, help='จำนวน process ที่สร้าง PDF')
+
+    def handle(self, *args, **options):
+        if not (options['ids'] or options['date_from'] or options['date_to']):
+            raise CommandError('กรุณาระบุ --ids หรือ --date-from / --date-to')
+
+        order_ids = exportable_orders(None, options['ids'], options['date_from'], options['date_to'])
+        if not order_ids:
+            self.stdout.write(self.style.WARNING('⚠️ ไม่พบคำสั่งซื้อ'))
+            return
+
+        processes = options['processes']
+        if processes is None:
+            processes = get_invoice_export_settings()['PROCESSES']
+        total = len(order_ids)
+        step = max(total // 10, 1)
+
+        def progress(done):
+            if done % step == 0 or done == total:
+                self.stdout.write(f'  {done}/{total}')
+
+        started = time.perf_counter()
+        with open(options['output'], 'wb') as fileobj:
+            written = write_invoice_zip(fileobj, order_ids, processes, progress)
+        elapsed = time.perf_counter() - started
+
+        size = os.path.getsize(options['output']) / 1024 / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ export {written} ใบ ({size:.1f} MB) ใน {elapsed:.1f} วินาที ({written / elapsed:.1f} ใบ/วินาที) '
+            f'-> {options["output"]}'
+        ))
@@ -0,0 +1,90 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("products", "0006_product_updated_at_index"),
+        ("orders", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockReservation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token", models.UUIDField(db_index=True, verbose_name="รหัสการจอง")),
+                ("quantity", models.PositiveIntegerField(verbose_name="จำนวน")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("active", "จองไว้"),
+                            ("committed", "ยืนยันแล้ว"),
+                            ("released", "คืนสต็อกแล้ว"),
+                        ],
+                        default="active",
+                        max_length=20,
+                        verbose_name="สถานะ",
+                    ),
+                ),
+                ("expires_at", models.DateTimeField(verbose_name="หมดอายุเมื่อ")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="สร้างเมื่อ"),
+                ),
+                (
+                    "buyer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_reservations",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="ผู้ซื้อ",
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="reservations",
+                        to="orders.order",
+                        verbose_name="คำสั่งซื้อ",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reservations",
+                        to="products.product",
+                        verbose_name="สินค้า",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "การจองสต็อก",
+                "verbose_name_plural": "การจองสต็อก",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "expires_at"],
+                        name="reservation_status_exp_idx",
+                    )
+                ],
+            },
+        ),
+    ]
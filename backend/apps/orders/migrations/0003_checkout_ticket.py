@@ -0,0 +1,103 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0007_product_sale_mode"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("orders", "0002_stock_reservation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CheckoutTicket",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("payload", models.JSONField(verbose_name="ข้อมูล checkout")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "รอคิว"),
+                            ("succeeded", "สั่งซื้อสำเร็จ"),
+                            ("failed", "สั่งซื้อไม่สำเร็จ"),
+                        ],
+                        default="queued",
+                        max_length=20,
+                        verbose_name="สถานะ",
+                    ),
+                ),
+                (
+                    "errors",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="ข้อผิดพลาด"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="เข้าคิวเมื่อ"
+                    ),
+                ),
+                (
+                    "processed_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="ประมวลผลเมื่อ"
+                    ),
+                ),
+                (
+                    "buyer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="checkout_tickets",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="ผู้ซื้อ",
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="checkout_tickets",
+                        to="orders.order",
+                        verbose_name="คำสั่งซื้อ",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="checkout_tickets",
+                        to="products.product",
+                        verbose_name="สินค้าที่เข้าคิว",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "คิว checkout",
+                "verbose_name_plural": "คิว checkout",
+                "indexes": [
+                    models.Index(
+                        fields=["product", "status", "created_at"],
+                        name="ticket_product_queue_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("orders", "0003_checkout_ticket"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SellerOrder",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "subtotal",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=12,
+                        verbose_name="ยอดรวมสินค้า",
+                    ),
+                ),
+                (
+                    "items_count",
+                    models.PositiveIntegerField(default=0, verbose_name="จำนวนรายการ"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "รอชำระเงิน"),
+                            ("paid", "ชำระเงินแล้ว"),
+                            ("shipped", "จัดส่งแล้ว"),
+                            ("delivered", "ได้รับสินค้าแล้ว"),
+                            ("cancelled", "ยกเลิก"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="สถานะ",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(verbose_name="สั่งซื้อเมื่อ")),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="อัพเดทเมื่อ"),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="seller_orders",
+                        to="orders.order",
+                        verbose_name="คำสั่งซื้อ",
+                    ),
+                ),
+                (
+                    "seller",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="seller_orders",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="ผู้ขาย",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "คำสั่งซื้อของผู้ขาย",
+                "verbose_name_plural": "คำสั่งซื้อของผู้ขาย",
+                "indexes": [
+                    models.Index(
+                        fields=["seller", "-created_at"],
+                        name="seller_order_created_idx",
+                    ),
+                    models.Index(
+                        fields=["seller", "status", "-created_at"],
+                        name="seller_order_status_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="sellerorder",
+            constraint=models.UniqueConstraint(
+                fields=("order", "seller"), name="unique_seller_order"
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:35
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+BATCH_SIZE = 1000
+
+
+def backfill_seller_orders(apps, schema_editor):
+    """สร้าง SellerOrder ให้คำสั่งซื้อเดิม จากยอดรวมของ OrderItem ต่อ (order, seller)"""
+    OrderItem = apps.get_model("orders", "OrderItem")
+    SellerOrder = apps.get_model("orders", "SellerOrder")
+
+    rows = (
+        OrderItem.objects.filter(seller__isnull=False)
+        .values("order_id", "seller_id", "order__status", "order__created_at")
+        .annotate(subtotal=Sum("total"), items_count=Count("id"))
+        .order_by("order_id", "seller_id")
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(SellerOrder(
+            order_id=row["order_id"],
+            seller_id=row["seller_id"],
+            subtotal=row["subtotal"],
+            items_count=row["items_count"],
+            status=row["order__status"],
+            created_at=row["order__created_at"],
+        ))
+        if len(batch) >= BATCH_SIZE:
+            SellerOrder.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        SellerOrder.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0004_seller_order"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_seller_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0005_backfill_seller_orders"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orderitem",
+            name="product_image_url",
+            field=models.CharField(
+                blank=True, default="", max_length=500, verbose_name="รูปสินค้า"
+            ),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="product_slug",
+            field=models.SlugField(
+                blank=True, default="", max_length=255, verbose_name="slug สินค้า"
+            ),
+        ),
+    ]
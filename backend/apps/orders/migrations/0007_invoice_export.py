@@ -0,0 +1,90 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("orders", "0006_order_item_snapshots"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InvoiceExport",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("order_ids", models.JSONField(verbose_name="คำสั่งซื้อ")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "รอดำเนินการ"),
+                            ("running", "กำลังสร้าง"),
+                            ("done", "เสร็จแล้ว"),
+                            ("failed", "ไม่สำเร็จ"),
+                        ],
+                        default="queued",
+                        max_length=20,
+                        verbose_name="สถานะ",
+                    ),
+                ),
+                (
+                    "total",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="จำนวนใบสั่งซื้อ"
+                    ),
+                ),
+                (
+                    "done",
+                    models.PositiveIntegerField(default=0, verbose_name="สร้างแล้ว"),
+                ),
+                (
+                    "file_path",
+                    models.CharField(
+                        blank=True, default="", max_length=500, verbose_name="ไฟล์"
+                    ),
+                ),
+                (
+                    "error",
+                    models.TextField(blank=True, default="", verbose_name="ข้อผิดพลาด"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="สร้างเมื่อ"),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="เสร็จเมื่อ"
+                    ),
+                ),
+                (
+                    "requested_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="invoice_exports",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="ผู้ขอ",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "export ใบสั่งซื้อ",
+                "verbose_name_plural": "export ใบสั่งซื้อ",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
@@ -11,6 +11,18 @@ from django.db import models
 from apps.products.models import Product
 
 
+class OrderQuerySet(models.QuerySet):
+    def for_display(self):
+        """
+        โหลดทุกอย่างที่ serializer ของ Order ใช้ในจำนวน query คงที่
+        (buyer ใน join เดียวกัน, items ใช้ข้อมูล snapshot ไม่ต้อง join product, seller_orders)
+        """
+        return self.select_related('buyer').prefetch_related(
+            models.Prefetch('items', queryset=OrderItem.objects.order_by('pk')),
+            'seller_orders',
+        )
+
+
 class Order(models.Model):
     """คำสั่งซื้อ"""
     
@@ -68,6 +80,8 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='สร้างเมื่อ')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='อัพเดทเมื่อ')
     
+    objects = OrderQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'คำสั่งซื้อ'
         verbose_name_plural = 'คำสั่งซื้อ'
@@ -117,9 +131,11 @@ class OrderItem(models.Model):
         verbose_name='ผู้ขาย'
     )
     
-    # Snapshot ข้อมูลสินค้าตอนสั่งซื้อ
+    # Snapshot ข้อมูลสินค้าตอนสั่งซื้อ (แสดงประวัติคำสั่งซื้อได้โดยไม่ join Product แม้สินค้าถูกลบ/แก้ไข)
     product_name = models.CharField(max_length=200, verbose_name='ชื่อสินค้า')
     product_price = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='ราคา')
+    product_slug = models.SlugField(max_length=255, blank=True, default='', verbose_name='slug สินค้า')
+    product_image_url = models.CharField(max_length=500, blank=True, default='', verbose_name='รูปสินค้า')
     quantity = models.PositiveIntegerField(default=1, verbose_name='จำนวน')
     total = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='รวม')
     
@@ -132,4 +148,200 @@ class OrderItem(models.Model):
     
     def save(self, *args, **kwargs):
         self.total = self.product_price * self.quantity
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class SellerOrder(models.Model):
+    """
+    ส่วนของคำสั่งซื้อที่ seller แต่ละรายต้องจัดส่ง (หนึ่งแถวต่อ order ต่อ seller สร้างตอน checkout)
+    ใช้แสดงรายการคำสั่งซื้อของ seller และตรวจสิทธิ์ด้วย index โดยไม่ต้อง join OrderItem แล้ว DISTINCT
+    """
+    
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='seller_orders',
+        verbose_name='คำสั่งซื้อ'
+    )
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='seller_orders',
+        verbose_name='ผู้ขาย'
+    )
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='ยอดรวมสินค้า')
+    items_count = models.PositiveIntegerField(default=0, verbose_name='จำนวนรายการ')
+    status = models.CharField(
+        max_length=20,
+        choices=Order.Status.choices,
+        default=Order.Status.PENDING,
+        verbose_name='สถานะ'
+    )
+    # เวลาสร้างของ Order (ซ้ำไว้เพื่อเรียงรายการของ seller ด้วย index เดียว)
+    created_at = models.DateTimeField(verbose_name='สั่งซื้อเมื่อ')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='อัพเดทเมื่อ')
+    
+    class Meta:
+        verbose_name = 'คำสั่งซื้อของผู้ขาย'
+        verbose_name_plural = 'คำสั่งซื้อของผู้ขาย'
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'seller'], name='unique_seller_order'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', '-created_at'], name='seller_order_created_idx'),
+            models.Index(fields=['seller', 'status', '-created_at'], name='seller_order_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.order_id} / {self.seller_id} ({self.status})"
+
+
+class StockReservation(models.Model):
+    """
+    การจองสต็อกระหว่าง checkout (ดู apps/orders/reservations.py)
+    สต็อกถูกตัดจาก Product ตั้งแต่ตอนจอง ถ้าหมดอายุหรือยกเลิกจะคืนสต็อกให้
+    """
+    
+    class Status(models.TextChoices):
+        ACTIVE = 'active', 'จองไว้'
+        COMMITTED = 'committed', 'ยืนยันแล้ว'
+        RELEASED = 'released', 'คืนสต็อกแล้ว'
+    
+    token = models.UUIDField(db_index=True, verbose_name='รหัสการจอง')
+    buyer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations',
+        verbose_name='ผู้ซื้อ'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='reservations',
+        verbose_name='สินค้า'
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reservations',
+        verbose_name='คำสั่งซื้อ'
+    )
+    quantity = models.PositiveIntegerField(verbose_name='จำนวน')
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.ACTIVE,
+        verbose_name='สถานะ'
+    )
+    expires_at = models.DateTimeField(verbose_name='หมดอายุเมื่อ')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='สร้างเมื่อ')
+    
+    class Meta:
+        verbose_name = 'การจองสต็อก'
+        verbose_name_plural = 'การจองสต็อก'
+        indexes = [
+            # สำหรับ sweeper หาการจองที่หมดอายุ
+            models.Index(fields=['status', 'expires_at'], name='reservation_status_exp_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity} ({self.status})"
+
+
+class CheckoutTicket(models.Model):
+    """
+    คิว checkout ของสินค้าที่เปิด sale_mode (ดู apps/orders/checkout_queue.py)
+    ผู้ซื้อได้ ticket กลับไปทันที แล้วรอผลผ่าน polling หรือ WebSocket
+    """
+    
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'รอคิว'
+        SUCCEEDED = 'succeeded', 'สั่งซื้อสำเร็จ'
+        FAILED = 'failed', 'สั่งซื้อไม่สำเร็จ'
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    buyer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='checkout_tickets',
+        verbose_name='ผู้ซื้อ'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='checkout_tickets',
+        verbose_name='สินค้าที่เข้าคิว'
+    )
+    payload = models.JSONField(verbose_name='ข้อมูล checkout')
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.QUEUED,
+        verbose_name='สถานะ'
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='checkout_tickets',
+        verbose_name='คำสั่งซื้อ'
+    )
+    errors = models.JSONField(default=dict, blank=True, verbose_name='ข้อผิดพลาด')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='เข้าคิวเมื่อ')
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name='ประมวลผลเมื่อ')
+    
+    class Meta:
+        verbose_name = 'คิว checkout'
+        verbose_name_plural = 'คิว checkout'
+        indexes = [
+            # worker ดึงคิวของสินค้าตามลำดับที่เข้ามา
+            models.Index(fields=['product', 'status', 'created_at'], name='ticket_product_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.id} ({self.status})"
+
+
+class InvoiceExport(models.Model):
+    """
+    งาน export ใบสั่งซื้อหลายใบเป็นไฟล์ ZIP (ดู apps/orders/invoice_export.py)
+    ชุดใหญ่สร้างใน Celery worker ผู้ขอดูความคืบหน้าแล้วดาวน์โหลดไฟล์เมื่อเสร็จ
+    """
+    
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'รอดำเนินการ'
+        RUNNING = 'running', 'กำลังสร้าง'
+        DONE = 'done', 'เสร็จแล้ว'
+        FAILED = 'failed', 'ไม่สำเร็จ'
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='invoice_exports',
+        verbose_name='ผู้ขอ'
+    )
+    order_ids = models.JSONField(verbose_name='คำสั่งซื้อ')
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.QUEUED,
+        verbose_name='สถานะ'
+    )
+    total = models.PositiveIntegerField(default=0, verbose_name='จำนวนใบสั่งซื้อ')
+    done = models.PositiveIntegerField(default=0, verbose_name='สร้างแล้ว')
+    file_path = models.CharField(max_length=500, blank=True, default='', verbose_name='ไฟล์')
+    error = models.TextField(blank=True, default='', verbose_name='ข้อผิดพลาด')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='สร้างเมื่อ')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='เสร็จเมื่อ')
+    
+    class Meta:
+        verbose_name = 'export ใบสั่งซื้อ'
+        verbose_name_plural = 'export ใบสั่งซื้อ'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.id} ({self.status} {self.done}/{self.total})"
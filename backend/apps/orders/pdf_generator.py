@@ -2,22 +2,169 @@
 ===========================================
 Order PDF Generator
 ===========================================
+สร้างใบสั่งซื้อ PDF ด้วย ReportLab
+
+- ฟอนต์ไทยและ style ทั้งหมดสร้างครั้งเดียวต่อ process (get_invoice_styles)
+- PDF ที่สร้างแล้วเก็บเป็นไฟล์ใน CACHE_DIR ตาม (order.id, order.updated_at)
+  ดาวน์โหลดซ้ำอ่านจากไฟล์ทันที Order เปลี่ยน (updated_at เปลี่ยน) = สร้างใหม่ และลบไฟล์ version เก่า
+- โหมด async: request ไม่สร้าง PDF เอง แต่สั่ง Celery task render_invoice_pdf (queue 'invoices')
+  แล้วให้ client poll สถานะจนไฟล์พร้อม (schedule_order_pdf กันสั่งซ้ำระหว่างที่กำลังสร้าง)
+
+ตั้งค่าใน settings.ORDER_PDF:
+    CACHE_DIR      โฟลเดอร์เก็บ PDF (None = ไม่ cache)
+    FONT_PATH      ไฟล์ฟอนต์ไทย .ttf (ไม่ระบุ = หาจาก FONT_CANDIDATES)
+    BOLD_FONT_PATH ฟอนต์ตัวหนา (ไม่ระบุ = ใช้ FONT_PATH)
+    ASYNC          สร้าง PDF ใน worker เป็นค่าเริ่มต้น (ไม่เช่นนั้นใช้เมื่อส่ง ?async=true)
+    PENDING_TTL    วินาทีที่ถือว่างานสร้าง PDF ที่สั่งไปยังทำอยู่ (หลังจากนั้นสั่งใหม่ได้)
 """
 import io
-from django.http import HttpResponse
+import logging
+import os
+import tempfile
+from functools import lru_cache
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch, cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
-import os
 
+logger = logging.getLogger(__name__)
 
-def generate_order_pdf(order):
-    """สร้าง PDF สำหรับคำสั่งซื้อ"""
-    
+# ฟอนต์ไทยที่หาได้ทั่วไป (Docker image ติดตั้ง fonts-tlwg-garuda-ttf) คู่ (ตัวปกติ, ตัวหนา)
+FONT_CANDIDATES = [
+    ('/usr/share/fonts/truetype/tlwg/Garuda.ttf', '/usr/share/fonts/truetype/tlwg/Garuda-Bold.ttf'),
+    ('/usr/share/fonts/truetype/tlwg/Loma.ttf', '/usr/share/fonts/truetype/tlwg/Loma-Bold.ttf'),
+    ('/usr/share/fonts/truetype/thai/Garuda.ttf', '/usr/share/fonts/truetype/thai/Garuda-Bold.ttf'),
+]
+FONT_NAME = 'InvoiceThai'
+BOLD_FONT_NAME = 'InvoiceThai-Bold'
+BRAND_COLOR = colors.HexColor('#EE4D2D')
+
+
+def get_pdf_settings():
+    config = {
+        'CACHE_DIR': os.path.join(settings.MEDIA_ROOT, 'invoices'),
+        'FONT_PATH': None,
+        'BOLD_FONT_PATH': None,
+        'ASYNC': False,
+        'PENDING_TTL': 60,
+    }
+    config.update(getattr(settings, 'ORDER_PDF', {}))
+    return config
+
+
+def register_fonts():
+    """ลงทะเบียนฟอนต์ไทย คืนค่า (ชื่อฟอนต์ปกติ, ชื่อฟอนต์ตัวหนา) ถ้าไม่พบใช้ Helvetica (ภาษาไทยจะไม่แสดง)"""
+    config = get_pdf_settings()
+    candidates = FONT_CANDIDATES
+    if config['FONT_PATH']:
+        candidates = [(config['FONT_PATH'], config['BOLD_FONT_PATH'] or config['FONT_PATH'])]
+
+    for regular, bold in candidates:
+        if not os.path.exists(regular):
+            continue
+        pdfmetrics.registerFont(TTFont(FONT_NAME, regular))
+        pdfmetrics.registerFont(TTFont(BOLD_FONT_NAME, bold if bold and os.path.exists(bold) else regular))
+        return FONT_NAME, BOLD_FONT_NAME
+
+    logger.warning('Thai font not found for invoice PDF (set ORDER_PDF["FONT_PATH"]); falling back to Helvetica')
+    return 'Helvetica', 'Helvetica-Bold'
+
+
+@lru_cache(maxsize=None)
+def get_invoice_styles():
+    """ฟอนต์และ style ของใบสั่งซื้อ (สร้างครั้งเดียวต่อ process)"""
+    font, bold_font = register_fonts()
+    styles = getSampleStyleSheet()
+
+    info_table = TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), font),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.grey),
+    ])
+
+    return SimpleNamespace(
+        font=font,
+        bold_font=bold_font,
+        title=ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontName=bold_font,
+            fontSize=24,
+            leading=30,
+            spaceAfter=30,
+            alignment=1,  # Center
+        ),
+        header=ParagraphStyle(
+            'CustomHeader',
+            parent=styles['Heading2'],
+            fontName=bold_font,
+            fontSize=14,
+            leading=18,
+            spaceAfter=12,
+        ),
+        footer=ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontName=font,
+            fontSize=9,
+            leading=12,
+            textColor=colors.grey,
+            alignment=1,
+        ),
+        info_table=info_table,
+        items_table=TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), font),
+            # Header
+            ('FONTNAME', (0, 0), (-1, 0), bold_font),
+            ('BACKGROUND', (0, 0), (-1, 0), BRAND_COLOR),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('TOPPADDING', (0, 0), (-1, 0), 12),
+
+            # Body
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+            ('TOPPADDING', (0, 1), (-1, -1), 8),
+
+            # Alignment
+            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+            ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+
+            # Grid
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+
+            # Alternating row colors
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F5F5F5')]),
+        ]),
+        summary_table=TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), font),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.grey),
+            # Total row
+            ('FONTNAME', (0, -1), (-1, -1), bold_font),
+            ('FONTSIZE', (0, -1), (-1, -1), 12),
+            ('TEXTCOLOR', (0, -1), (-1, -1), BRAND_COLOR),
+            ('LINEABOVE', (0, -1), (-1, -1), 1, colors.grey),
+            ('TOPPADDING', (0, -1), (-1, -1), 12),
+        ]),
+    )
+
+
+def render_order_pdf(order):
+    """สร้าง PDF ของคำสั่งซื้อ คืนค่า bytes (ควรโหลด buyer และ items มาแล้ว: Order.objects.for_display)"""
+    styles = get_invoice_styles()
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(
         buffer,
@@ -25,190 +172,172 @@ def generate_order_pdf(order):
         rightMargin=1.5*cm,
         leftMargin=1.5*cm,
         topMargin=1.5*cm,
-        bottomMargin=1.5*cm
+        bottomMargin=1.5*cm,
+        title=f'Order {order.order_number}',
     )
-    
+
     elements = []
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=30,
-        alignment=1,  # Center
-    )
-    
-    header_style = ParagraphStyle(
-        'CustomHeader',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-    )
-    
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=6,
-    )
-    
+
     # Title
-    elements.append(Paragraph("ใบสั่งซื้อ / Order Invoice", title_style))
+    elements.append(Paragraph("ใบสั่งซื้อ / Order Invoice", styles.title))
     elements.append(Spacer(1, 20))
-    
+
     # Order Info
-    elements.append(Paragraph("ข้อมูลคำสั่งซื้อ", header_style))
-    
+    elements.append(Paragraph("ข้อมูลคำสั่งซื้อ", styles.header))
+
     order_info = [
-        ["หมายเลขคำสั่งซื้อ:", f"#{order.id}"],
+        ["หมายเลขคำสั่งซื้อ:", order.order_number],
         ["วันที่สั่งซื้อ:", order.created_at.strftime("%d/%m/%Y %H:%M")],
-        ["สถานะ:", get_status_display(order.status)],
-        ["วิธีชำระเงิน:", get_payment_display(order.payment_method) if hasattr(order, 'payment_method') else "-"],
+        ["สถานะ:", order.get_status_display()],
+        ["วิธีชำระเงิน:", order.get_payment_method_display()],
     ]
-    
+
     order_table = Table(order_info, colWidths=[4*cm, 10*cm])
-    order_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.grey),
-    ]))
+    order_table.setStyle(styles.info_table)
     elements.append(order_table)
     elements.append(Spacer(1, 20))
-    
+
     # Customer Info
-    elements.append(Paragraph("ข้อมูลลูกค้า", header_style))
-    
+    elements.append(Paragraph("ข้อมูลลูกค้า", styles.header))
+
     customer_info = [
-        ["ชื่อ:", order.user.username if order.user else "-"],
-        ["อีเมล:", order.user.email if order.user else "-"],
-        ["ที่อยู่จัดส่ง:", order.shipping_address if hasattr(order, 'shipping_address') and order.shipping_address else "-"],
-        ["เบอร์โทร:", order.phone if hasattr(order, 'phone') and order.phone else "-"],
+        ["ชื่อผู้รับ:", order.shipping_name or "-"],
+        ["อีเมล:", order.buyer.email if order.buyer_id else "-"],
+        ["ที่อยู่จัดส่ง:", order.shipping_address or "-"],
+        ["เบอร์โทร:", order.shipping_phone or "-"],
     ]
-    
+
     customer_table = Table(customer_info, colWidths=[4*cm, 10*cm])
-    customer_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.grey),
-    ]))
+    customer_table.setStyle(styles.info_table)
     elements.append(customer_table)
     elements.append(Spacer(1, 20))
-    
+
     # Order Items
-    elements.append(Paragraph("รายการสินค้า", header_style))
-    
-    # Table Header
+    elements.append(Paragraph("รายการสินค้า", styles.header))
+
+    # Table Header + Rows (ใช้ข้อมูล snapshot ตอนสั่งซื้อ)
     items_data = [
         ["#", "สินค้า", "ราคา", "จำนวน", "รวม"]
     ]
-    
-    # Table Rows
     for idx, item in enumerate(order.items.all(), 1):
         items_data.append([
             str(idx),
-            item.product.name if item.product else "สินค้าถูกลบ",
-            f"{item.price:,.2f}",
+            item.product_name,
+            f"{item.product_price:,.2f}",
             str(item.quantity),
-            f"{item.price * item.quantity:,.2f}"
+            f"{item.total:,.2f}"
         ])
-    
+
     items_table = Table(items_data, colWidths=[1*cm, 8*cm, 2.5*cm, 2*cm, 2.5*cm])
-    items_table.setStyle(TableStyle([
-        # Header
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#EE4D2D')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        
-        # Body
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-        
-        # Alignment
-        ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
-        
-        # Grid
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        
-        # Alternating row colors
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F5F5F5')]),
-    ]))
+    items_table.setStyle(styles.items_table)
     elements.append(items_table)
     elements.append(Spacer(1, 20))
-    
-    # Summary
-    elements.append(Paragraph("สรุปยอด", header_style))
-    
-    subtotal = sum(item.price * item.quantity for item in order.items.all())
-    shipping = getattr(order, 'shipping_cost', 0) or 0
-    discount = getattr(order, 'discount', 0) or 0
-    total = order.total_amount if hasattr(order, 'total_amount') else subtotal
-    
+
+    # Summary (ยอดที่บันทึกไว้ใน Order)
+    elements.append(Paragraph("สรุปยอด", styles.header))
+
     summary_data = [
-        ["ยอดรวมสินค้า:", f"{subtotal:,.2f} บาท"],
-        ["ค่าจัดส่ง:", f"{shipping:,.2f} บาท"],
-        ["ส่วนลด:", f"-{discount:,.2f} บาท"],
-        ["ยอดชำระทั้งหมด:", f"{total:,.2f} บาท"],
+        ["ยอดรวมสินค้า:", f"{order.subtotal:,.2f} บาท"],
+        ["ค่าจัดส่ง:", f"{order.shipping_fee:,.2f} บาท"],
+        ["ยอดชำระทั้งหมด:", f"{order.total:,.2f} บาท"],
     ]
-    
+
     summary_table = Table(summary_data, colWidths=[10*cm, 4*cm])
-    summary_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.grey),
-        # Total row
-        ('FONTSIZE', (0, -1), (-1, -1), 12),
-        ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#EE4D2D')),
-        ('LINEABOVE', (0, -1), (-1, -1), 1, colors.grey),
-        ('TOPPADDING', (0, -1), (-1, -1), 12),
-    ]))
+    summary_table.setStyle(styles.summary_table)
     elements.append(summary_table)
     elements.append(Spacer(1, 30))
-    
+
     # Footer
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.grey,
-        alignment=1,
-    )
-    elements.append(Paragraph("ขอบคุณที่ใช้บริการ MuangThai Shop", footer_style))
-    elements.append(Paragraph("เอกสารนี้สร้างโดยระบบอัตโนมัติ", footer_style))
-    
+    elements.append(Paragraph("ขอบคุณที่ใช้บริการ MuangThai Shop", styles.footer))
+    elements.append(Paragraph("เอกสารนี้สร้างโดยระบบอัตโนมัติ", styles.footer))
+
     # Build PDF
     doc.build(elements)
-    buffer.seek(0)
-    
-    return buffer
-
-
-def get_status_display(status):
-    """แปลงสถานะเป็นภาษาไทย"""
-    status_map = {
-        'pending': 'รอดำเนินการ',
-        'confirmed': 'ยืนยันแล้ว',
-        'processing': 'กำลังเตรียมสินค้า',
-        'shipped': 'จัดส่งแล้ว',
-        'delivered': 'ส่งถึงแล้ว',
-        'cancelled': 'ยกเลิก',
-        'refunded': 'คืนเงินแล้ว',
-    }
-    return status_map.get(status, status)
+    return buffer.getvalue()
 
 
-def get_payment_display(payment_method):
-    """แปลงวิธีชำระเงินเป็นภาษาไทย"""
-    payment_map = {
-        'cod': 'เก็บเงินปลายทาง',
-        'transfer': 'โอนเงิน',
-        'credit_card': 'บัตรเครดิต',
-        'promptpay': 'พร้อมเพย์',
-    }
-    return payment_map.get(payment_method, payment_method or '-')
\ No newline at end of file
+# ===========================================
+# PDF cache (ไฟล์ต่อ version ของ Order)
+# ===========================================
+def order_pdf_version(order):
+    """version ของ PDF: เปลี่ยนทุกครั้งที่ Order ถูกแก้ไข (updated_at)"""
+    return f'{order.pk}-{int(order.updated_at.timestamp() * 1_000_000)}'
+
+
+def cached_pdf_path(order):
+    cache_dir = get_pdf_settings()['CACHE_DIR']
+    if not cache_dir:
+        return None
+    return os.path.join(cache_dir, f'order-{order_pdf_version(order)}.pdf')
+
+
+def get_cached_order_pdf(order):
+    """PDF ที่สร้างไว้แล้วของ version ปัจจุบัน (None = ยังไม่มี)"""
+    path = cached_pdf_path(order)
+    if path is None:
+        return None
+    try:
+        with open(path, 'rb') as fileobj:
+            return fileobj.read()
+    except FileNotFoundError:
+        return None
+
+
+def store_order_pdf(order, pdf):
+    """เขียน PDF ลงไฟล์แบบ atomic (เขียนไฟล์ชั่วคราวแล้ว rename) และลบไฟล์ของ version เก่า"""
+    path = cached_pdf_path(order)
+    if path is None:
+        return None
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as fileobj:
+            fileobj.write(pdf)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    prefix = f'order-{order.pk}-'
+    current = os.path.basename(path)
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith('.pdf') and name != current:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+    return path
+
+
+def get_order_pdf(order):
+    """PDF ของคำสั่งซื้อ (bytes) ใช้ไฟล์ที่สร้างไว้ถ้า Order ไม่เปลี่ยนตั้งแต่สร้าง"""
+    pdf = get_cached_order_pdf(order)
+    if pdf is None:
+        pdf = render_order_pdf(order)
+        store_order_pdf(order, pdf)
+    return pdf
+
+
+def pending_key(order):
+    return f'order_pdf:pending:{order_pdf_version(order)}'
+
+
+def schedule_order_pdf(order):
+    """
+    สั่ง worker สร้าง PDF ของ version ปัจจุบัน คืนค่า False ถ้าสั่งไปแล้วและยังไม่ครบ PENDING_TTL
+    (งานที่ล้มเหลวจะถูกสั่งใหม่เมื่อ client poll หลังหมดเวลา)
+    """
+    from .tasks import render_invoice_pdf
+
+    if not cache.add(pending_key(order), 1, get_pdf_settings()['PENDING_TTL']):
+        return False
+    transaction.on_commit(lambda: render_invoice_pdf.delay(order.pk))
+    return True
+
+
+def generate_order_pdf(order):
+    """สร้าง PDF สำหรับคำสั่งซื้อ (คืนค่า BytesIO เหมือนเดิม)"""
+    return io.BytesIO(get_order_pdf(order))
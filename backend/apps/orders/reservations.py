@@ -0,0 +1,395 @@
+"""
+===========================================
+Orders App - Stock Reservations
+===========================================
+จองสต็อกแบบมีเวลาหมดอายุ สำหรับ flash sale ที่คนจำนวนมากแย่งสินค้าจำนวนน้อย
+
+ลำดับการทำงาน:
+    1. reserve()   ผ่าน stock gate (ตัวนับใน memory / Redis) ก่อน ถ้าหมดตอบกลับทันทีโดยไม่แตะแถว Product
+                   จากนั้นตัดสต็อกจริงด้วย reserve_stock() และบันทึก StockReservation (active, หมดอายุใน TTL)
+                   (คิว checkout ของสินค้า sale_mode จองทีละชุดด้วย reserve_many())
+    2. checkout    ผูกการจองกับ Order: COD ยืนยันทันที (committed)
+                   ชำระล่วงหน้ายัง active ต่อ และขยายเวลาเป็น PAYMENT_TTL เพื่อรอชำระเงิน
+    3. ชำระเงิน     commit_order_reservations() เปลี่ยนเป็น committed
+    4. คืนสต็อก     release_reservations() เมื่อยกเลิก Order (รวมการจองที่ยืนยันแล้ว) หรือ Celery sweeper
+                   เจอการจองที่หมดอายุ
+                   (Order ที่ยังไม่ชำระของการจองที่หมดอายุจะถูกยกเลิกด้วย)
+
+stock gate เป็นเพียงด่านกรองเพื่อลดภาระฐานข้อมูล ค่าจริงอยู่ที่ Product.stock เสมอ
+ตัวนับจะโหลดใหม่จากฐานข้อมูลทุก GATE_TTL วินาที และถูกล้างเมื่อมีการคืนสต็อกหรือ seller แก้สต็อก
+
+ตั้งค่าใน settings.STOCK_RESERVATION:
+    TTL            วินาทีที่จองไว้ระหว่าง checkout
+    PAYMENT_TTL    วินาทีที่รอชำระเงินหลังสร้าง Order (ชำระล่วงหน้า)
+    GATE_BACKEND   'memory' (ต่อ process) หรือ 'redis' (ใช้ร่วมกันทุก worker)
+    GATE_TTL       วินาทีก่อนโหลดตัวนับใหม่จากฐานข้อมูล
+    SWEEP_BATCH    จำนวนการจองที่คืนต่อรอบของ sweeper
+"""
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from apps.products.cache import bump_products
+from apps.products.models import Product
+
+from .fulfilment import sync_seller_orders
+from .models import Order, StockReservation
+from .stock import StockError, check_stock, decrement_stock, lock_products, reserve_stock
+
+
+def get_reservation_settings():
+    config = {
+        'TTL': 600,
+        'PAYMENT_TTL': 1800,
+        'GATE_BACKEND': 'memory',
+        'GATE_TTL': 30,
+        'SWEEP_BATCH': 500,
+    }
+    config.update(getattr(settings, 'STOCK_RESERVATION', {}))
+    return config
+
+
+# ===========================================
+# Stock gate
+# ===========================================
+class MemoryStockGate:
+    """ตัวนับสต็อกคงเหลือในหน่วยความจำของ process"""
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counters = {}  # product_id -> [คงเหลือ, หมดอายุเมื่อ (monotonic)]
+
+    def acquire(self, quantities, load_stock):
+        """
+        หักตัวนับของทุกสินค้าพร้อมกัน (all-or-nothing)
+        คืนค่า list ของ product_id ที่ไม่พอ (ว่าง = ผ่าน)
+        """
+        now = time.monotonic()
+        with self._lock:
+            missing = [
+                product_id for product_id in quantities
+                if product_id not in self._counters or self._counters[product_id][1] <= now
+            ]
+        loaded = load_stock(missing) if missing else {}
+
+        with self._lock:
+            for product_id in missing:
+                entry = self._counters.get(product_id)
+                if entry is None or entry[1] <= now:
+                    self._counters[product_id] = [loaded.get(product_id, 0), now + self.ttl]
+            counters = {
+                product_id: self._counters.setdefault(product_id, [loaded.get(product_id, 0), now + self.ttl])
+                for product_id in quantities
+            }
+            short = [product_id for product_id, quantity in quantities.items() if counters[product_id][0] < quantity]
+            if short:
+                return short
+            for product_id, quantity in quantities.items():
+                counters[product_id][0] -= quantity
+        return []
+
+    def give_back(self, quantities):
+        """คืนตัวนับ (เมื่อการจองในฐานข้อมูลไม่สำเร็จ)"""
+        with self._lock:
+            for product_id, quantity in quantities.items():
+                if product_id in self._counters:
+                    self._counters[product_id][0] += quantity
+
+    def reset(self, product_ids):
+        """ล้างตัวนับ ให้โหลดใหม่จากฐานข้อมูลครั้งถัดไป"""
+        with self._lock:
+            for product_id in product_ids:
+                self._counters.pop(product_id, None)
+
+
+class RedisStockGate:
+    """ตัวนับสต็อกใน Redis ใช้ร่วมกันทุก gunicorn worker และ Celery"""
+
+    key = 'stock_gate:{product_id}'
+
+    # ตรวจและหักทุก key แบบ atomic: คืน 0 = สำเร็จ, i > 0 = key ที่ i ไม่พอ, -i = key ที่ i ยังไม่มี
+    acquire_script = """
+        for i, key in ipairs(KEYS) do
+            local value = redis.call('GET', key)
+            if not value then return -i end
+            if tonumber(value) < tonumber(ARGV[i]) then return i end
+        end
+        for i, key in ipairs(KEYS) do
+            redis.call('DECRBY', key, ARGV[i])
+        end
+        return 0
+    """
+    give_back_script = """
+        for i, key in ipairs(KEYS) do
+            if redis.call('EXISTS', key) == 1 then
+                redis.call('INCRBY', key, ARGV[i])
+            end
+        end
+        return 0
+    """
+
+    def __init__(self, url, ttl=30):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self._acquire = self.client.register_script(self.acquire_script)
+        self._give_back = self.client.register_script(self.give_back_script)
+
+    def keys_for(self, product_ids):
+        return [self.key.format(product_id=product_id) for product_id in product_ids]
+
+    def acquire(self, quantities, load_stock):
+        product_ids = list(quantities)
+        keys = self.keys_for(product_ids)
+        amounts = [quantities[product_id] for product_id in product_ids]
+
+        for _ in range(2):
+            result = self._acquire(keys=keys, args=amounts)
+            if result == 0:
+                return []
+            if result > 0:
+                return [product_ids[result - 1]]
+            # มีตัวนับที่ยังไม่ได้โหลด: โหลดทุกตัวที่ขาดในครั้งเดียวแล้วลองใหม่
+            existing = self.client.mget(keys)
+            missing = [product_id for product_id, value in zip(product_ids, existing) if value is None]
+            loaded = load_stock(missing)
+            pipe = self.client.pipeline()
+            for product_id in missing:
+                pipe.set(self.key.format(product_id=product_id), loaded.get(product_id, 0), nx=True, ex=self.ttl)
+            pipe.execute()
+        return product_ids
+
+    def give_back(self, quantities):
+        product_ids = list(quantities)
+        self._give_back(keys=self.keys_for(product_ids), args=[quantities[p] for p in product_ids])
+
+    def reset(self, product_ids):
+        if product_ids:
+            self.client.delete(*self.keys_for(product_ids))
+
+
+@lru_cache(maxsize=None)
+def get_stock_gate():
+    config = get_reservation_settings()
+    if config['GATE_BACKEND'] == 'redis':
+        return RedisStockGate(settings.REDIS_URL, ttl=config['GATE_TTL'])
+    return MemoryStockGate(ttl=config['GATE_TTL'])
+
+
+def load_available_stock(product_ids):
+    """สต็อกคงเหลือจากฐานข้อมูล (ใช้ตอนโหลดตัวนับ) query เดียว"""
+    return dict(
+        Product.objects.filter(pk__in=product_ids, is_active=True).values_list('pk', 'stock')
+    )
+
+
+# ===========================================
+# Reservations
+# ===========================================
+def merge_quantities(items):
+    """[{'product_id', 'quantity'}, ...] -> {product_id: จำนวนรวม}"""
+    quantities = defaultdict(int)
+    for item in items:
+        quantities[item['product_id']] += item['quantity']
+    return dict(quantities)
+
+
+def reserve(buyer, quantities, ttl=None):
+    """
+    จองสต็อก {product_id: quantity} ให้ buyer
+    คืนค่า (token, {product_id: Product}) หรือ raise StockError
+    """
+    gate = get_stock_gate()
+    short = gate.acquire(quantities, load_available_stock)
+    if short:
+        # สินค้าหมดตาม gate: อ่านแบบไม่ล็อกเพื่อแจ้งรายละเอียด โดยไม่ต้องรอล็อกแถว Product
+        products = Product.objects.in_bulk(short)
+        errors = check_stock(products, {product_id: quantities[product_id] for product_id in short})
+        if errors:
+            raise StockError(errors)
+        # ตัวนับเก่ากว่าฐานข้อมูล (เช่น seller เพิ่มสต็อก): โหลดใหม่แล้วจองตามปกติ
+        gate.reset(short)
+        if gate.acquire(quantities, load_available_stock):
+            raise StockError([
+                {'product_id': product_id, 'message': f'สินค้า {product_id} มีไม่พอ'} for product_id in short
+            ])
+
+    try:
+        with transaction.atomic():
+            products = reserve_stock(quantities)
+            token = uuid.uuid4()
+            expires_at = timezone.now() + timedelta(seconds=ttl or get_reservation_settings()['TTL'])
+            StockReservation.objects.bulk_create([
+                StockReservation(
+                    token=token,
+                    buyer=buyer,
+                    product_id=product_id,
+                    quantity=quantity,
+                    expires_at=expires_at,
+                )
+                for product_id, quantity in quantities.items()
+            ])
+    except StockError:
+        # gate ไม่ตรงกับฐานข้อมูล: โหลดตัวนับใหม่
+        gate.reset(list(quantities))
+        raise
+    except Exception:
+        gate.give_back(quantities)
+        raise
+
+    return token, products
+
+
+def reserve_many(requests, ttl=None):
+    """
+    จองสต็อกให้หลายคำขอใน transaction ของผู้เรียก (ใช้โดยคิว checkout)
+    requests = [(buyer, {product_id: quantity}), ...] จัดสรรตามลำดับที่ส่งมา
+
+    ล็อกสินค้าของทุกคำขอครั้งเดียวเรียงตาม id (ลำดับเดียวกับ checkout ปกติ) ตรวจสต็อกในหน่วยความจำ
+    แล้วตัดสต็อกรวมของคำขอที่ผ่านด้วย UPDATE เดียว ไม่ผ่าน stock gate (ตัวนับถูกล้างหลัง commit)
+    คืนค่า list ที่ตรงกับ requests: token ของการจอง หรือ StockError ของคำขอที่สต็อกไม่พอ
+    """
+    if not transaction.get_connection().in_atomic_block:
+        raise RuntimeError('reserve_many() must be called inside transaction.atomic()')
+
+    products = lock_products({product_id for _, quantities in requests for product_id in quantities})
+    expires_at = timezone.now() + timedelta(seconds=ttl or get_reservation_settings()['TTL'])
+    totals = defaultdict(int)
+    reservations = []
+    results = []
+    for buyer, quantities in requests:
+        errors = check_stock(products, quantities)
+        if errors:
+            results.append(StockError(errors))
+            continue
+        token = uuid.uuid4()
+        for product_id, quantity in quantities.items():
+            # หักในหน่วยความจำก่อน คำขอถัดไปจึงเห็นสต็อกที่เหลือจริง
+            products[product_id].stock -= quantity
+            totals[product_id] += quantity
+            reservations.append(StockReservation(
+                token=token, buyer=buyer, product_id=product_id, quantity=quantity, expires_at=expires_at,
+            ))
+        results.append(token)
+
+    if totals:
+        for product_id, quantity in totals.items():
+            products[product_id].stock += quantity
+        decrement_stock(products, totals)
+        StockReservation.objects.bulk_create(reservations)
+        product_ids = list(totals)
+        transaction.on_commit(lambda: get_stock_gate().reset(product_ids))
+        bump_products(*product_ids)
+    return results
+
+
+def attach_reservations(token, order):
+    """
+    ผูกการจองกับ Order ที่สร้างแล้ว
+    COD ยืนยันทันที ส่วนการชำระล่วงหน้ารอ mock_payment ภายใน PAYMENT_TTL
+    """
+    reservations = StockReservation.objects.filter(token=token, status=StockReservation.Status.ACTIVE)
+    if order.payment_method == Order.PaymentMethod.COD:
+        return reservations.update(order=order, status=StockReservation.Status.COMMITTED)
+    payment_ttl = get_reservation_settings()['PAYMENT_TTL']
+    return reservations.update(order=order, expires_at=timezone.now() + timedelta(seconds=payment_ttl))
+
+
+@transaction.atomic
+def commit_order_reservations(order):
+    """
+    ยืนยันการจองของ Order (ตอนชำระเงิน)
+    ข้ามการจองของ seller ที่ยกเลิกส่วนของตัวเองไปแล้ว (ถูกคืนสต็อกตอนยกเลิก)
+    คืนค่า False ถ้าการจองที่เหลือถูกคืนสต็อกไปแล้ว (หมดเวลาชำระ) หรือทุกส่วนถูกยกเลิก
+    """
+    cancelled_sellers = set(
+        order.seller_orders.filter(status=Order.Status.CANCELLED).values_list('seller_id', flat=True)
+    )
+    locked = list(order.reservations.select_related('product').select_for_update(of=('self',)).order_by('pk'))
+    reservations = [
+        reservation for reservation in locked if reservation.product.seller_id not in cancelled_sellers
+    ]
+    if locked and not reservations:
+        # ทุก seller ยกเลิกส่วนของตัวเองแล้ว
+        return False
+    if any(reservation.status == StockReservation.Status.RELEASED for reservation in reservations):
+        return False
+    StockReservation.objects.filter(
+        pk__in=[reservation.pk for reservation in reservations],
+        status=StockReservation.Status.ACTIVE,
+    ).update(status=StockReservation.Status.COMMITTED)
+    return True
+
+
+@transaction.atomic
+def release_reservations(queryset, cancel_orders=False, include_committed=False):
+    """
+    คืนสต็อกของการจองที่ยัง active ใน queryset
+    cancel_orders=True: ยกเลิก Order ที่ยังไม่ชำระของการจองเหล่านั้นด้วย (ใช้โดย sweeper)
+    include_committed=True: คืนการจองที่ยืนยันแล้วด้วย (ยกเลิก Order แบบ COD / ชำระแล้ว)
+    คืนค่าจำนวนการจองที่คืนสต็อก
+    """
+    statuses = [StockReservation.Status.ACTIVE]
+    if include_committed:
+        statuses.append(StockReservation.Status.COMMITTED)
+    reservations = list(
+        queryset.select_for_update().filter(status__in=statuses).order_by('pk')
+    )
+    if not reservations:
+        return 0
+
+    totals = defaultdict(int)
+    for reservation in reservations:
+        totals[reservation.product_id] += reservation.quantity
+
+    # ล็อกสินค้าตามลำดับ id เดียวกับ checkout เพื่อไม่ให้เกิด deadlock
+    lock_products(totals)
+    Product.objects.filter(pk__in=totals).update(stock=F('stock') + Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in totals.items()],
+        output_field=IntegerField(),
+    ))
+    StockReservation.objects.filter(pk__in=[reservation.pk for reservation in reservations]).update(
+        status=StockReservation.Status.RELEASED
+    )
+
+    if cancel_orders:
+        order_ids = {reservation.order_id for reservation in reservations if reservation.order_id}
+        unpaid = list(Order.objects.filter(
+            pk__in=order_ids, status=Order.Status.PENDING, payment_status=False
+        ).values_list('pk', flat=True))
+        if unpaid:
+            Order.objects.filter(pk__in=unpaid).update(status=Order.Status.CANCELLED, updated_at=timezone.now())
+            sync_seller_orders(unpaid, Order.Status.CANCELLED)
+
+    product_ids = list(totals)
+    transaction.on_commit(lambda: get_stock_gate().reset(product_ids))
+    bump_products(*product_ids)
+    return len(reservations)
+
+
+def release_expired_reservations(now=None, batch_size=None):
+    """คืนสต็อกของการจองที่หมดอายุทั้งหมด (ทีละชุด) คืนค่าจำนวนที่คืน"""
+    now = now or timezone.now()
+    batch_size = batch_size or get_reservation_settings()['SWEEP_BATCH']
+    expired = StockReservation.objects.filter(status=StockReservation.Status.ACTIVE, expires_at__lte=now)
+
+    total = 0
+    while True:
+        ids = list(expired.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        released = release_reservations(StockReservation.objects.filter(pk__in=ids), cancel_orders=True)
+        if not released:
+            break
+        total += released
+    return total
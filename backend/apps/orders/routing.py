@@ -0,0 +1,11 @@
+"""
+===========================================
+Orders WebSocket Routing
+===========================================
+"""
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(r'ws/orders/tickets/(?P<ticket_id>[0-9a-f-]{36})/$', consumers.CheckoutTicketConsumer.as_asgi()),
+]
@@ -4,11 +4,15 @@ Orders App - Serializers
 ===========================================
 """
 from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 
 from apps.products.models import Product
 
-from .models import Order, OrderItem
+from .fulfilment import build_seller_orders
+from .models import Order, OrderItem, SellerOrder, StockReservation
+from .reservations import attach_reservations, merge_quantities, reserve
+from .stock import StockError
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -32,17 +36,16 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['product_name', 'product_price', 'total', 'seller']
     
     def get_product_image(self, obj):
-        if obj.product and obj.product.images.exists():
-            return obj.product.images.first().image_url
-        return None
+        return obj.product_image_url or None
     
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        if instance.product:
+        # ใช้ข้อมูล snapshot ตอนสั่งซื้อ ไม่ต้องโหลด product
+        if instance.product_id:
             data['product'] = {
-                'id': instance.product.id,
-                'name': instance.product.name,
-                'slug': instance.product.slug
+                'id': instance.product_id,
+                'name': instance.product_name,
+                'slug': instance.product_slug
             }
         return data
 
@@ -65,16 +68,26 @@ class OrderListSerializer(serializers.ModelSerializer):
         ]
     
     def get_items_count(self, obj):
-        return obj.items.count()
+        # นับจากรายการที่ prefetch ไว้ (Order.objects.for_display) ไม่ COUNT ต่อ order
+        return len(obj.items.all())
     
     def get_total_amount(self, obj):
         return obj.total
 
 
+class SellerOrderSerializer(serializers.ModelSerializer):
+    """Serializer สำหรับส่วนของคำสั่งซื้อแยกตามผู้ขาย"""
+    
+    class Meta:
+        model = SellerOrder
+        fields = ['id', 'seller', 'subtotal', 'items_count', 'status', 'updated_at']
+
+
 class OrderDetailSerializer(serializers.ModelSerializer):
     """Serializer สำหรับรายละเอียดคำสั่งซื้อ"""
     
     items = OrderItemSerializer(many=True, read_only=True)
+    seller_orders = SellerOrderSerializer(many=True, read_only=True)
     buyer_email = serializers.CharField(source='buyer.email', read_only=True)
     buyer_name = serializers.SerializerMethodField()
     total_amount = serializers.SerializerMethodField()
@@ -86,7 +99,7 @@ class OrderDetailSerializer(serializers.ModelSerializer):
             'shipping_name', 'shipping_phone', 'shipping_address',
             'payment_method', 'payment_status',
             'subtotal', 'shipping_fee', 'total', 'total_amount',
-            'notes', 'items', 'created_at', 'updated_at'
+            'notes', 'items', 'seller_orders', 'created_at', 'updated_at'
         ]
         read_only_fields = ['order_number', 'buyer', 'subtotal', 'total']
     
@@ -99,23 +112,27 @@ class OrderDetailSerializer(serializers.ModelSerializer):
         return obj.total
 
 
-class CreateOrderSerializer(serializers.Serializer):
-    """Serializer สำหรับสร้างคำสั่งซื้อ (checkout)"""
-    
-    shipping_name = serializers.CharField(max_length=100)
-    shipping_phone = serializers.CharField(max_length=20)
-    shipping_address = serializers.CharField()
-    payment_method = serializers.ChoiceField(choices=Order.PaymentMethod.choices)
-    notes = serializers.CharField(required=False, allow_blank=True)
+def out_of_stock_error(error):
+    """StockError -> ValidationError ที่แจ้งทุกรายการที่ไม่พอ"""
+    return serializers.ValidationError({
+        'items': [item['message'] for item in error.errors],
+        'out_of_stock': error.errors,
+    })
+
+
+class ReserveStockSerializer(serializers.Serializer):
+    """Serializer สำหรับจองสต็อกก่อน checkout"""
     
-    # Cart items
     items = serializers.ListField(
         child=serializers.DictField(),
         min_length=1
     )
     
     def validate_items(self, items):
-        """ตรวจสอบสินค้าในตะกร้า"""
+        """
+        ตรวจรูปแบบสินค้าในตะกร้า (สต็อกตรวจตอนจอง หลังล็อกสินค้าแล้ว)
+        คืนค่า list ของ {'product_id', 'quantity'}
+        """
         validated_items = []
         
         for item in items:
@@ -127,30 +144,93 @@ class CreateOrderSerializer(serializers.Serializer):
                 raise serializers.ValidationError('product_id is required')
             
             try:
-                product = Product.objects.get(id=product_id, is_active=True)
-            except Product.DoesNotExist:
-                raise serializers.ValidationError(f'Product {product_id} not found')
+                product_id = int(product_id)
+                quantity = int(quantity)
+            except (TypeError, ValueError):
+                raise serializers.ValidationError('product_id และ quantity ต้องเป็นตัวเลข')
             
-            if product.stock < quantity:
-                raise serializers.ValidationError(
-                    f'สินค้า {product.name} มีไม่พอ (เหลือ {product.stock} ชิ้น)'
-                )
+            if quantity < 1:
+                raise serializers.ValidationError('จำนวนสินค้าต้องมากกว่า 0')
             
             validated_items.append({
-                'product': product,
+                'product_id': product_id,
                 'quantity': quantity
             })
         
         return validated_items
     
+    def reserve(self):
+        """จองสต็อก คืนค่า (token, {product_id: Product}) หรือ raise ValidationError ถ้าสต็อกไม่พอ"""
+        quantities = merge_quantities(self.validated_data['items'])
+        try:
+            return reserve(self.context['request'].user, quantities)
+        except StockError as e:
+            raise out_of_stock_error(e)
+
+
+class CreateOrderSerializer(ReserveStockSerializer):
+    """
+    Serializer สำหรับสร้างคำสั่งซื้อ (checkout)
+    ส่ง reservation_token จาก POST /api/orders/reserve/ หรือส่ง items เพื่อจองและสั่งซื้อในครั้งเดียว
+    """
+    
+    shipping_name = serializers.CharField(max_length=100)
+    shipping_phone = serializers.CharField(max_length=20)
+    shipping_address = serializers.CharField()
+    payment_method = serializers.ChoiceField(choices=Order.PaymentMethod.choices)
+    notes = serializers.CharField(required=False, allow_blank=True)
+    reservation_token = serializers.UUIDField(required=False)
+    
+    # Cart items (ไม่ต้องส่งถ้ามี reservation_token)
+    items = serializers.ListField(
+        child=serializers.DictField(),
+        min_length=1,
+        required=False
+    )
+    
+    def validate(self, attrs):
+        if not attrs.get('reservation_token') and not attrs.get('items'):
+            raise serializers.ValidationError({'items': ['ต้องระบุสินค้าหรือ reservation_token']})
+        return attrs
+    
+    def claim_reservation(self, token):
+        """ล็อกการจองที่ยังไม่หมดอายุของผู้ใช้ คืนค่า ({product_id: quantity}, {product_id: Product})"""
+        reservations = list(
+            StockReservation.objects.select_related('product__seller')
+            .select_for_update(of=('self',))
+            .filter(
+                token=token,
+                buyer=self.context['request'].user,
+                status=StockReservation.Status.ACTIVE,
+                order__isnull=True,
+                expires_at__gt=timezone.now(),
+            )
+        )
+        if not reservations:
+            raise serializers.ValidationError({'reservation_token': ['การจองหมดอายุหรือถูกใช้ไปแล้ว']})
+        
+        quantities = merge_quantities(
+            {'product_id': reservation.product_id, 'quantity': reservation.quantity}
+            for reservation in reservations
+        )
+        products = {reservation.product_id: reservation.product for reservation in reservations}
+        return quantities, products
+    
     @transaction.atomic
     def create(self, validated_data):
         """สร้างคำสั่งซื้อ"""
-        items_data = validated_data.pop('items')
         user = self.context['request'].user
         
-        # สร้าง Order
-        order = Order.objects.create(
+        # ใช้การจองเดิม หรือจองสต็อกใหม่ (รวมจำนวนของสินค้าเดียวกัน ล็อก + ตัดสต็อก) ก่อนสร้าง Order
+        token = validated_data.get('reservation_token')
+        if token:
+            quantities, products = self.claim_reservation(token)
+        else:
+            token, products = self.reserve()
+            quantities = merge_quantities(validated_data['items'])
+        
+        # คำนวณยอดรวมในหน่วยความจำ แล้ว INSERT Order ครั้งเดียว
+        order = Order(
             buyer=user,
             shipping_name=validated_data['shipping_name'],
             shipping_phone=validated_data['shipping_phone'],
@@ -159,27 +239,31 @@ class CreateOrderSerializer(serializers.Serializer):
             notes=validated_data.get('notes', ''),
             shipping_fee=40  # ค่าส่งคงที่ 40 บาท
         )
-        
-        # สร้าง OrderItems และลด stock
-        for item_data in items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
-            
-            OrderItem.objects.create(
+        items = [
+            OrderItem(
                 order=order,
-                product=product,
-                seller=product.seller,
-                product_name=product.name,
-                product_price=product.price,
-                quantity=quantity
+                product=products[product_id],
+                seller=products[product_id].seller,
+                product_name=products[product_id].name,
+                product_price=products[product_id].price,
+                product_slug=products[product_id].slug,
+                product_image_url=products[product_id].main_image_url,
+                quantity=quantity,
+                total=products[product_id].price * quantity
             )
-            
-            # ลด stock
-            product.stock -= quantity
-            product.save(update_fields=['stock'])
+            for product_id, quantity in quantities.items()
+        ]
+        order.subtotal = sum(item.total for item in items)
+        order.total = order.subtotal + order.shipping_fee
+        order.save()
         
-        # คำนวณยอดรวม
-        order.calculate_totals()
+        # สร้าง OrderItems ทั้งหมดด้วย INSERT เดียว (สต็อกถูกตัดไปแล้วตอนจอง)
+        OrderItem.objects.bulk_create(items)
+        # ส่วนของแต่ละ seller (หนึ่งแถวต่อ seller) ด้วย INSERT เดียว
+        seller_orders = SellerOrder.objects.bulk_create(build_seller_orders(order, items))
+        attach_reservations(token, order)
+        # ให้ response ใช้รายการที่มีอยู่แล้ว ไม่ต้อง query items/product ซ้ำ
+        order._prefetched_objects_cache = {'items': items, 'seller_orders': seller_orders}
         
         # ส่ง notification แบบ sync (ไม่ใช้ Celery)
         try:
@@ -219,4 +303,20 @@ class MockPaymentSerializer(serializers.Serializer):
         if order.payment_status:
             raise serializers.ValidationError('Order already paid')
         
-        return value
\ No newline at end of file
+        return value
+
+
+class InvoiceExportSerializer(serializers.Serializer):
+    """Serializer สำหรับ export ใบสั่งซื้อหลายใบ (ระบุ order_ids หรือช่วงวันที่)"""
+    
+    order_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    background = serializers.BooleanField(default=False)
+    
+    def validate(self, attrs):
+        if not attrs.get('order_ids') and not attrs.get('date_from') and not attrs.get('date_to'):
+            raise serializers.ValidationError('กรุณาระบุ order_ids หรือช่วงวันที่')
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError({'date_to': 'วันที่สิ้นสุดต้องไม่ก่อนวันที่เริ่มต้น'})
+        return attrs
@@ -0,0 +1,21 @@
+"""
+===========================================
+Orders App - Signals
+===========================================
+"""
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.products.models import Product
+
+from .reservations import get_stock_gate
+
+
+@receiver(post_save, sender=Product)
+def reset_stock_gate(sender, instance, update_fields=None, **kwargs):
+    """seller แก้สต็อก: ล้างตัวนับของ stock gate ให้โหลดค่าใหม่จากฐานข้อมูล"""
+    if update_fields is not None and 'stock' not in update_fields:
+        return
+    product_id = instance.pk
+    transaction.on_commit(lambda: get_stock_gate().reset([product_id]))
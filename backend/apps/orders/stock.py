@@ -0,0 +1,95 @@
+"""
+===========================================
+Orders App - Stock
+===========================================
+ตัดสต็อกตอน checkout แบบไม่ขายเกิน (oversell) เมื่อมีคนสั่งพร้อมกัน
+
+- ล็อกสินค้าทุกรายการในตะกร้าด้วย SELECT ... FOR UPDATE ครั้งเดียว เรียงตาม id
+  (ทุก checkout ล็อกตามลำดับเดียวกัน จึงไม่เกิด deadlock)
+- ตรวจสต็อกจากค่าที่ล็อกไว้ ถ้าไม่พอตอบกลับทุกรายการที่ไม่พอทันที
+- ลดสต็อกทุกรายการด้วย UPDATE เดียว: SET stock = stock - CASE id ... WHERE (id = a AND stock >= qa) OR ...
+  และตรวจว่าจำนวนแถวที่อัพเดทเท่ากับจำนวนสินค้า
+
+ต้องเรียกภายใน transaction.atomic()
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from apps.products.cache import bump_products
+from apps.products.models import Product
+
+
+class StockError(Exception):
+    """สต็อกไม่พอหรือสินค้าไม่พร้อมขาย errors = [{'product_id', 'message', ...}]"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(error['message'] for error in errors))
+
+
+def lock_products(product_ids):
+    """ล็อกสินค้าที่ระบุ (เรียงตาม id) พร้อมโหลด seller ใน query เดียว คืนค่า {product_id: Product}"""
+    products = (
+        Product.objects.select_related('seller')
+        .select_for_update(of=('self',))
+        .filter(pk__in=product_ids)
+        .order_by('pk')
+    )
+    return {product.pk: product for product in products}
+
+
+def check_stock(products, quantities):
+    """คืนรายการ error ของสินค้าที่ไม่พบ/ปิดการขาย/สต็อกไม่พอ"""
+    errors = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None or not product.is_active:
+            errors.append({
+                'product_id': product_id,
+                'message': f'Product {product_id} not found',
+            })
+        elif product.stock < quantity:
+            errors.append({
+                'product_id': product_id,
+                'message': f'สินค้า {product.name} มีไม่พอ (เหลือ {product.stock} ชิ้น)',
+                'requested': quantity,
+                'available': product.stock,
+            })
+    return errors
+
+
+def decrement_stock(products, quantities):
+    """ลดสต็อกทุกรายการด้วย UPDATE เดียวแบบมีเงื่อนไข และอัพเดทค่าใน object ให้ตรงกับฐานข้อมูล"""
+    items = sorted(quantities.items())
+    guard = reduce(or_, [Q(pk=product_id, stock__gte=quantity) for product_id, quantity in items])
+    amount = Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in items],
+        output_field=IntegerField(),
+    )
+    updated = Product.objects.filter(guard).update(stock=F('stock') - amount)
+    if updated != len(items):
+        # ไม่ควรเกิดเมื่อถือล็อกอยู่ แต่กันไว้ไม่ให้ขายเกิน (transaction ของผู้เรียกจะ rollback)
+        raise StockError([{'product_id': None, 'message': 'สินค้าบางรายการมีไม่พอ'}])
+    for product_id, quantity in items:
+        products[product_id].stock -= quantity
+
+
+def reserve_stock(quantities):
+    """
+    ล็อก ตรวจ และตัดสต็อกสำหรับ {product_id: quantity}
+    คืนค่า {product_id: Product} (ค่า stock เป็นค่าหลังตัดแล้ว) หรือ raise StockError
+    """
+    if not transaction.get_connection().in_atomic_block:
+        raise RuntimeError('reserve_stock() must be called inside transaction.atomic()')
+
+    products = lock_products(quantities.keys())
+    errors = check_stock(products, quantities)
+    if errors:
+        raise StockError(errors)
+    decrement_stock(products, quantities)
+    # UPDATE ตรงไม่ส่ง post_save: ให้ cache ของหน้าสินค้าแสดงสต็อกใหม่
+    bump_products(*quantities)
+    return products
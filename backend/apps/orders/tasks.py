@@ -0,0 +1,78 @@
+"""
+===========================================
+Orders App - Celery Tasks
+===========================================
+"""
+import logging
+
+from celery import shared_task
+from django.core.cache import cache
+
+from .checkout_queue import process_queue, stale_queues
+from .invoice_export import run_export
+from .models import InvoiceExport, Order
+from .pdf_generator import get_order_pdf, pending_key
+from .reservations import release_expired_reservations as release_expired
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def release_expired_reservations():
+    """
+    Celery Task: คืนสต็อกของการจองที่หมดอายุ และยกเลิกคำสั่งซื้อที่ไม่ชำระภายในเวลา (รันเป็น periodic task)
+    """
+    released = release_expired()
+    if released:
+        logger.info(f"[Celery Task] Released {released} expired stock reservations")
+    return released
+
+
+@shared_task
+def process_checkout_queue(product_id):
+    """
+    Celery Task: สร้าง Order ให้ checkout ที่เข้าคิวของสินค้า sale_mode (route ไปที่ queue 'checkout')
+    """
+    processed = process_queue(product_id)
+    if processed:
+        logger.info(f"[Celery Task] Processed {processed} checkout tickets for product {product_id}")
+    return processed
+
+
+@shared_task
+def drain_checkout_queues():
+    """
+    Celery Task: ปลุกคิวของสินค้าที่มี ticket ค้าง (task เดิมหายหรือ worker ล่ม) รันเป็น periodic task
+    """
+    product_ids = stale_queues()
+    for product_id in product_ids:
+        process_checkout_queue.delay(product_id)
+    return len(product_ids)
+
+
+@shared_task
+def export_invoices(export_id):
+    """
+    Celery Task: สร้างไฟล์ ZIP ของใบสั่งซื้อหลายใบ (ชุดที่ใหญ่เกินจะ stream ใน request)
+    """
+    export = InvoiceExport.objects.get(pk=export_id)
+    run_export(export)
+    logger.info(f"[Celery Task] Invoice export {export_id}: {export.status} ({export.done}/{export.total})")
+    return export.done
+
+
+@shared_task
+def render_invoice_pdf(order_id):
+    """
+    Celery Task: สร้าง PDF ของคำสั่งซื้อเก็บไว้ใน cache (โหมด async ของ download-pdf / view-pdf)
+    """
+    try:
+        order = Order.objects.for_display().get(pk=order_id)
+    except Order.DoesNotExist:
+        return False
+    try:
+        # ไฟล์ของ version นี้อาจถูกสร้างไปแล้ว (ดาวน์โหลดแบบปกติหรือ export) get_order_pdf จะใช้ไฟล์เดิม
+        get_order_pdf(order)
+    finally:
+        cache.delete(pending_key(order))
+    return True
@@ -3,15 +3,34 @@
 Orders App - Tests
 ===========================================
 """
+import importlib
+import threading
+import zipfile
+from io import BytesIO, StringIO
+from datetime import timedelta
+from types import SimpleNamespace
+
 import pytest
+from django.apps import apps
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from apps.products.models import Category, Product
+from apps.products.models import Category, Product, ProductImage
 
-from .models import Order
+from . import pdf_generator
+from .checkout_queue import process_queue
+from .idempotency import storage_key
+from .models import CheckoutTicket, InvoiceExport, Order, SellerOrder, StockReservation
+from .reservations import MemoryStockGate, release_expired_reservations, reserve
+from .stock import StockError, reserve_stock
+from .tasks import export_invoices, render_invoice_pdf
 
 User = get_user_model()
 
@@ -85,4 +104,861 @@ class TestCreateOrder:
         
         # ตรวจสอบว่า stock ลดลง
         product.refresh_from_db()
-        assert product.stock == 8
\ No newline at end of file
+        assert product.stock == 8
+    
+    def test_out_of_stock_reports_each_item(self, api_client, buyer_user, seller_user, category, product):
+        """ทดสอบสต็อกไม่พอ: แจ้งทุกรายการที่ไม่พอ ไม่สร้าง Order และไม่ตัดสต็อกรายการอื่น"""
+        low = Product.objects.create(seller=seller_user, category=category, name='Low', price=10, stock=1)
+        api_client.force_authenticate(user=buyer_user)
+        data = {
+            'shipping_name': 'Test User',
+            'shipping_phone': '0812345678',
+            'shipping_address': '123 Test Street',
+            'payment_method': 'cod',
+            'items': [
+                {'product_id': product.id, 'quantity': 2},
+                {'product_id': low.id, 'quantity': 3},
+            ]
+        }
+        
+        response = api_client.post(reverse('order-list'), data, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['items'] == ['สินค้า Low มีไม่พอ (เหลือ 1 ชิ้น)']
+        assert response.json()['out_of_stock'] == [
+            {
+                'product_id': str(low.id),
+                'message': 'สินค้า Low มีไม่พอ (เหลือ 1 ชิ้น)',
+                'requested': '3',
+                'available': '1',
+            }
+        ]
+        assert Order.objects.count() == 0
+        product.refresh_from_db()
+        assert product.stock == 10
+    
+    def test_duplicate_lines_are_merged(self, api_client, buyer_user, product):
+        """ทดสอบสินค้าเดียวกันหลายบรรทัดถูกรวมจำนวนก่อนตรวจสต็อก"""
+        api_client.force_authenticate(user=buyer_user)
+        data = {
+            'shipping_name': 'Test User',
+            'shipping_phone': '0812345678',
+            'shipping_address': '123 Test Street',
+            'payment_method': 'cod',
+            'items': [
+                {'product_id': product.id, 'quantity': 6},
+                {'product_id': product.id, 'quantity': 6},
+            ]
+        }
+        
+        response = api_client.post(reverse('order-list'), data, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        product.refresh_from_db()
+        assert product.stock == 10
+
+
+@pytest.mark.django_db
+class TestCheckoutQueries:
+    """ทดสอบ checkout ใช้จำนวน query คงที่ไม่ขึ้นกับจำนวนรายการในตะกร้า"""
+    
+    def checkout_queries(self, api_client, buyer_user, products):
+        api_client.force_authenticate(user=buyer_user)
+        data = {
+            'shipping_name': 'Test User',
+            'shipping_phone': '0812345678',
+            'shipping_address': '123 Test Street',
+            'payment_method': 'cod',
+            'items': [{'product_id': product.id, 'quantity': 2} for product in products]
+        }
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.post(reverse('order-list'), data, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        return len(context.captured_queries), response
+    
+    def test_constant_queries(self, api_client, buyer_user, seller_user, category):
+        """ทดสอบตะกร้า 1 รายการกับ 6 รายการใช้ query เท่ากัน และยอดรวมถูกต้อง"""
+        products = [
+            Product.objects.create(seller=seller_user, category=category, name=f'P{index}', price=100 + index, stock=5)
+            for index in range(6)
+        ]
+        
+        single, _ = self.checkout_queries(api_client, buyer_user, products[:1])
+        many, response = self.checkout_queries(api_client, buyer_user, products)
+        
+        assert many == single
+        order = Order.objects.get(pk=response.data['order']['id'])
+        assert order.subtotal == sum((100 + index) * 2 for index in range(6))
+        assert order.total == order.subtotal + 40
+        assert [item['total'] for item in response.data['order']['items']] == [
+            f'{(100 + index) * 2}.00' for index in range(6)
+        ]
+        assert set(Product.objects.values_list('stock', flat=True)) == {1, 3}
+
+
+@pytest.mark.django_db
+class TestReserveStock:
+    """ทดสอบการล็อกและตัดสต็อก"""
+    
+    def test_checks_current_database_stock(self, product):
+        """ทดสอบตรวจสต็อกจากค่าในฐานข้อมูลที่ล็อกไว้ ไม่ใช่ค่าที่อ่านไว้ก่อนหน้า"""
+        Product.objects.filter(pk=product.pk).update(stock=1)
+        
+        with pytest.raises(StockError) as error, transaction.atomic():
+            reserve_stock({product.pk: product.stock})
+        
+        assert error.value.errors[0]['available'] == 1
+    
+    @pytest.mark.django_db(transaction=True)
+    def test_requires_transaction(self, product):
+        """ทดสอบต้องเรียกภายใน transaction"""
+        with pytest.raises(RuntimeError):
+            reserve_stock({product.pk: 1})
+
+
+@pytest.mark.django_db
+class TestStockReservations:
+    """ทดสอบการจองสต็อกแบบมีเวลาหมดอายุ"""
+    
+    checkout_data = {
+        'shipping_name': 'Test User',
+        'shipping_phone': '0812345678',
+        'shipping_address': '123 Test Street',
+    }
+    
+    def test_reserve_then_checkout(self, api_client, buyer_user, product):
+        """ทดสอบจองสต็อกแล้ว checkout ด้วย reservation_token (COD ยืนยันการจองทันที)"""
+        api_client.force_authenticate(user=buyer_user)
+        
+        response = api_client.post(
+            reverse('order-reserve'), {'items': [{'product_id': product.id, 'quantity': 3}]}, format='json'
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['items'] == [{'product_id': product.id, 'quantity': 3}]
+        product.refresh_from_db()
+        assert product.stock == 7
+        
+        data = {**self.checkout_data, 'payment_method': 'cod', 'reservation_token': response.data['reservation_token']}
+        response = api_client.post(reverse('order-list'), data, format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        reservation = StockReservation.objects.get()
+        assert reservation.order_id == response.data['order']['id']
+        assert reservation.status == StockReservation.Status.COMMITTED
+        product.refresh_from_db()
+        assert product.stock == 7
+        
+        # ใช้ token ซ้ำไม่ได้
+        response = api_client.post(reverse('order-list'), data, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_sweeper_releases_expired(self, buyer_user, product):
+        """ทดสอบ sweeper คืนสต็อกของการจองที่หมดอายุ และ gate โหลดตัวนับใหม่"""
+        reserve(buyer_user, {product.pk: 10})
+        with pytest.raises(StockError):
+            reserve(buyer_user, {product.pk: 1})
+        
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        assert release_expired_reservations() == 1
+        
+        product.refresh_from_db()
+        assert product.stock == 10
+        assert StockReservation.objects.get().status == StockReservation.Status.RELEASED
+        reserve(buyer_user, {product.pk: 10})
+    
+    def test_unpaid_order_is_cancelled_on_expiry(self, api_client, buyer_user, product):
+        """ทดสอบคำสั่งซื้อที่ไม่ชำระภายในเวลาถูกยกเลิก คืนสต็อก และชำระเงินไม่ได้อีก"""
+        api_client.force_authenticate(user=buyer_user)
+        data = {
+            **self.checkout_data,
+            'payment_method': 'bank_transfer',
+            'items': [{'product_id': product.id, 'quantity': 2}],
+        }
+        order_id = api_client.post(reverse('order-list'), data, format='json').data['order']['id']
+        assert StockReservation.objects.get().status == StockReservation.Status.ACTIVE
+        
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        release_expired_reservations()
+        
+        order = Order.objects.get(pk=order_id)
+        assert order.status == Order.Status.CANCELLED
+        product.refresh_from_db()
+        assert product.stock == 10
+        response = api_client.post(reverse('order-mock-payment', args=[order_id]), {'success': True}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_cancelled_cod_order_restocks(self, api_client, buyer_user, seller_user, product):
+        """ทดสอบยกเลิก Order แบบ COD (การจองยืนยันแล้ว) คืนสต็อกครั้งเดียว"""
+        api_client.force_authenticate(user=buyer_user)
+        data = {**self.checkout_data, 'payment_method': 'cod', 'items': [{'product_id': product.id, 'quantity': 3}]}
+        order_id = api_client.post(reverse('order-list'), data, format='json').data['order']['id']
+        assert StockReservation.objects.get().status == StockReservation.Status.COMMITTED
+        
+        api_client.force_authenticate(user=seller_user)
+        url = reverse('order-update-status', args=[order_id])
+        assert api_client.post(url, {'status': 'cancelled'}, format='json').status_code == status.HTTP_200_OK
+        api_client.post(url, {'status': 'cancelled'}, format='json')
+        
+        product.refresh_from_db()
+        assert product.stock == 10
+        assert StockReservation.objects.get().status == StockReservation.Status.RELEASED
+    
+    def test_payment_commits_reservation(self, api_client, buyer_user, product):
+        """ทดสอบชำระเงินแล้วการจองไม่ถูก sweeper คืนสต็อก"""
+        api_client.force_authenticate(user=buyer_user)
+        data = {
+            **self.checkout_data,
+            'payment_method': 'bank_transfer',
+            'items': [{'product_id': product.id, 'quantity': 2}],
+        }
+        order_id = api_client.post(reverse('order-list'), data, format='json').data['order']['id']
+        
+        response = api_client.post(reverse('order-mock-payment', args=[order_id]), {'success': True}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        assert release_expired_reservations() == 0
+        product.refresh_from_db()
+        assert product.stock == 8
+    
+    def test_release_endpoint(self, api_client, buyer_user, product):
+        """ทดสอบยกเลิกการจองเองแล้วคืนสต็อกทันที"""
+        api_client.force_authenticate(user=buyer_user)
+        token = api_client.post(
+            reverse('order-reserve'), {'items': [{'product_id': product.id, 'quantity': 4}]}, format='json'
+        ).data['reservation_token']
+        
+        response = api_client.post(reverse('order-release-reservation'), {'reservation_token': token}, format='json')
+        
+        assert response.data == {'released': 1}
+        product.refresh_from_db()
+        assert product.stock == 10
+    
+    def test_gate_rejects_without_locking(self, buyer_user, product):
+        """ทดสอบ gate ตอบสินค้าหมดได้โดยไม่ล็อกแถว Product และรับรู้เมื่อ seller เพิ่มสต็อก"""
+        reserve(buyer_user, {product.pk: 10})
+        
+        with CaptureQueriesContext(connection) as context, pytest.raises(StockError) as error:
+            reserve(buyer_user, {product.pk: 1})
+        # อ่านรายละเอียดสินค้าครั้งเดียว ไม่ล็อก ไม่ตัดสต็อก ไม่สร้างการจอง
+        assert len(context.captured_queries) == 1
+        assert error.value.errors[0]['available'] == 0
+        
+        product.refresh_from_db()
+        product.stock = 5
+        product.save()
+        reserve(buyer_user, {product.pk: 5})
+    
+    def test_memory_gate_is_all_or_nothing(self):
+        """ทดสอบ gate หักตัวนับทุกสินค้าพร้อมกัน หรือไม่หักเลย"""
+        gate = MemoryStockGate()
+        
+        def load(product_ids):
+            return {1: 2, 2: 1}
+        
+        assert gate.acquire({1: 2, 2: 2}, load) == [2]
+        assert gate.acquire({1: 2, 2: 1}, load) == []
+        assert gate.acquire({1: 1}, load) == [1]
+        gate.give_back({1: 1})
+        assert gate.acquire({1: 1}, load) == []
+
+
+@pytest.mark.django_db
+class TestCheckoutQueue:
+    """ทดสอบคิว checkout ของสินค้า sale_mode"""
+    
+    def checkout(self, api_client, product, quantity=1):
+        data = {
+            'shipping_name': 'Test User',
+            'shipping_phone': '0812345678',
+            'shipping_address': '123 Test Street',
+            'payment_method': 'cod',
+            'items': [{'product_id': product.id, 'quantity': quantity}],
+        }
+        return api_client.post(reverse('order-list'), data, format='json')
+    
+    def test_sale_mode_checkout_is_queued(self, api_client, buyer_user, product):
+        """ทดสอบ checkout สินค้า sale_mode ได้ ticket กลับทันที แล้ว worker สร้าง Order"""
+        Product.objects.filter(pk=product.pk).update(sale_mode=True)
+        api_client.force_authenticate(user=buyer_user)
+        
+        response = self.checkout(api_client, product, quantity=2)
+        
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['status'] == CheckoutTicket.Status.QUEUED
+        assert Order.objects.count() == 0
+        product.refresh_from_db()
+        assert product.stock == 10
+        
+        assert process_queue(product.pk) == 1
+        
+        response = api_client.get(response.data['poll_url'])
+        assert response.data['status'] == CheckoutTicket.Status.SUCCEEDED
+        assert response.data['order']['items'][0]['quantity'] == 2
+        product.refresh_from_db()
+        assert product.stock == 8
+    
+    def test_batch_processes_in_arrival_order(self, api_client, buyer_user, seller_user, category):
+        """ทดสอบ worker สร้าง Order ตามลำดับที่เข้าคิว ticket ที่สต็อกไม่พอล้มเหลวโดยไม่กระทบ ticket อื่น"""
+        product = Product.objects.create(
+            seller=seller_user, category=category, name='Hot', price=10, stock=2, sale_mode=True
+        )
+        api_client.force_authenticate(user=buyer_user)
+        tickets = [self.checkout(api_client, product).data['ticket'] for _ in range(3)]
+        
+        process_queue(product.pk, batch_size=2)
+        
+        statuses = [CheckoutTicket.objects.get(pk=ticket).status for ticket in tickets]
+        assert statuses == ['succeeded', 'succeeded', 'failed']
+        assert 'out_of_stock' in CheckoutTicket.objects.get(pk=tickets[2]).errors
+        assert Order.objects.count() == 2
+        product.refresh_from_db()
+        assert product.stock == 0
+    
+    def test_batch_decrements_stock_once(self, api_client, buyer_user, seller_user, category, product):
+        """ทดสอบทั้งชุดตัดสต็อกของทุกสินค้าในตะกร้า (รวมสินค้าที่ไม่ได้เปิด sale) ด้วย UPDATE เดียว"""
+        hot = Product.objects.create(
+            seller=seller_user, category=category, name='Hot', price=10, stock=5, sale_mode=True
+        )
+        api_client.force_authenticate(user=buyer_user)
+        data = {
+            'shipping_name': 'Test User',
+            'shipping_phone': '0812345678',
+            'shipping_address': '123 Test Street',
+            'payment_method': 'cod',
+            'items': [{'product_id': hot.id, 'quantity': 1}, {'product_id': product.id, 'quantity': 2}],
+        }
+        for _ in range(3):
+            api_client.post(reverse('order-list'), data, format='json')
+        
+        with CaptureQueriesContext(connection) as context:
+            assert process_queue(hot.pk) == 3
+        
+        stock_updates = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "products_product" SET "stock"')
+        ]
+        assert len(stock_updates) == 1
+        assert set(CheckoutTicket.objects.values_list('status', flat=True)) == {'succeeded'}
+        assert dict(Product.objects.values_list('pk', 'stock')) == {hot.pk: 2, product.pk: 4}
+    
+    def test_reserve_blocked_during_sale(self, api_client, buyer_user, product):
+        """ทดสอบระหว่าง sale จองสินค้าล่วงหน้าไม่ได้ (ต้องผ่านคิว)"""
+        Product.objects.filter(pk=product.pk).update(sale_mode=True)
+        api_client.force_authenticate(user=buyer_user)
+        
+        response = api_client.post(
+            reverse('order-reserve'), {'items': [{'product_id': product.id, 'quantity': 1}]}, format='json'
+        )
+        
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert not StockReservation.objects.exists()
+        product.refresh_from_db()
+        assert product.stock == 10
+    
+    def test_ticket_visible_to_owner_only(self, api_client, buyer_user, seller_user, product):
+        """ทดสอบผู้อื่นดูผล ticket ไม่ได้"""
+        Product.objects.filter(pk=product.pk).update(sale_mode=True)
+        api_client.force_authenticate(user=buyer_user)
+        poll_url = self.checkout(api_client, product).data['poll_url']
+        
+        api_client.force_authenticate(user=seller_user)
+        response = api_client.get(poll_url)
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestIdempotency:
+    """ทดสอบ Idempotency-Key ของ checkout และชำระเงิน"""
+    
+    @pytest.fixture
+    def order_data(self, product):
+        return {
+            'shipping_name': 'Test User',
+            'shipping_phone': '0812345678',
+            'shipping_address': '123 Test Street',
+            'payment_method': 'bank_transfer',
+            'items': [{'product_id': product.id, 'quantity': 2}],
+        }
+    
+    def test_retry_replays_checkout(self, api_client, buyer_user, product, order_data):
+        """ทดสอบ checkout ซ้ำด้วย key เดิมได้ผลเดิม ไม่สร้าง Order และไม่ตัดสต็อกซ้ำ"""
+        api_client.force_authenticate(user=buyer_user)
+        
+        first = api_client.post(reverse('order-list'), order_data, format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+        second = api_client.post(reverse('order-list'), order_data, format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+        
+        assert first.status_code == second.status_code == status.HTTP_201_CREATED
+        assert second['Idempotent-Replayed'] == 'true'
+        assert second.json() == first.json()
+        assert Order.objects.count() == 1
+        product.refresh_from_db()
+        assert product.stock == 8
+        
+        # key ใหม่ = checkout ใหม่
+        api_client.post(reverse('order-list'), order_data, format='json', HTTP_IDEMPOTENCY_KEY='k-2')
+        assert Order.objects.count() == 2
+    
+    def test_key_reused_with_other_payload(self, api_client, buyer_user, order_data):
+        """ทดสอบใช้ key เดิมกับข้อมูลอื่นถูกปฏิเสธ"""
+        api_client.force_authenticate(user=buyer_user)
+        api_client.post(reverse('order-list'), order_data, format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+        
+        order_data['items'][0]['quantity'] = 3
+        response = api_client.post(reverse('order-list'), order_data, format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+        
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert Order.objects.count() == 1
+    
+    def test_retry_replays_payment(self, api_client, buyer_user, order_data):
+        """ทดสอบชำระเงินซ้ำด้วย key เดิมได้ผลเดิม (ไม่ใช่ error ว่าชำระแล้ว)"""
+        api_client.force_authenticate(user=buyer_user)
+        order_id = api_client.post(reverse('order-list'), order_data, format='json').data['order']['id']
+        url = reverse('order-mock-payment', args=[order_id])
+        
+        first = api_client.post(url, {'success': True}, format='json', HTTP_IDEMPOTENCY_KEY='pay-1')
+        second = api_client.post(url, {'success': True}, format='json', HTTP_IDEMPOTENCY_KEY='pay-1')
+        
+        assert first.status_code == second.status_code == status.HTTP_200_OK
+        assert second['Idempotent-Replayed'] == 'true'
+    
+    def test_concurrent_duplicate_waits_for_first(self, api_client, buyer_user, order_data):
+        """ทดสอบ request ซ้ำระหว่างที่ครั้งแรกยังทำงานอยู่ รอผลของครั้งแรกแทนการทำซ้ำ"""
+        api_client.force_authenticate(user=buyer_user)
+        first = api_client.post(reverse('order-list'), order_data, format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+        
+        # จำลองว่าครั้งแรกยังไม่เสร็จ: ถือ lock ไว้แล้วค่อยเก็บผลทีหลัง
+        key = storage_key(SimpleNamespace(user=buyer_user, method='POST', path=reverse('order-list')), 'k-1')
+        stored = cache.get(key)
+        cache.delete(key)
+        cache.add(f'{key}:lock', 1)
+        
+        def finish_first():
+            cache.set(key, stored)
+            cache.delete(f'{key}:lock')
+        
+        timer = threading.Timer(0.2, finish_first)
+        timer.start()
+        second = api_client.post(reverse('order-list'), order_data, format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+        timer.join()
+        
+        assert second['Idempotent-Replayed'] == 'true'
+        assert second.json()['order']['id'] == first.json()['order']['id']
+        assert Order.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestSellerOrders:
+    """ทดสอบคำสั่งซื้อแยกตามผู้ขาย"""
+    
+    @pytest.fixture
+    def other_seller(self):
+        return User.objects.create_user(
+            email='seller2@example.com',
+            username='seller2',
+            password='sellerpass123',
+            role='seller',
+            shop_name='Other Shop'
+        )
+    
+    @pytest.fixture
+    def order(self, api_client, buyer_user, product, other_seller, category):
+        """คำสั่งซื้อที่มีสินค้าของ 2 ผู้ขาย (ผู้ขายแรก 2 รายการ)"""
+        second = Product.objects.create(seller=product.seller, category=category, name='Second', price=50, stock=5)
+        other = Product.objects.create(seller=other_seller, category=category, name='Other', price=30, stock=5)
+        api_client.force_authenticate(user=buyer_user)
+        data = {
+            'shipping_name': 'Test User',
+            'shipping_phone': '0812345678',
+            'shipping_address': '123 Test Street',
+            'payment_method': 'cod',
+            'items': [
+                {'product_id': product.id, 'quantity': 1},
+                {'product_id': second.id, 'quantity': 2},
+                {'product_id': other.id, 'quantity': 1},
+            ]
+        }
+        return Order.objects.get(pk=api_client.post(reverse('order-list'), data, format='json').data['order']['id'])
+    
+    def test_checkout_creates_one_per_seller(self, order, seller_user, other_seller):
+        """ทดสอบ checkout สร้าง SellerOrder หนึ่งแถวต่อผู้ขาย พร้อมยอดรวมของผู้ขายนั้น"""
+        seller_orders = {seller_order.seller_id: seller_order for seller_order in order.seller_orders.all()}
+        
+        assert set(seller_orders) == {seller_user.pk, other_seller.pk}
+        assert seller_orders[seller_user.pk].subtotal == 100 + 50 * 2
+        assert seller_orders[seller_user.pk].items_count == 2
+        assert seller_orders[other_seller.pk].subtotal == 30
+    
+    def test_seller_list_without_distinct(self, api_client, order, seller_user):
+        """ทดสอบรายการของผู้ขายแสดง Order ครั้งเดียวโดยไม่ใช้ DISTINCT"""
+        api_client.force_authenticate(user=seller_user)
+        
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(reverse('order-list'), {'role': 'seller'})
+        
+        assert [item['id'] for item in response.data['results']] == [order.pk]
+        assert not any('DISTINCT' in query['sql'] for query in context.captured_queries)
+    
+    def test_seller_updates_own_part(self, api_client, order, seller_user, other_seller):
+        """ทดสอบผู้ขายอัพเดทเฉพาะส่วนของตัวเอง Order เปลี่ยนเมื่อทุกผู้ขายอยู่สถานะเดียวกัน"""
+        url = reverse('order-update-status', args=[order.pk])
+        
+        api_client.force_authenticate(user=seller_user)
+        response = api_client.post(url, {'status': 'shipped'}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        order.refresh_from_db()
+        assert order.status == Order.Status.PENDING
+        
+        api_client.force_authenticate(user=other_seller)
+        response = api_client.post(url, {'status': 'shipped'}, format='json')
+        order.refresh_from_db()
+        assert order.status == Order.Status.SHIPPED
+        assert {item['status'] for item in response.data['order']['seller_orders']} == {'shipped'}
+    
+    def test_payment_after_one_seller_cancels(self, api_client, buyer_user, order, product, other_seller):
+        """ทดสอบ seller หนึ่งยกเลิกส่วนของตัวเองแล้วผู้ซื้อยังชำระส่วนที่เหลือได้ ยอดรวมเหลือเฉพาะส่วนนั้น"""
+        api_client.force_authenticate(user=other_seller)
+        url = reverse('order-update-status', args=[order.pk])
+        assert api_client.post(url, {'status': 'cancelled'}, format='json').status_code == status.HTTP_200_OK
+        
+        order.refresh_from_db()
+        assert order.subtotal == 100 + 50 * 2
+        assert order.total == 100 + 50 * 2 + 40
+        
+        api_client.force_authenticate(user=buyer_user)
+        response = api_client.post(reverse('order-mock-payment', args=[order.pk]), {'success': True}, format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        statuses = {item['seller']: item['status'] for item in response.data['order']['seller_orders']}
+        assert statuses == {product.seller_id: 'paid', other_seller.pk: 'cancelled'}
+        assert Product.objects.get(name='Other').stock == 5
+        product.refresh_from_db()
+        assert product.stock == 9
+    
+    def test_unrelated_seller_is_rejected(self, api_client, order):
+        """ทดสอบผู้ขายที่ไม่มีสินค้าใน Order เข้าถึงไม่ได้"""
+        stranger = User.objects.create_user(
+            email='seller3@example.com', username='seller3', password='sellerpass123', role='seller'
+        )
+        api_client.force_authenticate(user=stranger)
+        
+        response = api_client.get(reverse('order-detail', args=[order.pk]))
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+    
+    def test_backfill_existing_orders(self, order, seller_user):
+        """ทดสอบ migration สร้าง SellerOrder ให้คำสั่งซื้อเดิม"""
+        SellerOrder.objects.all().delete()
+        migration = importlib.import_module('apps.orders.migrations.0005_backfill_seller_orders')
+        
+        migration.backfill_seller_orders(apps, None)
+        
+        seller_order = SellerOrder.objects.get(order=order, seller=seller_user)
+        assert seller_order.subtotal == 200
+        assert seller_order.created_at == order.created_at
+        assert SellerOrder.objects.count() == 2
+
+
+@pytest.mark.django_db
+class TestOrderListQueries:
+    """ทดสอบรายการคำสั่งซื้อใช้ query คงที่"""
+    
+    def create_orders(self, buyer_user, seller_user, category, count, items_per_order=3):
+        for index in range(count):
+            order = Order.objects.create(
+                buyer=buyer_user, shipping_name='Test', shipping_phone='0800000000', shipping_address='Test'
+            )
+            for position in range(items_per_order):
+                product = Product.objects.create(
+                    seller=seller_user, category=category, name=f'P{index}-{position}', price=10, stock=5
+                )
+                ProductImage.objects.create(
+                    product=product, image_url=f'https://example.com/{product.pk}.jpg', is_main=True
+                )
+                order.items.create(
+                    product=product, seller=seller_user, product_name=product.name, product_price=10, quantity=1,
+                    product_slug=product.slug, product_image_url=f'https://example.com/{product.pk}.jpg'
+                )
+    
+    def list_queries(self, api_client, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(reverse('order-list'), params or {})
+        assert response.status_code == status.HTTP_200_OK
+        return len(context.captured_queries), response
+    
+    def test_constant_queries(self, api_client, buyer_user, seller_user, category):
+        """ทดสอบ 1 กับ 5 คำสั่งซื้อใช้ query เท่ากัน พร้อมจำนวนรายการและรูปสินค้า"""
+        api_client.force_authenticate(user=buyer_user)
+        self.create_orders(buyer_user, seller_user, category, 1)
+        single, _ = self.list_queries(api_client)
+        
+        self.create_orders(buyer_user, seller_user, category, 4)
+        many, response = self.list_queries(api_client)
+        
+        assert many == single
+        first = response.data['results'][0]
+        assert first['items_count'] == 3
+        assert first['items'][0]['product_image'].startswith('https://example.com/')
+        assert first['buyer_name'] == buyer_user.first_name
+
+
+@pytest.mark.django_db
+class TestOrderItemSnapshots:
+    """ทดสอบ snapshot slug และรูปสินค้าบน OrderItem"""
+    
+    @pytest.fixture
+    def order(self, api_client, buyer_user, product):
+        ProductImage.objects.create(product=product, image_url='https://example.com/main.jpg', is_main=True)
+        api_client.force_authenticate(user=buyer_user)
+        data = {
+            'shipping_name': 'Test User',
+            'shipping_phone': '0812345678',
+            'shipping_address': '123 Test Street',
+            'payment_method': 'cod',
+            'items': [{'product_id': product.id, 'quantity': 1}],
+        }
+        return Order.objects.get(pk=api_client.post(reverse('order-list'), data, format='json').data['order']['id'])
+    
+    def test_checkout_snapshots_and_survives_product_delete(self, api_client, order, product):
+        """ทดสอบ checkout เก็บ slug และรูปไว้ และยังแสดงได้หลังสินค้าถูกลบ"""
+        item = order.items.get()
+        assert item.product_slug == 'test-product'
+        assert item.product_image_url == 'https://example.com/main.jpg'
+        
+        product.delete()
+        response = api_client.get(reverse('order-detail', args=[order.pk]))
+        
+        assert response.data['items'][0]['product_image'] == 'https://example.com/main.jpg'
+        assert response.data['items'][0]['product_name'] == 'Test Product'
+    
+    def test_backfill_command(self, order):
+        """ทดสอบคำสั่ง backfill เติม snapshot ให้รายการเดิม"""
+        order.items.update(product_slug='', product_image_url='')
+        out = StringIO()
+        
+        call_command('backfill_order_item_snapshots', batch_size=1, stdout=out)
+        
+        item = order.items.get()
+        assert item.product_slug == 'test-product'
+        assert item.product_image_url == 'https://example.com/main.jpg'
+        assert 'เติม snapshot ให้ 1 รายการ' in out.getvalue()
+
+
+@pytest.mark.django_db
+class TestOrderPdf:
+    """ทดสอบ cache ของ PDF คำสั่งซื้อ"""
+    
+    @pytest.fixture
+    def order(self, api_client, buyer_user, product, settings, tmp_path):
+        settings.ORDER_PDF = {**settings.ORDER_PDF, 'CACHE_DIR': str(tmp_path)}
+        api_client.force_authenticate(user=buyer_user)
+        data = {
+            'shipping_name': 'Test User',
+            'shipping_phone': '0812345678',
+            'shipping_address': '123 Test Street',
+            'payment_method': 'cod',
+            'items': [{'product_id': product.id, 'quantity': 2}],
+        }
+        return Order.objects.get(pk=api_client.post(reverse('order-list'), data, format='json').data['order']['id'])
+    
+    @pytest.fixture
+    def renders(self, monkeypatch):
+        calls = []
+        render = pdf_generator.render_order_pdf
+        
+        def counting_render(order):
+            calls.append(order.pk)
+            return render(order)
+        
+        monkeypatch.setattr(pdf_generator, 'render_order_pdf', counting_render)
+        return calls
+    
+    def test_download_reuses_cached_pdf(self, api_client, order, renders, tmp_path):
+        """ทดสอบดาวน์โหลดซ้ำใช้ไฟล์เดิมโดยไม่สร้าง PDF ใหม่"""
+        url = reverse('order-download-pdf', args=[order.pk])
+        
+        first = api_client.get(url)
+        second = api_client.get(url)
+        
+        assert first.status_code == status.HTTP_200_OK
+        assert first.content.startswith(b'%PDF')
+        assert second.content == first.content
+        assert renders == [order.pk]
+        assert len(list(tmp_path.glob(f'order-{order.pk}-*.pdf'))) == 1
+    
+    def test_etag_not_modified(self, api_client, order, renders):
+        """ทดสอบ If-None-Match ตรงกับ version ปัจจุบันได้ 304"""
+        url = reverse('order-view-pdf', args=[order.pk])
+        etag = api_client.get(url)['ETag']
+        
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b''
+        assert renders == [order.pk]
+    
+    def test_order_change_renders_new_version(self, api_client, order, renders, tmp_path):
+        """ทดสอบ Order เปลี่ยนแล้วสร้าง PDF ใหม่และลบไฟล์เก่า"""
+        url = reverse('order-download-pdf', args=[order.pk])
+        old_etag = api_client.get(url)['ETag']
+        
+        order.status = Order.Status.SHIPPED
+        order.save(update_fields=['status', 'updated_at'])
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=old_etag)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != old_etag
+        assert renders == [order.pk, order.pk]
+        assert len(list(tmp_path.glob(f'order-{order.pk}-*.pdf'))) == 1
+    
+    def test_async_download_renders_in_worker(
+        self, api_client, order, renders, monkeypatch, django_capture_on_commit_callbacks
+    ):
+        """ทดสอบโหมด async สั่ง worker ครั้งเดียวแล้ว poll จนไฟล์พร้อม"""
+        queued = []
+        monkeypatch.setattr(render_invoice_pdf, 'delay', queued.append)
+        url = reverse('order-download-pdf', args=[order.pk])
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            first = api_client.get(url, {'async': 'true'})
+            second = api_client.get(first.data['status_url'])
+        
+        assert first.status_code == status.HTTP_202_ACCEPTED
+        assert second.status_code == status.HTTP_202_ACCEPTED
+        assert queued == [order.pk]
+        assert renders == []
+        
+        render_invoice_pdf(order.pk)
+        ready = api_client.get(first.data['status_url'])
+        redirect = api_client.get(first.data['status_url'], {'redirect': 'true'})
+        download = api_client.get(ready.data['download_url'], {'async': 'true'})
+        
+        assert ready.data['status'] == 'ready'
+        assert redirect.status_code == status.HTTP_302_FOUND
+        assert download.status_code == status.HTTP_200_OK
+        assert download.content.startswith(b'%PDF')
+        assert renders == [order.pk]
+    
+    def test_async_without_cache_dir_renders_in_request(self, api_client, order, renders, settings, monkeypatch):
+        """ทดสอบไม่มี CACHE_DIR แล้วโหมด async สร้าง PDF ใน request แทนการสั่ง worker ที่เก็บไฟล์ไม่ได้"""
+        queued = []
+        monkeypatch.setattr(render_invoice_pdf, 'delay', queued.append)
+        settings.ORDER_PDF = {**settings.ORDER_PDF, 'CACHE_DIR': None, 'ASYNC': True}
+        
+        response = api_client.get(reverse('order-download-pdf', args=[order.pk]), {'async': 'true'})
+        status_response = api_client.get(reverse('order-pdf-status', args=[order.pk]))
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content.startswith(b'%PDF')
+        assert status_response.data['status'] == 'ready'
+        assert queued == []
+
+
+@pytest.mark.django_db
+class TestInvoiceExport:
+    """ทดสอบ export ใบสั่งซื้อหลายใบเป็น ZIP"""
+    
+    @pytest.fixture
+    def orders(self, api_client, buyer_user, product, settings, tmp_path):
+        settings.ORDER_PDF = {**settings.ORDER_PDF, 'CACHE_DIR': str(tmp_path / 'invoices')}
+        settings.INVOICE_EXPORT = {
+            **settings.INVOICE_EXPORT,
+            'PROCESSES': 0,
+            'SYNC_LIMIT': 2,
+            'EXPORT_DIR': str(tmp_path / 'exports'),
+            'PROGRESS_EVERY': 1,
+        }
+        api_client.force_authenticate(user=buyer_user)
+        data = {
+            'shipping_name': 'Test User',
+            'shipping_phone': '0812345678',
+            'shipping_address': '123 Test Street',
+            'payment_method': 'cod',
+            'items': [{'product_id': product.id, 'quantity': 1}],
+        }
+        for _ in range(3):
+            api_client.post(reverse('order-list'), data, format='json')
+        return list(Order.objects.order_by('pk'))
+    
+    def zip_names(self, content):
+        return sorted(zipfile.ZipFile(BytesIO(content)).namelist())
+    
+    def test_small_batch_streams_zip(self, api_client, orders, settings, monkeypatch):
+        """ทดสอบชุดเล็ก stream ZIP กลับใน request โดยสร้าง PDF ใน process เดิม (ไม่ fork pool จาก web worker)"""
+        from . import invoice_export
+        
+        def no_pool(method):
+            raise AssertionError('request ต้องไม่สร้าง process pool')
+        
+        settings.INVOICE_EXPORT = {**settings.INVOICE_EXPORT, 'PROCESSES': 4}
+        monkeypatch.setattr(invoice_export.multiprocessing, 'get_context', no_pool)
+        ids = [order.pk for order in orders[:2]]
+        
+        response = api_client.post(reverse('order-invoice-export'), {'order_ids': ids}, format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'application/zip'
+        content = b''.join(response.streaming_content)
+        assert self.zip_names(content) == sorted(f'{order.order_number}.pdf' for order in orders[:2])
+    
+    def test_large_batch_runs_in_worker(self, api_client, orders):
+        """ทดสอบชุดใหญ่สร้างงาน export แล้วดูความคืบหน้าและดาวน์โหลดเมื่อเสร็จ"""
+        today = timezone.localdate().isoformat()
+        response = api_client.post(
+            reverse('order-invoice-export'), {'date_from': today, 'date_to': today}, format='json'
+        )
+        
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['total'] == 3
+        export_invoices(response.data['id'])
+        
+        progress = api_client.get(response.data['status_url'])
+        assert progress.data['status'] == InvoiceExport.Status.DONE
+        assert progress.data['done'] == 3
+        assert progress.data['progress'] == 100
+        download = api_client.get(progress.data['download_url'])
+        content = b''.join(download.streaming_content)
+        assert self.zip_names(content) == sorted(f'{order.order_number}.pdf' for order in orders)
+    
+    def test_download_reads_stored_path(self, api_client, orders, settings):
+        """ทดสอบดาวน์โหลดงานที่เสร็จแล้วอ่านไฟล์จาก path ที่ worker บันทึกไว้ใน EXPORT_DIR"""
+        response = api_client.post(
+            reverse('order-invoice-export'), {'order_ids': [order.pk for order in orders]}, format='json'
+        )
+        export_invoices(response.data['id'])
+        
+        stored = InvoiceExport.objects.get(pk=response.data['id']).file_path
+        assert stored.startswith(settings.INVOICE_EXPORT['EXPORT_DIR'])
+        download = api_client.get(reverse('order-invoice-export-download', args=[response.data['id']]))
+        
+        assert download.status_code == status.HTTP_200_OK
+        with open(stored, 'rb') as fileobj:
+            assert b''.join(download.streaming_content) == fileobj.read()
+    
+    def test_only_own_orders(self, api_client, orders):
+        """ทดสอบผู้ใช้อื่น export คำสั่งซื้อที่ไม่เกี่ยวข้องไม่ได้"""
+        other = User.objects.create_user(
+            email='other@example.com',
+            username='other',
+            password='otherpass123',
+            role='buyer'
+        )
+        api_client.force_authenticate(user=other)
+        
+        response = api_client.post(
+            reverse('order-invoice-export'), {'order_ids': [orders[0].pk]}, format='json'
+        )
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_command_with_process_pool(self, orders, tmp_path):
+        """ทดสอบคำสั่ง export_invoices สร้าง PDF ใน process pool"""
+        output = tmp_path / 'out.zip'
+        out = StringIO()
+        
+        call_command('export_invoices', output=str(output), ids=[order.pk for order in orders], processes=2, stdout=out)
+        
+        assert self.zip_names(output.read_bytes()) == sorted(f'{order.order_number}.pdf' for order in orders)
+        assert 'export 3 ใบ' in out.getvalue()
+
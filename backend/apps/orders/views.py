@@ -3,21 +3,46 @@
 Orders App - Views
 ===========================================
 """
+import os
+
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db.models import Q
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
-from .models import Order
+from .checkout_queue import enqueue_checkout, find_sale_product, ticket_result
+from .fulfilment import recompute_order_totals, set_seller_order_status, sync_seller_orders
+from .idempotency import idempotent
+from .invoice_export import (
+    create_export,
+    export_progress,
+    exportable_orders,
+    get_invoice_export_settings,
+    stream_invoice_zip,
+)
+from .models import CheckoutTicket, InvoiceExport, Order, StockReservation
+from .reservations import commit_order_reservations, release_reservations
 from .serializers import (
     CreateOrderSerializer,
+    InvoiceExportSerializer,
     MockPaymentSerializer,
     OrderDetailSerializer,
     OrderListSerializer,
+    ReserveStockSerializer,
     UpdateOrderStatusSerializer,
 )
-from .pdf_generator import generate_order_pdf
+from .pdf_generator import (
+    cached_pdf_path,
+    get_cached_order_pdf,
+    get_order_pdf,
+    get_pdf_settings,
+    order_pdf_version,
+    schedule_order_pdf,
+)
 
 
 class OrderViewSet(viewsets.ModelViewSet):
@@ -26,6 +51,13 @@ class OrderViewSet(viewsets.ModelViewSet):
     - list: GET /api/orders/ - ดูรายการคำสั่งซื้อ
     - retrieve: GET /api/orders/{id}/ - ดูรายละเอียด
     - create: POST /api/orders/ - สร้างคำสั่งซื้อ (checkout)
+    - reserve: POST /api/orders/reserve/ - จองสต็อกก่อน checkout
+    - release_reservation: POST /api/orders/release-reservation/ - ยกเลิกการจอง
+    - checkout_ticket: GET /api/orders/tickets/{ticket}/ - ผล checkout ที่เข้าคิว (สินค้า sale_mode)
+    - download_pdf / view_pdf: GET /api/orders/{id}/download-pdf/ (?async=true = สร้างใน worker)
+    - pdf_status: GET /api/orders/{id}/pdf-status/ - สถานะ PDF ที่สั่งสร้างแบบ async
+    - invoice_export: POST /api/orders/invoices/export/ - export ใบสั่งซื้อหลายใบเป็น ZIP
+    - invoice_export_status: GET /api/orders/invoices/exports/{id}/ - ความคืบหน้าของงาน export
     """
     permission_classes = [permissions.IsAuthenticated]
     
@@ -34,6 +66,8 @@ class OrderViewSet(viewsets.ModelViewSet):
             return OrderListSerializer
         if self.action == 'create':
             return CreateOrderSerializer
+        if self.action == 'reserve':
+            return ReserveStockSerializer
         return OrderDetailSerializer
     
     def get_queryset(self):
@@ -44,24 +78,27 @@ class OrderViewSet(viewsets.ModelViewSet):
         if user.is_staff:
             role = self.request.query_params.get('role', 'all')
             if role == 'all':
-                return queryset.prefetch_related('items', 'items__product')
+                return queryset.for_display()
         
         # Filter ตาม role
         role = self.request.query_params.get('role', 'buyer')
         
+        status_filter = self.request.query_params.get('status')
+        
         if role == 'seller' and user.is_seller:
-            # Seller: ดู orders ที่มีสินค้าของตัวเอง
-            queryset = queryset.filter(items__seller=user).distinct()
+            # Seller: ดู orders ผ่าน SellerOrder ของตัวเอง (หนึ่งแถวต่อ order ไม่ต้อง DISTINCT)
+            # filter และเรียงใน join เดียวกัน ใช้ index (seller, status, created_at)
+            seller_filter = {'seller_orders__seller': user}
+            if status_filter:
+                seller_filter['seller_orders__status'] = status_filter
+            queryset = queryset.filter(**seller_filter).order_by('-seller_orders__created_at', '-pk')
         else:
             # Buyer: ดู orders ของตัวเอง
             queryset = queryset.filter(buyer=user)
+            if status_filter:
+                queryset = queryset.filter(status=status_filter)
         
-        # Filter by status
-        status_filter = self.request.query_params.get('status')
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        
-        return queryset.prefetch_related('items', 'items__product')
+        return queryset.for_display()
     
     def get_object(self):
         """
@@ -71,7 +108,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         user = self.request.user
         
         try:
-            order = Order.objects.prefetch_related('items', 'items__product').get(pk=pk)
+            order = Order.objects.for_display().get(pk=pk)
         except Order.DoesNotExist:
             from rest_framework.exceptions import NotFound
             raise NotFound('ไม่พบคำสั่งซื้อ')
@@ -81,21 +118,43 @@ class OrderViewSet(viewsets.ModelViewSet):
             return order
         
         # Buyer เข้าถึงได้เฉพาะ Order ของตัวเอง
-        if order.buyer == user:
+        if order.buyer_id == user.pk:
             return order
         
-        # Seller เข้าถึงได้ถ้ามีสินค้าของตัวเองใน Order
-        if user.is_seller and order.items.filter(seller=user).exists():
-            return order
+        # Seller เข้าถึงได้ถ้ามีส่วนของตัวเองใน Order (ใช้ seller_orders ที่ prefetch ไว้แล้ว)
+        if user.is_seller:
+            self.seller_order = next(
+                (seller_order for seller_order in order.seller_orders.all() if seller_order.seller_id == user.pk),
+                None
+            )
+            if self.seller_order is not None:
+                self.seller_order.order = order
+                return order
         
         # ไม่มีสิทธิ์
         from rest_framework.exceptions import PermissionDenied
         raise PermissionDenied('คุณไม่มีสิทธิ์เข้าถึงคำสั่งซื้อนี้')
     
+    @idempotent
     def create(self, request, *args, **kwargs):
-        """สร้างคำสั่งซื้อ (Checkout)"""
+        """สร้างคำสั่งซื้อ (Checkout) ส่ง header Idempotency-Key เพื่อกันสร้างซ้ำเมื่อ retry"""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        
+        # สินค้า sale_mode: เข้าคิวให้ worker สร้าง Order แทนการแย่งล็อกสินค้าใน request นี้
+        # (checkout ด้วย reservation_token จองสต็อกไว้แล้ว ไม่ต้องเข้าคิว)
+        items = serializer.validated_data.get('items')
+        if items and not serializer.validated_data.get('reservation_token'):
+            sale_product_id = find_sale_product([item['product_id'] for item in items])
+            if sale_product_id:
+                ticket = enqueue_checkout(request.user, sale_product_id, serializer.validated_data)
+                return Response({
+                    'message': 'อยู่ระหว่างดำเนินการสั่งซื้อ',
+                    **ticket_result(ticket),
+                    'poll_url': reverse('order-checkout-ticket', args=[ticket.pk], request=request),
+                    'websocket_path': f'/ws/orders/tickets/{ticket.pk}/',
+                }, status=status.HTTP_202_ACCEPTED)
+        
         order = serializer.save()
         
         return Response({
@@ -103,6 +162,63 @@ class OrderViewSet(viewsets.ModelViewSet):
             'order': OrderDetailSerializer(order).data
         }, status=status.HTTP_201_CREATED)
     
+    @action(detail=False, methods=['post'], url_path='reserve')
+    @idempotent
+    def reserve(self, request):
+        """
+        จองสต็อกไว้ระหว่าง checkout (หมดอายุตาม STOCK_RESERVATION['TTL'])
+        สินค้าที่กำลังเปิด sale_mode จองล่วงหน้าไม่ได้ ต้อง checkout ผ่านคิวตามลำดับ
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sale_product_id = find_sale_product([item['product_id'] for item in serializer.validated_data['items']])
+        if sale_product_id:
+            return Response({
+                'error': 'สินค้าอยู่ในช่วง sale จองล่วงหน้าไม่ได้ กรุณาสั่งซื้อโดยตรง (ระบบจะจัดคิวให้)',
+                'sale_product_id': sale_product_id,
+            }, status=status.HTTP_409_CONFLICT)
+        token, products = serializer.reserve()
+        
+        reservations = StockReservation.objects.filter(token=token).order_by('product_id')
+        return Response({
+            'reservation_token': str(token),
+            'expires_at': reservations[0].expires_at,
+            'items': [
+                {'product_id': reservation.product_id, 'quantity': reservation.quantity}
+                for reservation in reservations
+            ]
+        }, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'], url_path='release-reservation')
+    def release_reservation(self, request):
+        """ยกเลิกการจองที่ยังไม่ได้สั่งซื้อ (คืนสต็อกทันที)"""
+        token = request.data.get('reservation_token')
+        try:
+            reservations = StockReservation.objects.filter(
+                token=token, buyer=request.user, order__isnull=True
+            )
+            released = release_reservations(reservations)
+        except (ValueError, DjangoValidationError):
+            return Response(
+                {'error': 'reservation_token ไม่ถูกต้อง'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({'released': released})
+    
+    @action(detail=False, methods=['get'], url_path=r'tickets/(?P<ticket_id>[0-9a-f-]{36})')
+    def checkout_ticket(self, request, ticket_id=None):
+        """ผล checkout ที่เข้าคิว (queued / succeeded / failed)"""
+        try:
+            ticket = CheckoutTicket.objects.select_related('order').get(pk=ticket_id, buyer=request.user)
+        except (CheckoutTicket.DoesNotExist, DjangoValidationError):
+            return Response({'error': 'ไม่พบรายการสั่งซื้อ'}, status=status.HTTP_404_NOT_FOUND)
+        
+        data = ticket_result(ticket)
+        if ticket.order:
+            data['order'] = OrderDetailSerializer(ticket.order).data
+        return Response(data)
+    
     @action(detail=True, methods=['post'], url_path='update-status')
     def update_status(self, request, pk=None):
         """อัพเดทสถานะคำสั่งซื้อ (สำหรับ Seller)"""
@@ -116,7 +232,7 @@ class OrderViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            if not order.items.filter(seller=request.user).exists():
+            if getattr(self, 'seller_order', None) is None:
                 return Response(
                     {'error': 'คุณไม่ใช่ผู้ขายสินค้าในคำสั่งซื้อนี้'},
                     status=status.HTTP_403_FORBIDDEN
@@ -124,9 +240,27 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         serializer = UpdateOrderStatusSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        new_status = serializer.validated_data['status']
+        
+        if request.user.is_staff:
+            # Admin: เปลี่ยนทั้ง Order และทุก seller
+            order.status = new_status
+            order.save(update_fields=['status', 'updated_at'])
+            sync_seller_orders([order.pk], new_status)
+            reservations = order.reservations.all()
+        else:
+            # Seller: เปลี่ยนเฉพาะส่วนของตัวเอง
+            set_seller_order_status(self.seller_order, new_status)
+            reservations = order.reservations.filter(product__seller=request.user)
+            if new_status == Order.Status.CANCELLED:
+                # ยอดที่ผู้ซื้อต้องชำระเหลือเฉพาะส่วนของ seller อื่น
+                recompute_order_totals(order)
+        # seller_orders ที่ prefetch ไว้เป็นค่าก่อนอัพเดท
+        order._prefetched_objects_cache.pop('seller_orders', None)
         
-        order.status = serializer.validated_data['status']
-        order.save(update_fields=['status', 'updated_at'])
+        if new_status == Order.Status.CANCELLED:
+            # คืนสต็อกทั้งที่ยังจองไว้และที่ยืนยันแล้ว (COD / ชำระแล้ว)
+            release_reservations(reservations, include_committed=True)
         
         return Response({
             'message': 'อัพเดทสถานะสำเร็จ',
@@ -134,12 +268,13 @@ class OrderViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=True, methods=['post'], url_path='mock-payment')
+    @idempotent
     def mock_payment(self, request, pk=None):
-        """Mock payment สำหรับทดสอบ"""
+        """Mock payment สำหรับทดสอบ (รองรับ header Idempotency-Key)"""
         order = self.get_object()
         
         # ตรวจสอบสิทธิ์: ต้องเป็นผู้ซื้อ หรือ admin
-        if order.buyer != request.user and not request.user.is_staff:
+        if order.buyer_id != request.user.pk and not request.user.is_staff:
             return Response(
                 {'error': 'คุณไม่ใช่เจ้าของคำสั่งซื้อนี้'},
                 status=status.HTTP_403_FORBIDDEN
@@ -148,9 +283,17 @@ class OrderViewSet(viewsets.ModelViewSet):
         success = request.data.get('success', True)
         
         if success:
+            if order.status == Order.Status.CANCELLED or not commit_order_reservations(order):
+                return Response(
+                    {'error': 'คำสั่งซื้อถูกยกเลิกหรือหมดเวลาชำระเงินแล้ว'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
             order.payment_status = True
             order.status = Order.Status.PAID
             order.save(update_fields=['payment_status', 'status', 'updated_at'])
+            sync_seller_orders([order.pk], order.status, keep_cancelled=True)
+            order._prefetched_objects_cache.pop('seller_orders', None)
             
             return Response({
                 'message': 'ชำระเงินสำเร็จ',
@@ -164,19 +307,36 @@ class OrderViewSet(viewsets.ModelViewSet):
                 'order': OrderDetailSerializer(order).data
             }, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=True, methods=['get'], url_path='download-pdf')
-    def download_pdf(self, request, pk=None):
-        """ดาวน์โหลดคำสั่งซื้อเป็น PDF"""
+    def wants_async_pdf(self):
+        """โหมด async ต้องมี CACHE_DIR (worker เก็บไฟล์ไว้ให้ api อ่าน) ไม่งั้นสร้างใน request เสมอ"""
+        if not get_pdf_settings()['CACHE_DIR']:
+            return False
+        value = self.request.query_params.get('async')
+        if value is None:
+            return get_pdf_settings()['ASYNC']
+        return value.lower() in ('true', '1', 'yes')
+
+    def pdf_response(self, disposition):
+        """
+        PDF ของคำสั่งซื้อ (ใช้ไฟล์ที่สร้างไว้ถ้า Order ไม่เปลี่ยน)
+        ETag = version ของ Order ถ้า browser มีไฟล์ version เดิมอยู่แล้วตอบ 304 ไม่ต้องส่งไฟล์ซ้ำ
+        โหมด async (?async=true) และไฟล์ยังไม่มี: สั่ง worker สร้าง แล้วตอบ 202 พร้อม status_url
+        """
+        order = self.get_object()
         try:
-            order = self.get_object()
-            
-            # สร้าง PDF
-            pdf_buffer = generate_order_pdf(order)
-            
-            # ส่ง Response
-            response = HttpResponse(pdf_buffer, content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="order_{order.id}.pdf"'
-            
+            etag = f'"{order_pdf_version(order)}"'
+            if etag in self.request.headers.get('If-None-Match', ''):
+                response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                pdf = get_cached_order_pdf(order)
+                if pdf is None and self.wants_async_pdf():
+                    return self.pdf_pending_response(order)
+                if pdf is None:
+                    pdf = get_order_pdf(order)
+                response = HttpResponse(pdf, content_type='application/pdf')
+                response['Content-Disposition'] = f'{disposition}; filename="order_{order.id}.pdf"'
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
             return response
             
         except Exception as e:
@@ -185,23 +345,106 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def pdf_pending_response(self, order):
+        schedule_order_pdf(order)
+        response = Response({
+            'status': 'pending',
+            'status_url': reverse('order-pdf-status', args=[order.pk], request=self.request),
+        }, status=status.HTTP_202_ACCEPTED)
+        response['Retry-After'] = '1'
+        return response
+
+    @action(detail=True, methods=['get'], url_path='pdf-status')
+    def pdf_status(self, request, pk=None):
+        """
+        สถานะ PDF ที่สั่งสร้างแบบ async: pending (202) หรือ ready พร้อม URL ดาวน์โหลด
+        ส่ง ?redirect=true เพื่อ redirect ไปดาวน์โหลดทันทีเมื่อพร้อม
+        """
+        order = self.get_object()
+        path = cached_pdf_path(order)
+        # ไม่มี CACHE_DIR: worker เก็บไฟล์ไม่ได้ ดาวน์โหลดจะสร้างใน request แทน (ตอบ ready ทันที)
+        if path is not None and not os.path.exists(path):
+            # งานเดิมล้มเหลวหรือ Order เปลี่ยน version: สั่งสร้างใหม่ (ไม่ซ้ำถ้ายังทำอยู่)
+            return self.pdf_pending_response(order)
+        
+        download_url = reverse('order-download-pdf', args=[order.pk], request=request)
+        if request.query_params.get('redirect', '').lower() in ('true', '1', 'yes'):
+            return HttpResponseRedirect(download_url)
+        return Response({
+            'status': 'ready',
+            'etag': f'"{order_pdf_version(order)}"',
+            'download_url': download_url,
+            'view_url': reverse('order-view-pdf', args=[order.pk], request=request),
+        })
+
+    @action(detail=True, methods=['get'], url_path='download-pdf')
+    def download_pdf(self, request, pk=None):
+        """ดาวน์โหลดคำสั่งซื้อเป็น PDF"""
+        return self.pdf_response('attachment')
+
     @action(detail=True, methods=['get'], url_path='view-pdf')
     def view_pdf(self, request, pk=None):
         """ดู PDF ใน browser (ไม่ดาวน์โหลด)"""
-        try:
-            order = self.get_object()
-            
-            # สร้าง PDF
-            pdf_buffer = generate_order_pdf(order)
-            
-            # ส่ง Response (inline = ดูใน browser)
-            response = HttpResponse(pdf_buffer, content_type='application/pdf')
-            response['Content-Disposition'] = f'inline; filename="order_{order.id}.pdf"'
-            
-            return response
-            
-        except Exception as e:
+        return self.pdf_response('inline')
+
+    @action(detail=False, methods=['post'], url_path='invoices/export')
+    def invoice_export(self, request):
+        """
+        export ใบสั่งซื้อหลายใบเป็น ZIP
+        ชุดเล็ก stream กลับทันที ชุดใหญ่ (หรือ background=true) สร้างใน worker แล้วตอบ 202 พร้อม URL ดูความคืบหน้า
+        """
+        serializer = InvoiceExportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        config = get_invoice_export_settings()
+        
+        order_ids = exportable_orders(
+            request.user, data.get('order_ids'), data.get('date_from'), data.get('date_to')
+        )
+        if not order_ids:
+            return Response({'error': 'ไม่พบคำสั่งซื้อที่ export ได้'}, status=status.HTTP_404_NOT_FOUND)
+        if len(order_ids) > config['MAX_ORDERS']:
             return Response(
-                {'error': f'ไม่สามารถสร้าง PDF ได้: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+                {'error': f'export ได้ครั้งละไม่เกิน {config["MAX_ORDERS"]} ใบ'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if len(order_ids) <= config['SYNC_LIMIT'] and not data['background']:
+            response = StreamingHttpResponse(stream_invoice_zip(order_ids), content_type='application/zip')
+            response['Content-Disposition'] = f'attachment; filename="invoices_{timezone.localdate():%Y%m%d}.zip"'
+            return response
+        
+        export = create_export(request.user, order_ids)
+        return Response({
+            **export_progress(export),
+            'status_url': reverse('order-invoice-export-status', args=[export.pk], request=request),
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'invoices/exports/(?P<export_id>[0-9a-f-]{36})')
+    def invoice_export_status(self, request, export_id=None):
+        """ความคืบหน้าของงาน export (มี download_url เมื่อเสร็จ)"""
+        export = self.get_invoice_export(export_id)
+        data = export_progress(export)
+        if export.status == InvoiceExport.Status.DONE:
+            data['download_url'] = reverse('order-invoice-export-download', args=[export.pk], request=request)
+        return Response(data)
+
+    @action(detail=False, methods=['get'], url_path=r'invoices/exports/(?P<export_id>[0-9a-f-]{36})/download')
+    def invoice_export_download(self, request, export_id=None):
+        """ดาวน์โหลดไฟล์ ZIP ของงาน export ที่เสร็จแล้ว"""
+        export = self.get_invoice_export(export_id)
+        if export.status != InvoiceExport.Status.DONE or not os.path.exists(export.file_path):
+            return Response({'error': 'ไฟล์ยังไม่พร้อม'}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(
+            open(export.file_path, 'rb'),
+            as_attachment=True,
+            filename=f'invoices_{export.created_at:%Y%m%d}_{str(export.pk)[:8]}.zip',
+            content_type='application/zip',
+        )
+
+    def get_invoice_export(self, export_id):
+        try:
+            return InvoiceExport.objects.get(pk=export_id, requested_by=self.request.user)
+        except (InvoiceExport.DoesNotExist, DjangoValidationError):
+            from rest_framework.exceptions import NotFound
+            raise NotFound('ไม่พบงาน export')
@@ -4,6 +4,7 @@ Products App - Admin
 ===========================================
 """
 from django.contrib import admin
+from django.db.models import Count
 from django.utils.html import format_html
 
 from .models import Category, Product, ProductImage
@@ -35,9 +36,13 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(total_products=Count('products'))
+    
     def product_count(self, obj):
-        return obj.products.count()
+        return obj.total_products
     product_count.short_description = 'จำนวนสินค้า'
+    product_count.admin_order_field = 'total_products'
 
 
 @admin.register(Product)
@@ -45,11 +50,12 @@ class ProductAdmin(admin.ModelAdmin):
     """Admin สำหรับจัดการสินค้า"""
     
     list_display = ['name', 'seller', 'category', 'price', 'stock', 'is_active', 'views_count', 'created_at']
-    list_filter = ['is_active', 'category', 'created_at']
+    list_filter = ['is_active', 'sale_mode', 'category', 'created_at']
     search_fields = ['name', 'description', 'seller__email', 'seller__shop_name']
     prepopulated_fields = {'slug': ('name',)}
     raw_id_fields = ['seller']
     inlines = [ProductImageInline]
+    readonly_fields = ['rating_average', 'rating_count']
     
     fieldsets = (
         ('ข้อมูลหลัก', {
@@ -59,7 +65,10 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('price', 'stock', 'category')
         }),
         ('สถานะ', {
-            'fields': ('is_active', 'views_count')
+            'fields': ('is_active', 'sale_mode', 'views_count')
+        }),
+        ('คะแนนรีวิว', {
+            'fields': ('rating_average', 'rating_count')
         }),
     )
 
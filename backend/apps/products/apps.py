@@ -0,0 +1,19 @@
+"""
+===========================================
+Products App Config
+===========================================
+"""
+from django.apps import AppConfig
+
+
+class ProductsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.products'
+    verbose_name = 'สินค้า'
+
+    def ready(self):
+        from django.core.signals import request_started
+
+        from . import signals
+
+        request_started.connect(signals.warm_product_indexes, dispatch_uid='warm_product_indexes')
@@ -0,0 +1,221 @@
+"""
+===========================================
+Products App - Catalog Response Cache
+===========================================
+cache response ของ endpoint แคตตาล็อกที่เป็น AllowAny (รายการสินค้า / รายละเอียดสินค้า / หมวดหมู่)
+
+- cache key = scope + host + version ของข้อมูลที่เกี่ยวข้อง + query params ที่ normalize แล้ว
+- invalidate ด้วยการเพิ่ม version (ไม่ต้องลบ key) โดย signal ของ Product / ProductImage / Category / Review
+    'products'          ทุกหน้ารายการสินค้า
+    'product:<id>'      หน้ารายละเอียดของสินค้านั้น
+    'categories'        รายการหมวดหมู่ (และหมวดหมู่ที่ซ้อนอยู่ในหน้ารายละเอียดสินค้า)
+                        bump เมื่อหมวดหมู่เปลี่ยน หรือสินค้าถูกเพิ่ม/ลบ/ย้ายหมวดหมู่/เปิด-ปิดการขาย
+- single-flight: เมื่อ cache miss จะมีแค่ request เดียวที่คำนวณใหม่ (ล็อกด้วย cache.add)
+  request อื่นรอผลสักครู่แทนที่จะยิงฐานข้อมูลพร้อมกัน
+- นับ hit / miss ต่อ scope ดูได้ที่ GET /api/products/cache-stats/ (admin)
+
+ตั้งค่าใน settings.CATALOG_CACHE:
+    TIMEOUT         วินาทีที่เก็บ response (ยอดวิวที่ flush ด้วย .update() จะสดภายในเวลานี้)
+    LOCK_TIMEOUT    วินาทีสูงสุดที่ถือล็อกขณะคำนวณ response
+    WAIT_TIMEOUT    วินาทีที่ request อื่นรอผลจากผู้ถือล็อก ก่อนคำนวณเอง
+    CATEGORY_TIMEOUT วินาทีที่เก็บข้อมูลหมวดหมู่ทั้งหมด (หมดอายุทันทีเมื่อ version เปลี่ยนอยู่แล้ว)
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+KEY_PREFIX = 'catalog'
+SCOPES = ('products', 'product', 'categories')
+WAIT_STEP = 0.05
+
+
+def get_cache_settings():
+    config = {
+        'ENABLED': True,
+        'TIMEOUT': 60,
+        'LOCK_TIMEOUT': 10,
+        'WAIT_TIMEOUT': 2,
+        'CATEGORY_TIMEOUT': 3600,
+    }
+    config.update(getattr(settings, 'CATALOG_CACHE', {}))
+    return config
+
+
+# ===========================================
+# Version counters
+# ===========================================
+def version_key(name):
+    return f'{KEY_PREFIX}:v:{name}'
+
+
+def initial_version():
+    # ใช้เวลาเป็นค่าเริ่มต้น: ถ้า counter ถูก evict ไป version ใหม่จะไม่ชนกับ response เก่า
+    return int(time.time() * 1000)
+
+
+def get_versions(names):
+    keys = [version_key(name) for name in names]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, initial_version(), timeout=None)
+            found[key] = cache.get(key)
+        versions.append(str(found[key]))
+    return versions
+
+
+def _bump(names):
+    for name in names:
+        key = version_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, initial_version(), timeout=None)
+
+
+def bump_versions(*names):
+    """
+    ทำให้ cache ที่ขึ้นกับ names หมดอายุ
+    bump ทันทีและอีกครั้งหลัง commit เพื่อไม่ให้ response ที่คำนวณจากข้อมูลก่อน commit ค้างอยู่
+    """
+    names = [name for name in names if name]
+    if not names:
+        return
+    _bump(names)
+    transaction.on_commit(lambda: _bump(names))
+
+
+def bump_products(*product_ids):
+    bump_versions('products', *[f'product:{product_id}' for product_id in product_ids])
+
+
+def bump_categories():
+    bump_versions('categories')
+
+
+# ===========================================
+# Metrics
+# ===========================================
+def stat_key(scope, outcome):
+    return f'{KEY_PREFIX}:stats:{scope}:{outcome}'
+
+
+def record_stat(scope, outcome):
+    key = stat_key(scope, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_cache_stats():
+    keys = [stat_key(scope, outcome) for scope in SCOPES for outcome in ('hit', 'miss')]
+    counts = cache.get_many(keys)
+    stats = {}
+    for scope in SCOPES:
+        hits = counts.get(stat_key(scope, 'hit'), 0)
+        misses = counts.get(stat_key(scope, 'miss'), 0)
+        total = hits + misses
+        stats[scope] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else None,
+        }
+    return stats
+
+
+def reset_cache_stats():
+    cache.delete_many([stat_key(scope, outcome) for scope in SCOPES for outcome in ('hit', 'miss')])
+
+
+# ===========================================
+# Response cache
+# ===========================================
+def normalize_params(request):
+    """query params เรียงตามชื่อ ตัดค่าว่างทิ้ง (?b=1&a=2 กับ ?a=2&b=1 ได้ key เดียวกัน)"""
+    params = []
+    for name in sorted(request.query_params):
+        values = sorted(value for value in request.query_params.getlist(name) if value != '')
+        if values:
+            params.append((name, values))
+    return params
+
+
+def response_key(request, scope, versions):
+    raw = repr((request.get_host(), request.is_secure(), normalize_params(request)))
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:resp:{scope}:{".".join(versions)}:{digest}'
+
+
+def cached_response(request, scope, version_names, compute):
+    """
+    คืน response จาก cache หรือเรียก compute() แล้วเก็บผล (เฉพาะ status 200)
+    header X-Cache บอกว่าเป็น HIT, MISS หรือ BYPASS (ปิด cache)
+    """
+    config = get_cache_settings()
+    if not config['ENABLED']:
+        response = compute()
+        response['X-Cache'] = 'BYPASS'
+        return response
+
+    key = response_key(request, scope, get_versions(version_names))
+    cached = cache.get(key)
+    if cached is None:
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, 1, timeout=config['LOCK_TIMEOUT']):
+            try:
+                return _compute_and_store(key, scope, compute, config)
+            finally:
+                cache.delete(lock_key)
+
+        # มี request อื่นกำลังคำนวณอยู่: รอผล
+        deadline = time.monotonic() + config['WAIT_TIMEOUT']
+        while cached is None and time.monotonic() < deadline:
+            time.sleep(WAIT_STEP)
+            cached = cache.get(key)
+        if cached is None:
+            return _compute_and_store(key, scope, compute, config)
+
+    record_stat(scope, 'hit')
+    response = Response(cached)
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def _compute_and_store(key, scope, compute, config):
+    record_stat(scope, 'miss')
+    response = compute()
+    if response.status_code == 200:
+        cache.set(key, response.data, timeout=config['TIMEOUT'])
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+# ===========================================
+# Category payload
+# ===========================================
+def get_category_payloads(request=None):
+    """
+    ข้อมูลหมวดหมู่ที่เปิดใช้งานทั้งหมดแบบ serialize แล้ว {category_id: data}
+    คำนวณด้วย query เดียว (นับสินค้าแบบ GROUP BY) แล้ว cache ตาม version 'categories'
+    """
+    from .models import Category
+    from .serializers import CategorySerializer
+
+    host = request.get_host() if request is not None else ''
+    version = get_versions(['categories'])[0]
+    key = f'{KEY_PREFIX}:category-payloads:{version}:{hashlib.md5(host.encode("utf-8")).hexdigest()}'
+
+    payloads = cache.get(key)
+    if payloads is None:
+        categories = Category.objects.filter(is_active=True).with_product_count()
+        data = CategorySerializer(categories, many=True, context={'request': request}).data
+        payloads = {item['id']: dict(item) for item in data}
+        cache.set(key, payloads, timeout=get_cache_settings()['CATEGORY_TIMEOUT'])
+    return payloads
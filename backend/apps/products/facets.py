@@ -0,0 +1,109 @@
+"""
+===========================================
+Products App - Facets
+===========================================
+นับจำนวนสินค้าตามหมวดหมู่ / ช่วงราคา / สถานะสต็อก / ร้านค้า ของผลลัพธ์ปัจจุบัน
+(หลังผ่าน ProductFilter และ ?search= แล้ว) สำหรับแถบตัวกรองหน้าร้าน
+
+แต่ละ facet นับแยกกัน จำนวนแถวจึงไม่คูณกันข้ามมิติ:
+    - หมวดหมู่ / ร้านค้า   -> GROUP BY ของมิตินั้น query ละมิติ
+    - ช่วงราคา / สถานะสต็อก -> conditional aggregate (COUNT ... FILTER) รวมใน query เดียว
+
+การใช้งาน:
+    GET /api/products/?category=3&facets=category,price,in_stock,seller
+    GET /api/products/?facets=all
+
+ช่วงราคาตั้งค่าได้ที่ settings.PRODUCT_FACETS['PRICE_BUCKETS'] (ขอบล่างของแต่ละช่วง)
+"""
+from django.conf import settings
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+FACETS = ('category', 'price', 'in_stock', 'seller')
+DEFAULT_PRICE_BUCKETS = [0, 100, 500, 1000, 5000, 10000]
+
+
+def get_price_buckets():
+    return getattr(settings, 'PRODUCT_FACETS', {}).get('PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS)
+
+
+def parse_facets(value):
+    """แปลงค่า ?facets= เป็นรายชื่อ facet (ค่าว่าง = ไม่ขอ facet)"""
+    if not value:
+        return []
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    if 'all' in names:
+        return list(FACETS)
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise ValidationError({'facets': f'ไม่รู้จัก facet: {", ".join(unknown)} (ใช้ได้: {", ".join(FACETS)})'})
+    return [name for name in FACETS if name in names]
+
+
+def price_bucket_filters(buckets):
+    """เงื่อนไขของแต่ละช่วงราคา: ช่วง i คือ buckets[i] <= price < buckets[i + 1] (ช่วงแรกไม่มีขอบล่าง)"""
+    filters = []
+    for index, lower in enumerate(buckets):
+        condition = Q(price__gte=lower) if index > 0 else Q()
+        if index + 1 < len(buckets):
+            condition &= Q(price__lt=buckets[index + 1])
+        filters.append(condition)
+    return filters
+
+
+def compute_facets(queryset, facets):
+    """นับ facet ที่ขอจาก queryset (1 query ต่อมิติที่ต้อง GROUP BY + 1 query สำหรับราคา/สต็อก)"""
+    buckets = get_price_buckets()
+    queryset = queryset.order_by()
+    result = {}
+
+    if 'category' in facets:
+        rows = (
+            queryset.filter(category__isnull=False)
+            .values('category_id', 'category__name', 'category__slug')
+            .annotate(facet_count=Count('id'))
+        )
+        result['category'] = sorted(
+            (
+                {
+                    'id': row['category_id'],
+                    'name': row['category__name'],
+                    'slug': row['category__slug'],
+                    'count': row['facet_count'],
+                }
+                for row in rows
+            ),
+            key=lambda entry: (-entry['count'], entry['name']),
+        )
+
+    aggregates = {}
+    if 'price' in facets:
+        for index, condition in enumerate(price_bucket_filters(buckets)):
+            aggregates[f'price_{index}'] = Count('id', filter=condition)
+    if 'in_stock' in facets:
+        aggregates['in_stock'] = Count('id', filter=Q(stock__gt=0))
+        aggregates['out_of_stock'] = Count('id', filter=Q(stock__lte=0))
+    if aggregates:
+        totals = queryset.aggregate(**aggregates)
+        if 'price' in facets:
+            result['price'] = [
+                {
+                    'min': lower,
+                    'max': buckets[index + 1] if index + 1 < len(buckets) else None,
+                    'count': totals[f'price_{index}'],
+                }
+                for index, lower in enumerate(buckets)
+            ]
+        if 'in_stock' in facets:
+            result['in_stock'] = {'true': totals['in_stock'], 'false': totals['out_of_stock']}
+
+    if 'seller' in facets:
+        rows = queryset.values('seller_id', 'seller__shop_name').annotate(facet_count=Count('id'))
+        result['seller'] = sorted(
+            (
+                {'id': row['seller_id'], 'shop_name': row['seller__shop_name'], 'count': row['facet_count']}
+                for row in rows
+            ),
+            key=lambda entry: (-entry['count'], entry['shop_name'] or ''),
+        )
+    return result
@@ -0,0 +1,250 @@
+"""
+===========================================
+Products App - Bulk Import
+===========================================
+นำเข้าสินค้าจำนวนมากจากไฟล์ CSV หรือ JSONL (อ่านแบบ stream ทีละแถว)
+
+ขั้นตอนต่อชุด (CHUNK_SIZE แถว):
+    1. ตรวจแต่ละแถวด้วย ProductImportRowSerializer
+    2. หาหมวดหมู่ที่อ้างถึงทั้งหมดด้วย query เดียว (id หรือ slug)
+    3. จอง slug ทั้งชุดด้วย allocate_slugs (ชน unique constraint = จองใหม่แล้วลองอีกครั้ง)
+    4. bulk_create สินค้าและรูปภาพใน transaction ของชุดนั้น
+
+แถวที่ผิดจะถูกข้ามและรายงานกลับเป็น {'row': เลขแถว, 'errors': {...}}
+
+คอลัมน์ที่รองรับ:
+    name, description, price, stock, category (id หรือ slug), image_urls, is_active
+    (CSV: image_urls คั่นด้วย "|" / JSONL: เป็น list ได้)
+
+ใช้ผ่าน:
+    POST /api/products/import/                  (ไฟล์ใหญ่จะส่งต่อให้ Celery)
+    python manage.py import_products <ไฟล์> --seller <email>
+"""
+import codecs
+import csv
+import json
+import logging
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from rest_framework import serializers
+
+from .models import Category, Product, ProductImage, pick_main_image_url
+from .slugs import SLUG_RETRIES, allocate_slugs
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+MAX_REPORTED_ERRORS = 1000
+
+
+def get_import_settings():
+    config = {
+        'CHUNK_SIZE': 500,
+        'ASYNC_THRESHOLD': 1024 * 1024,
+        'MAX_IMAGES': 10,
+        'TASK_OWNER_TTL': 24 * 60 * 60,
+    }
+    config.update(getattr(settings, 'PRODUCT_IMPORT', {}))
+    return config
+
+
+def task_owner_key(task_id):
+    return f'product_import:owner:{task_id}'
+
+
+def remember_task_owner(task_id, seller_id):
+    """บันทึกเจ้าของงานนำเข้าตอนส่งให้ Celery (ใช้ตรวจสิทธิ์ดูสถานะทุกสถานะ)"""
+    cache.set(task_owner_key(task_id), seller_id, get_import_settings()['TASK_OWNER_TTL'])
+
+
+def get_task_owner(task_id):
+    return cache.get(task_owner_key(task_id))
+
+
+class ImageUrlsField(serializers.ListField):
+    """รับได้ทั้ง list และ string ที่คั่นด้วย "|" (จาก CSV)"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = [url.strip() for url in data.split('|') if url.strip()]
+        return super().to_internal_value(data)
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    stock = serializers.IntegerField(min_value=0, required=False, default=0)
+    category = serializers.CharField()
+    image_urls = ImageUrlsField(child=serializers.URLField(max_length=500), required=False, default=list)
+    is_active = serializers.BooleanField(required=False, default=True)
+
+    def validate_image_urls(self, value):
+        max_images = get_import_settings()['MAX_IMAGES']
+        if len(value) > max_images:
+            raise serializers.ValidationError(f'รูปภาพได้ไม่เกิน {max_images} รูปต่อสินค้า')
+        return value
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    return 'csv'
+
+
+def iter_rows(fileobj, file_format):
+    """
+    อ่านไฟล์ทีละแถว คืน (เลขแถว, dict หรือ None ถ้าอ่านไม่ได้)
+    fileobj เป็น binary file (เช่น UploadedFile) อ่านแบบ utf-8 (รองรับ BOM จาก Excel)
+    """
+    text = codecs.getreader('utf-8-sig')(fileobj)
+    if file_format == 'jsonl':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        reader = csv.DictReader(text)
+        for row in reader:
+            # บรรทัดที่ 1 เป็น header
+            yield reader.line_num, {key: value for key, value in row.items() if key}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ProductImporter:
+    """นำเข้าสินค้าให้ seller คนเดียว ผลรวมอยู่ใน total / created / errors"""
+
+    def __init__(self, seller, chunk_size=None):
+        self.seller = seller
+        self.chunk_size = chunk_size or get_import_settings()['CHUNK_SIZE']
+        self.total = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        self._categories = {}
+
+    def run(self, fileobj, file_format='csv'):
+        if file_format not in FORMATS:
+            raise ValueError(f'Unsupported import format: {file_format}')
+        for chunk in chunked(iter_rows(fileobj, file_format), self.chunk_size):
+            self.import_chunk(chunk)
+        return self.result()
+
+    def result(self):
+        return {
+            'total': self.total,
+            'created': self.created,
+            'failed': self.error_count,
+            'errors': self.errors,
+        }
+
+    def add_error(self, row_number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def import_chunk(self, rows):
+        self.total += len(rows)
+
+        valid = []
+        for row_number, row in rows:
+            if row is None:
+                self.add_error(row_number, {'non_field_errors': ['อ่านข้อมูลแถวนี้ไม่ได้']})
+                continue
+            serializer = ProductImportRowSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((row_number, serializer.validated_data))
+            else:
+                self.add_error(row_number, serializer.errors)
+
+        self.load_categories(data['category'] for _, data in valid)
+
+        ready = []
+        for row_number, data in valid:
+            category = self._categories.get(data['category'])
+            if category is None:
+                self.add_error(row_number, {'category': ['หมวดหมู่ไม่ถูกต้อง']})
+                continue
+            ready.append((data, category))
+
+        if ready:
+            self.create_products(ready)
+
+    def load_categories(self, references):
+        """หาหมวดหมู่ที่ยังไม่เคยเจอด้วย query เดียว (อ้างถึงได้ทั้ง id และ slug)"""
+        missing = {reference.strip() for reference in references} - set(self._categories)
+        if not missing:
+            return
+        ids = [int(reference) for reference in missing if reference.isdigit()]
+        found = Category.objects.filter(is_active=True).filter(Q(pk__in=ids) | Q(slug__in=missing))
+        for category in found:
+            self._categories[str(category.pk)] = category
+            self._categories[category.slug] = category
+        for reference in missing:
+            self._categories.setdefault(reference, None)
+
+    def create_products(self, ready):
+        slugs = allocate_slugs(Product, [data['name'] for data, _ in ready])
+
+        products = []
+        images = []
+        for (data, category), slug in zip(ready, slugs):
+            product = Product(
+                seller=self.seller,
+                category=category,
+                name=data['name'],
+                slug=slug,
+                description=data['description'],
+                price=data['price'],
+                stock=data['stock'],
+                is_active=data['is_active'],
+            )
+            product_images = [
+                ProductImage(product=product, image_url=url, is_main=(index == 0), order=index)
+                for index, url in enumerate(data['image_urls'])
+            ]
+            product.main_image_url = pick_main_image_url(product_images) or ''
+            products.append(product)
+            images.append(product_images)
+
+        for attempt in range(SLUG_RETRIES):
+            try:
+                with transaction.atomic():
+                    Product.objects.bulk_create(products)
+                    ProductImage.objects.bulk_create([image for group in images for image in group])
+                break
+            except IntegrityError:
+                # มีการสร้างสินค้าชื่อเดียวกันพร้อมกัน: จอง slug ทั้งชุดใหม่แล้วลองอีกครั้ง
+                if attempt == SLUG_RETRIES - 1:
+                    raise
+                for product in products:
+                    product.pk = None
+                for product, slug in zip(products, allocate_slugs(Product, [product.name for product in products])):
+                    product.slug = slug
+
+        from .signals import products_bulk_created
+
+        products_bulk_created(products)
+        self.created += len(products)
+
+
+def import_products(fileobj, seller, file_format='csv', chunk_size=None):
+    """นำเข้าสินค้าจากไฟล์ คืนค่า dict สรุปผล"""
+    return ProductImporter(seller, chunk_size=chunk_size).run(fileobj, file_format)
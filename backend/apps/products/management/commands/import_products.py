@@ -0,0 +1,50 @@
+"""
+===========================================
+Import Products Command
+===========================================
+นำเข้าสินค้าจำนวนมากจากไฟล์ CSV หรือ JSONL ให้ seller
+
+การใช้งาน:
+    python manage.py import_products products.csv --seller seller@example.com
+    python manage.py import_products products.jsonl --seller 5 --chunk-size 1000
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.importer import FORMATS, detect_format, import_products
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'นำเข้าสินค้าจากไฟล์ CSV หรือ JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='ไฟล์ที่จะนำเข้า')
+        parser.add_argument('--seller', required=True, help='email หรือ id ของ seller')
+        parser.add_argument('--format', choices=FORMATS, help='รูปแบบไฟล์ (ไม่ระบุ = ดูจากนามสกุล)')
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        seller_ref = options['seller']
+        lookup = {'pk': int(seller_ref)} if seller_ref.isdigit() else {'email': seller_ref}
+        try:
+            seller = User.objects.get(role=User.Role.SELLER, **lookup)
+        except User.DoesNotExist:
+            raise CommandError(f'ไม่พบ seller: {seller_ref}')
+
+        file_format = options['format'] or detect_format(options['path'])
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                result = import_products(fileobj, seller, file_format, chunk_size=options['chunk_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(f"   แถว {error['row']}: {error['errors']}"))
+        if result['failed'] > len(result['errors']):
+            self.stdout.write(self.style.WARNING(f"   ... และอีก {result['failed'] - len(result['errors'])} แถว"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ นำเข้าสินค้า {result['created']}/{result['total']} รายการ (ผิดพลาด {result['failed']} แถว)"
+        ))
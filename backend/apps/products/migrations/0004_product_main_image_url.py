@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:55
+
+from django.db import migrations, models
+
+
+def backfill_main_image_url(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    ProductImage = apps.get_model("products", "ProductImage")
+
+    products = {}
+    for image in ProductImage.objects.order_by(
+        "product_id", "-is_main", "order", "created_at"
+    ):
+        if image.product_id in products:
+            continue
+        products[image.product_id] = image.image_url or (
+            image.image.url if image.image else ""
+        )
+
+    for product_id, url in products.items():
+        Product.objects.filter(pk=product_id).update(main_image_url=url or "")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0003_product_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="main_image_url",
+            field=models.CharField(blank=True, default="", max_length=500),
+        ),
+        migrations.RunPython(backfill_main_image_url, migrations.RunPython.noop),
+    ]
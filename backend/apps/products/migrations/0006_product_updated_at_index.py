@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0005_product_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="product",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
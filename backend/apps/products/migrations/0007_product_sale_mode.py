@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0006_product_updated_at_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="sale_mode",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -5,8 +5,19 @@ Products Models (with Firebase Support)
 """
 from django.db import models
 from django.conf import settings
-from django.utils.text import slugify
-import uuid
+
+from .slugs import save_with_unique_slug
+
+
+class CategoryQuerySet(models.QuerySet):
+    def with_product_count(self):
+        """
+        นับสินค้าที่เปิดขายของแต่ละหมวดหมู่ใน query เดียว (GROUP BY) เก็บไว้ที่ active_product_count
+        GROUP BY ไม่ใช้ Meta.ordering จึงเรียงตามชื่อเอง (ไม่ให้การแบ่งหน้าได้ลำดับสุ่ม)
+        """
+        return self.annotate(
+            active_product_count=models.Count('products', filter=models.Q(products__is_active=True))
+        ).order_by('name')
 
 
 class Category(models.Model):
@@ -19,6 +30,8 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = 'Categories'
         ordering = ['name']
@@ -27,17 +40,9 @@ class Category(models.Model):
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.name, allow_unicode=True)
-            if not base_slug:
-                base_slug = str(uuid.uuid4())[:8]
-            slug = base_slug
-            counter = 1
-            while Category.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        if self.slug:
+            return super().save(*args, **kwargs)
+        return save_with_unique_slug(self, lambda: super(Category, self).save(*args, **kwargs), self.name)
 
 
 class Product(models.Model):
@@ -60,50 +65,85 @@ class Product(models.Model):
     stock = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
     views_count = models.PositiveIntegerField(default=0)
+
+    # สินค้าขายดีช่วงแฟลชเซล: checkout เข้าคิวแทนการแย่งล็อกแถวนี้ (ดู apps/orders/checkout_queue.py)
+    sale_mode = models.BooleanField(default=False)
+
+    # URL รูปหลักแบบ denormalized (อัพเดทโดย ProductImage.save/delete)
+    main_image_url = models.CharField(max_length=500, blank=True, default='')
+
+    # คะแนนรีวิวแบบ denormalized (อัพเดทโดย apps.reviews.signals ทุกครั้งที่รีวิวเปลี่ยน)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_average = models.FloatField(default=0, db_index=True)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # ใช้ sync search index
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # สำหรับ keyset pagination (field ที่เรียง + id เป็น tiebreaker)
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['views_count', 'id'], name='product_views_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.name, allow_unicode=True)
-            if not base_slug:
-                base_slug = str(uuid.uuid4())[:8]
-            slug = base_slug
-            counter = 1
-            while Product.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        if self.slug:
+            return super().save(*args, **kwargs)
+        return save_with_unique_slug(self, lambda: super(Product, self).save(*args, **kwargs), self.name)
 
     @property
     def average_rating(self):
-        reviews = self.reviews.all()
-        if reviews:
-            return round(sum(r.rating for r in reviews) / len(reviews), 1)
+        if self.rating_count:
+            return round(self.rating_sum / self.rating_count, 1)
         return 0
 
     @property
     def review_count(self):
-        return self.reviews.count()
+        return self.rating_count
+
+    @property
+    def rating_histogram(self):
+        """จำนวนรีวิวแยกตามคะแนน 1-5"""
+        return {star: getattr(self, f'rating_{star}_count') for star in range(1, 6)}
 
     @property
     def main_image(self):
-        """ดึงรูปหลักของสินค้า"""
-        main_img = self.images.filter(is_main=True).first()
-        if main_img:
-            return main_img.image_url or (main_img.image.url if main_img.image else None)
-        first_img = self.images.first()
-        if first_img:
-            return first_img.image_url or (first_img.image.url if first_img.image else None)
+        """ดึงรูปหลักของสินค้า (ใช้ค่าที่เก็บไว้ หรือรูปที่ prefetch มาแล้ว)"""
+        if self.main_image_url:
+            return self.main_image_url
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('images')
+        if prefetched is not None:
+            return pick_main_image_url(prefetched)
         return None
 
+    def refresh_main_image(self):
+        """คำนวณ main_image_url ใหม่จากรูปในฐานข้อมูล"""
+        images = self.images.order_by('-is_main', 'order', 'created_at')[:1]
+        self.main_image_url = pick_main_image_url(images) or ''
+        Product.objects.filter(pk=self.pk).update(main_image_url=self.main_image_url)
+
+
+def pick_main_image_url(images):
+    """เลือก URL รูปหลักจากรายการรูป (รูปที่ is_main ก่อน ไม่งั้นใช้รูปแรก)"""
+    images = list(images)
+    for image in images:
+        if image.is_main:
+            return image.get_image_url()
+    if images:
+        return images[0].get_image_url()
+    return None
+
 
 class ProductImage(models.Model):
     """รูปภาพสินค้า (รองรับทั้ง upload และ Firebase URL)"""
@@ -132,6 +172,12 @@ class ProductImage(models.Model):
                 is_main=True
             ).exclude(pk=self.pk).update(is_main=False)
         super().save(*args, **kwargs)
+        self.product.refresh_main_image()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.product.refresh_main_image()
+        return result
 
     def get_image_url(self):
         """ดึง URL ของรูปภาพ (Firebase URL หรือ local)"""
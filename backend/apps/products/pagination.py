@@ -0,0 +1,149 @@
+"""
+===========================================
+Products App - Pagination
+===========================================
+Keyset (cursor) pagination สำหรับหน้ารายการสินค้า
+ใช้ค่าของ field ที่เรียงลำดับ + id ของแถวสุดท้ายเป็น cursor แทน OFFSET
+และไม่ต้อง COUNT(*) ทั้งตาราง ทำให้หน้าลึกๆ / infinite scroll เร็วเท่าหน้าแรก
+
+การใช้งาน:
+    GET /api/products/?pagination=cursor&ordering=-price
+    GET /api/products/?cursor=<next cursor จาก response ก่อนหน้า>
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def wants_cursor_pagination(request):
+    """client ขอใช้ cursor pagination หรือไม่"""
+    params = request.query_params
+    return params.get('pagination') == 'cursor' or 'cursor' in params
+
+
+class ProductCursorPagination(BasePagination):
+    """
+    Cursor pagination แบบ keyset: WHERE (field, id) > (value, last_id)
+    รองรับเฉพาะการเลื่อนไปข้างหน้า (next) ซึ่งเพียงพอสำหรับ infinite scroll
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    default_ordering = '-created_at'
+    tiebreaker = 'id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        field_name = self.ordering.lstrip('-')
+        descending = self.ordering.startswith('-')
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{field_name}', f'{prefix}{self.tiebreaker}')
+
+        cursor = self.decode_cursor(request, queryset.model, field_name)
+        if cursor is not None:
+            value, last_id = cursor
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field_name}__{lookup}': value})
+                | Q(**{field_name: value, f'{self.tiebreaker}__{lookup}': last_id})
+            )
+
+        # ดึงเกินมา 1 แถวเพื่อรู้ว่ายังมีหน้าถัดไปหรือไม่ (ไม่ต้อง COUNT)
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        self.next_cursor = None
+        if self.has_next:
+            self.next_cursor = self.encode_cursor(self.page[-1], field_name)
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        """ใช้ ordering จาก OrderingFilter ของ view (field แรก) ไม่งั้นใช้ค่า default"""
+        ordering = None
+        if view is not None and OrderingFilter in getattr(view, 'filter_backends', []):
+            ordering = OrderingFilter().get_ordering(request, queryset, view)
+        if ordering:
+            field_name = ordering[0].lstrip('-')
+            try:
+                queryset.model._meta.get_field(field_name)
+                return ordering[0]
+            except FieldDoesNotExist:
+                pass
+        return self.default_ordering
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def encode_cursor(self, instance, field_name):
+        field = instance._meta.get_field(field_name)
+        payload = {
+            'o': self.ordering,
+            'v': field.value_to_string(instance),
+            'id': getattr(instance, self.tiebreaker),
+        }
+        raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request, model, field_name):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            # cursor ต้องมาจาก ordering เดียวกัน
+            if payload['o'] != self.ordering:
+                raise ValueError('ordering mismatch')
+            value = model._meta.get_field(field_name).to_python(payload['v'])
+            last_id = int(payload['id'])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return value, last_id
@@ -0,0 +1,419 @@
+"""
+===========================================
+Products App - Search Engine
+===========================================
+ค้นหาสินค้าแบบ full-text รองรับภาษาไทย (ไม่มีช่องว่างระหว่างคำ)
+
+- ตัดคำไทยด้วย dictionary (longest matching) + character bigram เป็น fallback
+  สำหรับคำที่ไม่มีในพจนานุกรม (เช่น ชื่อแบรนด์ภาษาไทย)
+- inverted index ในหน่วยความจำ จัดอันดับด้วย BM25 (ชื่อสินค้ามีน้ำหนักมากกว่ารายละเอียด)
+- อัพเดทแบบ incremental จาก signal ของ Product และ sync ตาม updated_at เป็นระยะ
+  เพื่อรับการเปลี่ยนแปลงจาก process อื่น
+- index สร้างครั้งแรกใน background thread ของแต่ละ process ระหว่างนั้นใช้ icontains ไปก่อน
+
+ใช้ผ่าน ProductSearchFilter: GET /api/products/?search=เสื้อยืด
+
+ผลค้นหาเก็บแค่ MAX_RESULTS รายการที่คะแนนสูงสุด (สินค้าอันดับถัดจากนั้นจะไม่ปรากฏในทุกหน้า)
+ProductViewSet แบ่งหน้าบน list ของ id ที่เรียงตามคะแนนแล้ว โหลดจากฐานข้อมูลเฉพาะสินค้าของหน้าปัจจุบัน
+"""
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+from rest_framework.settings import api_settings
+
+from .thai_words import THAI_WORDS
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[\u0e00-\u0e7f]+|[a-z0-9]+')
+THAI_RE = re.compile(r'[\u0e00-\u0e7f]')
+
+# prefix ของ token ที่เป็น n-gram (กันชนกับคำจริง)
+NGRAM_PREFIX = '#'
+NGRAM_WEIGHT = 0.3
+NAME_BOOST = 3
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def get_search_settings():
+    config = {
+        'MAX_RESULTS': 1000,
+        'SYNC_INTERVAL': 30,
+        'DESCRIPTION_CHARS': 300,
+        'DICTIONARY_PATH': None,
+        'BACKGROUND_BUILD': True,
+    }
+    config.update(getattr(settings, 'PRODUCT_SEARCH', {}))
+    return config
+
+
+# ===========================================
+# Tokenizer
+# ===========================================
+
+class ThaiTokenizer:
+    """ตัดคำไทยแบบ longest matching ด้วยพจนานุกรม"""
+
+    def __init__(self, words):
+        self.words = frozenset(words)
+        # prefix ทุกตัวของทุกคำ ใช้หยุดการไล่ความยาวเมื่อไม่มีคำไหนขึ้นต้นแบบนี้ (แทน trie)
+        self.prefixes = frozenset(word[:i] for word in self.words for i in range(1, len(word) + 1))
+
+    def _matches_at(self, text, start):
+        """คำในพจนานุกรมทุกคำที่เริ่มที่ตำแหน่ง start (เรียงจากสั้นไปยาว)"""
+        matches = []
+        end = start + 1
+        length = len(text)
+        while end <= length:
+            candidate = text[start:end]
+            if candidate not in self.prefixes:
+                break
+            if end - start > 1 and candidate in self.words:
+                matches.append(candidate)
+            end += 1
+        return matches
+
+    def all_matches(self, text):
+        """list ของคำที่เริ่มในแต่ละตำแหน่ง (คำนวณครั้งเดียวใช้ได้ทั้ง segment และ find_words)"""
+        return [self._matches_at(text, i) for i in range(len(text))]
+
+    def segment(self, text, matches=None):
+        """แบ่งข้อความไทย (ไม่มีช่องว่าง) เป็นคำ ส่วนที่ไม่รู้จักรวมเป็นก้อนเดียว"""
+        tokens = []
+        unknown = []
+        i = 0
+        length = len(text)
+        while i < length:
+            candidates = matches[i] if matches is not None else self._matches_at(text, i)
+            if candidates:
+                if unknown:
+                    tokens.append(''.join(unknown))
+                    unknown = []
+                tokens.append(candidates[-1])
+                i += len(candidates[-1])
+            else:
+                unknown.append(text[i])
+                i += 1
+        if unknown:
+            tokens.append(''.join(unknown))
+        return tokens
+
+    def find_words(self, text, matches=None):
+        """คำในพจนานุกรมทุกคำที่ปรากฏในข้อความ (ซ้อนกันได้)"""
+        if matches is None:
+            matches = self.all_matches(text)
+        return {word for candidates in matches for word in candidates}
+
+
+@lru_cache(maxsize=None)
+def get_thai_tokenizer():
+    words = set(THAI_WORDS)
+    path = get_search_settings()['DICTIONARY_PATH']
+    if path:
+        with open(path, encoding='utf-8') as f:
+            words.update(line.strip() for line in f if line.strip())
+    return ThaiTokenizer(words)
+
+
+def normalize(text):
+    return unicodedata.normalize('NFC', text or '').lower()
+
+
+def ngrams(text):
+    return [NGRAM_PREFIX + text[i:i + 2] for i in range(len(text) - 1)]
+
+
+def tokenize(text, for_query=False, use_ngrams=True):
+    """
+    แปลงข้อความเป็น list ของ token
+    - คำละติน/ตัวเลข: ตัวพิมพ์เล็ก
+    - ภาษาไทย (เอกสาร): คำจากการตัดคำ + คำในพจนานุกรมทุกคำที่ซ้อนอยู่ข้างใน
+      (เช่น "สีดำ" ได้ทั้ง สีดำ/สี/ดำ) + bigram ของทั้งข้อความ
+    - ภาษาไทย (คำค้น): คำจากการตัดคำ + bigram เฉพาะส่วนที่ไม่อยู่ในพจนานุกรม
+    """
+    tokenizer = get_thai_tokenizer()
+    tokens = []
+    for run in TOKEN_RE.findall(normalize(text)):
+        if not THAI_RE.match(run):
+            tokens.append(run)
+            continue
+        if for_query:
+            words = tokenizer.segment(run)
+            tokens.extend(words)
+            if use_ngrams:
+                for word in words:
+                    if word not in tokenizer.words:
+                        tokens.extend(ngrams(word))
+            continue
+        matches = tokenizer.all_matches(run)
+        words = tokenizer.segment(run, matches)
+        tokens.extend(words)
+        found = tokenizer.find_words(run, matches)
+        found.difference_update(words)
+        tokens.extend(found)
+        if use_ngrams:
+            tokens.extend(ngrams(run))
+    return tokens
+
+
+def term_weight(term):
+    return NGRAM_WEIGHT if term.startswith(NGRAM_PREFIX) else 1.0
+
+
+# ===========================================
+# Inverted Index
+# ===========================================
+
+class SearchIndex:
+    """inverted index + BM25 (thread-safe)"""
+
+    def __init__(self, description_chars=300):
+        self.description_chars = description_chars
+        self._lock = threading.RLock()
+        self.postings = defaultdict(dict)   # term -> {product_id: tf}
+        self.doc_terms = {}                 # product_id -> {term: tf}
+        self.doc_lengths = {}               # product_id -> length
+        self.doc_norms = {}                 # product_id -> ส่วน length normalization ของ BM25
+        self.norm_avg_length = None
+        self.total_length = 0
+        self.is_built = False
+        self._building = False
+        self.synced_until = None
+        self.last_sync_check = 0
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def _document_terms(self, name, description):
+        terms = Counter()
+        for token in tokenize(name):
+            terms[token] += NAME_BOOST
+        # รายละเอียดใช้แค่ส่วนต้นและไม่ทำ n-gram เพื่อคุมขนาด index
+        for token in tokenize((description or '')[:self.description_chars], use_ngrams=False):
+            terms[token] += 1
+        return terms
+
+    def add(self, product_id, name, description=''):
+        terms = self._document_terms(name, description)
+        with self._lock:
+            self._remove(product_id)
+            for term, tf in terms.items():
+                self.postings[term][product_id] = tf
+            self.doc_terms[product_id] = terms
+            length = sum(terms.values())
+            self.doc_lengths[product_id] = length
+            self.total_length += length
+            if self.norm_avg_length:
+                self.doc_norms[product_id] = self._norm(length, self.norm_avg_length)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id):
+        terms = self.doc_terms.pop(product_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(product_id, 0)
+        self.doc_norms.pop(product_id, None)
+
+    @staticmethod
+    def _norm(length, avg_length):
+        return BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+
+    def _refresh_norms(self, avg_length):
+        """คำนวณ norm ของทุกสินค้าใหม่เมื่อความยาวเฉลี่ยเปลี่ยนไปเกิน 5%"""
+        if self.norm_avg_length and abs(avg_length - self.norm_avg_length) <= self.norm_avg_length * 0.05:
+            return
+        self.norm_avg_length = avg_length
+        self.doc_norms = {
+            product_id: self._norm(length, avg_length)
+            for product_id, length in self.doc_lengths.items()
+        }
+
+    def search(self, query, limit=1000):
+        """คืนค่า list ของ (product_id, score) เรียงจากคะแนนมากไปน้อย"""
+        query_terms = Counter()
+        for token in tokenize(query, for_query=True):
+            query_terms[token] += term_weight(token)
+
+        with self._lock:
+            total_docs = len(self.doc_terms)
+            if not total_docs or not query_terms:
+                return []
+            self._refresh_norms(self.total_length / total_docs)
+            norms = self.doc_norms
+            doc_freqs = {term: len(self.postings.get(term, ())) for term in query_terms}
+            selective = any(0 < df <= total_docs * 0.2 for df in doc_freqs.values())
+
+            scores = defaultdict(float)
+            for term, weight in query_terms.items():
+                doc_freq = doc_freqs[term]
+                if not doc_freq:
+                    continue
+                # term ที่พบในสินค้าส่วนใหญ่แทบไม่ช่วยจัดอันดับ (idf ต่ำ) ข้ามถ้ามี term อื่นที่เจาะจงกว่า
+                if selective and (
+                    doc_freq > total_docs * 0.5
+                    or (term.startswith(NGRAM_PREFIX) and doc_freq > total_docs * 0.2)
+                ):
+                    continue
+                postings = self.postings[term]
+                idf = math.log(1 + (total_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+                factor = weight * idf * (BM25_K1 + 1)
+                for product_id, tf in postings.items():
+                    scores[product_id] += factor * tf / (tf + norms[product_id])
+
+        if len(scores) <= limit:
+            return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+
+    def build(self):
+        """สร้าง index ใหม่ทั้งหมดจากฐานข้อมูล (สร้างแยกแล้วค่อยสลับเข้ามา ไม่ block การค้นหา)"""
+        from .models import Product
+
+        started = timezone.now()
+        fresh = SearchIndex(description_chars=self.description_chars)
+        rows = Product.objects.values_list('id', 'name', 'description')
+        for product_id, name, description in rows.iterator(chunk_size=2000):
+            fresh.add(product_id, name, description)
+
+        with self._lock:
+            self.postings = fresh.postings
+            self.doc_terms = fresh.doc_terms
+            self.doc_lengths = fresh.doc_lengths
+            self.total_length = fresh.total_length
+            self.doc_norms = {}
+            self.norm_avg_length = None
+            self.synced_until = started
+            self.last_sync_check = time.monotonic()
+            self.is_built = True
+
+    def sync(self):
+        """ดึงสินค้าที่เปลี่ยนหลัง synced_until (เช่นจาก process อื่น) เข้ามาใน index"""
+        from .models import Product
+
+        started = timezone.now()
+        rows = Product.objects.filter(updated_at__gte=self.synced_until)
+        for product_id, name, description in rows.values_list('id', 'name', 'description').iterator(chunk_size=2000):
+            self.add(product_id, name, description)
+        self.synced_until = started
+        self.last_sync_check = time.monotonic()
+
+    def ensure_fresh(self, sync_interval, background=False):
+        """เตรียม index ให้พร้อม คืนค่า False ถ้ายังสร้างไม่เสร็จ (กำลังสร้างใน background)"""
+        if self.is_built:
+            if time.monotonic() - self.last_sync_check >= sync_interval:
+                self.sync()
+            return True
+        if not background:
+            self.build()
+            return True
+        self.build_in_background()
+        return False
+
+    def build_in_background(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._background_build, name='product-search-index', daemon=True).start()
+
+    def _background_build(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Failed to build product search index')
+        finally:
+            self._building = False
+            connection.close()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex(description_chars=get_search_settings()['DESCRIPTION_CHARS'])
+    return _index
+
+
+def reset_search_index():
+    """ล้าง index ของ process นี้ (จะสร้างใหม่เมื่อค้นหาครั้งถัดไป)"""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def search_products(query, limit=None):
+    """คืนค่า list ของ (product_id, score) หรือ None ถ้า index ยังไม่พร้อม"""
+    config = get_search_settings()
+    index = get_search_index()
+    if not index.ensure_fresh(config['SYNC_INTERVAL'], background=config['BACKGROUND_BUILD']):
+        return None
+    return index.search(query, limit or config['MAX_RESULTS'])
+
+
+# ===========================================
+# DRF Filter Backend
+# ===========================================
+
+class ProductSearchFilter(BaseFilterBackend):
+    """
+    ?search= ค้นหาจาก SearchIndex กรองเหลือเฉพาะสินค้าที่ค้นเจอ
+    ถ้า client ไม่ส่ง ?ordering= มา เก็บ id ที่เรียงตามคะแนนไว้ที่ view.search_ranking
+    ให้ view แบ่งหน้าตามลำดับนั้นเอง (ดู ProductViewSet.ranked_page) แทนการ ORDER BY CASE ทั้งชุด
+    ต้องวางไว้หลัง OrderingFilter ใน filter_backends
+    """
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+
+        ranked = search_products(query)
+        if ranked is None:
+            # index กำลังสร้างครั้งแรก: ใช้การค้นหาแบบเดิมไปก่อน
+            return queryset.filter(Q(name__icontains=query) | Q(description__icontains=query))
+        if not ranked:
+            return queryset.none()
+
+        product_ids = [product_id for product_id, _ in ranked]
+        if OrderingFilter.ordering_param not in request.query_params:
+            view.search_ranking = product_ids
+        return queryset.filter(pk__in=product_ids)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.search_param,
+                'required': False,
+                'in': 'query',
+                'description': 'ค้นหาสินค้า (รองรับภาษาไทย จัดอันดับตามความเกี่ยวข้อง)',
+                'schema': {'type': 'string'},
+            },
+        ]
@@ -4,7 +4,8 @@ Products Serializers (with Firebase Support)
 ===========================================
 """
 from rest_framework import serializers
-from .models import Category, Product, ProductImage
+from .cache import get_category_payloads
+from .models import Category, Product, ProductImage, pick_main_image_url
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -15,7 +16,11 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug', 'description', 'image', 'product_count']
 
     def get_product_count(self, obj):
-        return obj.products.filter(is_active=True).count()
+        # ใช้ค่าที่ annotate มาแล้ว (Category.objects.with_product_count()) ถ้ามี
+        count = getattr(obj, 'active_product_count', None)
+        if count is None:
+            count = obj.products.filter(is_active=True).count()
+        return count
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
@@ -39,18 +44,12 @@ class ProductListSerializer(serializers.ModelSerializer):
         ]
 
     def get_main_image(self, obj):
-        main_img = obj.images.filter(is_main=True).first()
-        if main_img:
-            return main_img.image_url or (main_img.image.url if main_img.image else None)
-        first_img = obj.images.first()
-        if first_img:
-            return first_img.image_url or (first_img.image.url if first_img.image else None)
-        return None
+        return obj.main_image
 
 
 class ProductDetailSerializer(serializers.ModelSerializer):
     """Serializer สำหรับแสดงรายละเอียดสินค้า"""
-    category = CategorySerializer(read_only=True)
+    category = serializers.SerializerMethodField()
     seller = serializers.SerializerMethodField()
     images = ProductImageSerializer(many=True, read_only=True)
 
@@ -59,10 +58,20 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'slug', 'description', 'price', 'stock',
             'category', 'seller', 'images',
-            'average_rating', 'review_count', 'views_count',
+            'average_rating', 'review_count', 'rating_histogram', 'views_count',
             'is_active', 'created_at', 'updated_at'
         ]
 
+    def get_category(self, obj):
+        if obj.category_id is None:
+            return None
+        # หมวดหมู่ทั้งหมดถูก cache ไว้พร้อมจำนวนสินค้า ไม่ต้อง COUNT ทุกครั้งที่เปิดหน้าสินค้า
+        payload = get_category_payloads(self.context.get('request')).get(obj.category_id)
+        if payload is None:
+            # หมวดหมู่ที่ปิดใช้งานไม่อยู่ใน cache
+            payload = CategorySerializer(obj.category, context=self.context).data
+        return payload
+
     def get_seller(self, obj):
         return {
             'id': obj.seller.id,
@@ -112,23 +121,30 @@ class ProductCreateSerializer(serializers.ModelSerializer):
             **validated_data
         )
 
-        # สร้าง ProductImage จาก Firebase URLs
-        for i, url in enumerate(image_urls):
-            ProductImage.objects.create(
+        # สร้าง ProductImage จาก Firebase URLs และไฟล์ที่อัพโหลด (ถ้ามี) ในครั้งเดียว
+        product_images = [
+            ProductImage(
                 product=product,
                 image_url=url,
                 is_main=(i == 0),
                 order=i
             )
-
-        # สร้าง ProductImage จากไฟล์ที่อัพโหลด (ถ้ามี)
-        for i, image in enumerate(images):
-            ProductImage.objects.create(
+            for i, url in enumerate(image_urls)
+        ]
+        product_images += [
+            ProductImage(
                 product=product,
                 image=image,
                 is_main=(i == 0 and len(image_urls) == 0),
                 order=len(image_urls) + i
             )
+            for i, image in enumerate(images)
+        ]
+
+        if product_images:
+            ProductImage.objects.bulk_create(product_images)
+            product.main_image_url = pick_main_image_url(product_images) or ''
+            product.save(update_fields=['main_image_url'])
 
         return product
 
@@ -166,12 +182,19 @@ class ProductUpdateSerializer(serializers.ModelSerializer):
         # เพิ่มรูปใหม่ (ถ้ามี)
         if image_urls:
             existing_count = instance.images.count()
-            for i, url in enumerate(image_urls):
-                ProductImage.objects.create(
+            ProductImage.objects.bulk_create([
+                ProductImage(
                     product=instance,
                     image_url=url,
                     is_main=(existing_count == 0 and i == 0),
                     order=existing_count + i
                 )
+                for i, url in enumerate(image_urls)
+            ])
+
+            # สินค้าที่ยังไม่มีรูป: รูปแรกที่เพิ่มเข้ามาจะเป็นรูปหลัก
+            if existing_count == 0:
+                instance.main_image_url = image_urls[0]
+                instance.save(update_fields=['main_image_url'])
 
         return instance
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+===========================================
+Products App - Signals
+===========================================
+อัพเดท index ในหน่วยความจำ (search / suggest) เมื่อสินค้า หมวดหมู่ หรือร้านค้าเปลี่ยน
+และ bump version ของ catalog cache ที่เกี่ยวข้อง
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_categories, bump_products, bump_versions
+from .models import Category, Product, ProductImage
+from .search import get_search_index, get_search_settings
+from .suggest import get_suggest_index, get_suggest_settings, product_weight
+
+
+def warm_product_indexes(sender, **kwargs):
+    """เริ่มสร้าง index ใน background ตั้งแต่ request แรกของ process (ทำครั้งเดียว)"""
+    from django.core.signals import request_started
+
+    request_started.disconnect(warm_product_indexes, dispatch_uid='warm_product_indexes')
+    if get_search_settings()['BACKGROUND_BUILD']:
+        get_search_index().build_in_background()
+    if get_suggest_settings()['BACKGROUND_BUILD']:
+        get_suggest_index().build_in_background()
+
+
+@receiver(pre_save, sender=Product)
+def remember_category_state(sender, instance, update_fields=None, **kwargs):
+    """เก็บหมวดหมู่/สถานะเดิมไว้ เพื่อ bump cache หมวดหมู่เฉพาะเมื่อจำนวนสินค้าเปลี่ยน"""
+    instance._previous_category_state = None
+    if instance.pk and (update_fields is None or {'category', 'is_active'} & set(update_fields)):
+        instance._previous_category_state = (
+            Product.objects.filter(pk=instance.pk).values_list('category_id', 'is_active').first()
+        )
+
+
+@receiver(post_save, sender=Product)
+def invalidate_product_cache(sender, instance, created, **kwargs):
+    bump_products(instance.pk)
+
+    previous = getattr(instance, '_previous_category_state', None)
+    if created or (previous is not None and previous != (instance.category_id, instance.is_active)):
+        bump_categories()
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_deleted_product_cache(sender, instance, **kwargs):
+    bump_products(instance.pk)
+    bump_categories()
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_product_image_cache(sender, instance, **kwargs):
+    bump_products(instance.product_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    # ชื่อหมวดหมู่แสดงอยู่ในรายการสินค้าด้วย
+    bump_versions('categories', 'products')
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, update_fields=None, **kwargs):
+    suggest_product(instance)
+
+    index = get_search_index()
+    if not index.is_built:
+        return
+    # save ที่ไม่ได้แตะชื่อ/รายละเอียด (เช่น main_image_url) ไม่ต้อง index ใหม่
+    if update_fields and not {'name', 'description'} & set(update_fields):
+        return
+    index.add(instance.pk, instance.name, instance.description)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    index = get_search_index()
+    if index.is_built:
+        index.remove(instance.pk)
+    get_suggest_index().remove(('product', instance.pk))
+
+
+def suggest_product(product):
+    index = get_suggest_index()
+    if not index.is_built:
+        return
+    entry_id = ('product', product.pk)
+    if not product.is_active:
+        index.remove(entry_id)
+        return
+    # ยอดขายเก็บไว้จากตอน build (อัพเดทอีกครั้งเมื่อ index รีเฟรช)
+    sold = (index.get(entry_id) or {}).get('sold', 0)
+    index.add(
+        entry_id, product.name, product_weight(product.views_count, sold),
+        id=product.pk, slug=product.slug, sold=sold,
+    )
+
+
+@receiver(post_save, sender=Category)
+def suggest_category(sender, instance, **kwargs):
+    index = get_suggest_index()
+    if not index.is_built:
+        return
+    entry_id = ('category', instance.pk)
+    if not instance.is_active:
+        index.remove(entry_id)
+        return
+    weight = (index.get(entry_id) or {}).get('weight', 0)
+    index.add(entry_id, instance.name, weight, id=instance.pk, slug=instance.slug)
+
+
+@receiver(post_delete, sender=Category)
+def unsuggest_category(sender, instance, **kwargs):
+    get_suggest_index().remove(('category', instance.pk))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def suggest_shop(sender, instance, **kwargs):
+    index = get_suggest_index()
+    if not index.is_built:
+        return
+    entry_id = ('shop', instance.pk)
+    if not instance.is_seller or not instance.shop_name:
+        index.remove(entry_id)
+        return
+    weight = (index.get(entry_id) or {}).get('weight', 0)
+    index.add(entry_id, instance.shop_name, weight, id=instance.pk)
+
+
+def products_bulk_created(products):
+    """
+    bulk_create ไม่ส่ง post_save: อัพเดท index และ cache ให้สินค้าที่สร้างเป็นชุด
+    (เรียกหลัง transaction ของชุดนั้น commit แล้ว)
+    """
+    search_index = get_search_index()
+    for product in products:
+        if search_index.is_built:
+            search_index.add(product.pk, product.name, product.description)
+        suggest_product(product)
+    bump_versions('products', 'categories')
@@ -0,0 +1,123 @@
+"""
+===========================================
+Products App - Slug Allocation
+===========================================
+จอง slug ที่ไม่ซ้ำเป็นชุดด้วย query เดียวแทนการวน exists() ทีละตัว
+
+slug ที่ได้มีรูปแบบเดียวกับเดิม: "<base>" ถ้ายังว่าง ไม่งั้น "<base>-<n>" ต่อจากเลขที่มากที่สุดที่มีอยู่
+(base ตัดแค่ให้ไม่เกินความยาวของ field ส่วน "<base>-<n>" ที่ยาวเกินจะตัดท้าย base ให้พอดี)
+
+ค้น slug เดิมด้วย slug = base หรือ regex ^base-[0-9]+$ จึงไม่ดึง slug ของชื่ออื่นที่ขึ้นต้นเหมือนกัน
+(เช่น "phone-case-pro" ไม่ถูกดึงมาตอนจอง "phone-case") จำนวน query คงที่ไม่ว่าชื่อนั้นจะซ้ำกี่ครั้ง
+บน PostgreSQL regex ที่ขึ้นต้นด้วย ^ ใช้ index แบบ *_like ที่ Django สร้างให้ unique slug ได้
+
+ถ้ามีการสร้างพร้อมกันจนชน unique constraint จะจอง slug ใหม่และลองบันทึกอีกครั้ง (SLUG_RETRIES)
+"""
+import re
+import uuid
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+SUFFIX_WIDTH = 11  # "-" + ตัวเลขสูงสุด 10 หลัก
+SLUG_RETRIES = 5
+
+
+def make_base_slug(name, max_length):
+    base = slugify(name or '', allow_unicode=True)
+    if not base:
+        base = str(uuid.uuid4())[:8]
+    return base[:max_length]
+
+
+def suffixed_slug(base, number, max_length):
+    """"<base>-<n>" (ตัดท้าย base เฉพาะเมื่อรวม suffix แล้วยาวเกิน field)"""
+    suffix = f'-{number}'
+    return f'{base[:max_length - len(suffix)]}{suffix}'
+
+
+def suffix_pattern(base, max_length):
+    """regex ของ slug แบบมี suffix ของ base (base ยาวมากใช้ส่วนต้นที่ไม่ถูกตัดแน่นอน)"""
+    stem = base[:max_length - SUFFIX_WIDTH]
+    if stem == base:
+        return rf'^{re.escape(base)}-[0-9]+$'
+    return rf'^{re.escape(stem)}.*-[0-9]+$'
+
+
+def taken_slugs(model, bases, field='slug'):
+    """slug ที่มีอยู่แล้วซึ่งเป็น base หรือ base-<n> ของ base ใดๆ (query เดียว)"""
+    if not bases:
+        return set()
+    max_length = model._meta.get_field(field).max_length
+    condition = reduce(or_, [
+        Q(**{field: base}) | Q(**{f'{field}__regex': suffix_pattern(base, max_length)}) for base in bases
+    ])
+    return set(model._default_manager.filter(condition).values_list(field, flat=True))
+
+
+def next_suffixes(bases, taken, max_length):
+    """เลข suffix ถัดไปของแต่ละ base (มากกว่าเลขที่มากที่สุดที่ใช้ไปแล้ว)"""
+    counters = dict.fromkeys(bases, 1)
+    # ส่วนหน้า "-<n>" ที่เป็นไปได้ของแต่ละ base (ต่างกันเฉพาะ base ที่ยาวจนถูกตัด)
+    owners = {}
+    for base in counters:
+        for digits in range(1, SUFFIX_WIDTH):
+            owners.setdefault(base[:max_length - digits - 1], set()).add(base)
+
+    for slug in taken:
+        prefix, _, suffix = slug.rpartition('-')
+        if not (suffix.isascii() and suffix.isdigit()):
+            continue
+        number = int(suffix)
+        for base in owners.get(prefix, ()):
+            if suffixed_slug(base, number, max_length) == slug:
+                counters[base] = max(counters[base], number + 1)
+    return counters
+
+
+def allocate_slugs(model, names, field='slug'):
+    """
+    จอง slug สำหรับรายชื่อ names (เรียงตามลำดับเดิม) ใช้สำหรับ bulk_create
+    ชื่อซ้ำกันในชุดเดียวกันจะได้ suffix ต่อกันไป
+    """
+    max_length = model._meta.get_field(field).max_length
+    bases = [make_base_slug(name, max_length) for name in names]
+    distinct_bases = list(dict.fromkeys(bases))
+
+    taken = taken_slugs(model, distinct_bases, field)
+    counters = next_suffixes(distinct_bases, taken, max_length)
+
+    slugs = []
+    for base in bases:
+        slug = base
+        while slug in taken:
+            slug = suffixed_slug(base, counters[base], max_length)
+            counters[base] += 1
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def allocate_slug(model, name, field='slug'):
+    return allocate_slugs(model, [name], field)[0]
+
+
+def save_with_unique_slug(instance, save, name, field='slug'):
+    """
+    จอง slug ให้ instance แล้วเรียก save() (เช่น super().save ของ model)
+    ถ้าชน unique constraint เพราะมีคนจอง slug เดียวกันไปพร้อมกัน จะจองใหม่แล้วลองอีกครั้ง
+    """
+    model = type(instance)
+    for attempt in range(SLUG_RETRIES):
+        setattr(instance, field, allocate_slug(model, name, field))
+        try:
+            # savepoint: ให้ transaction ภายนอกใช้ต่อได้หลังชน constraint
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            slug_conflict = model._default_manager.filter(**{field: getattr(instance, field)}).exists()
+            if not slug_conflict or attempt == SLUG_RETRIES - 1:
+                raise
@@ -0,0 +1,280 @@
+"""
+===========================================
+Products App - Typeahead Suggestions
+===========================================
+คำแนะนำขณะพิมพ์ (autocomplete) จาก prefix index ในหน่วยความจำ ไม่แตะฐานข้อมูล
+
+- เก็บ key ที่ normalize แล้ว (ชื่อสินค้า / หมวดหมู่ / ร้านค้า) ใน sorted list แล้วค้นด้วย bisect
+- แต่ละรายการมี key หลายตัว (ข้อความเต็ม + ตำแหน่งเริ่มคำถัดๆ ไป) เพื่อให้พิมพ์คำกลางชื่อก็เจอ
+- เรียงผลด้วยความนิยม: views_count + ยอดขาย * SALES_WEIGHT
+- prefix สั้นที่ครอบคลุม key จำนวนมาก (เช่น 1-2 ตัวอักษร) เก็บผล top-k ไว้ ล้างเมื่อรายการใต้ prefix นั้นเปลี่ยน
+- สร้างตอน process เริ่มรับ request แรก (background) และอัพเดทจาก signal ของ Product / Category
+
+ใช้ผ่าน GET /api/products/suggest/?q=เสื้&limit=8
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q, Sum
+
+from .search import TOKEN_RE, THAI_RE, get_thai_tokenizer, normalize
+
+logger = logging.getLogger(__name__)
+
+MAX_KEYS_PER_ENTRY = 8
+TOP_CACHE_MIN_SCAN = 1000
+
+
+def get_suggest_settings():
+    config = {
+        'LIMIT': 8,
+        'MAX_LIMIT': 20,
+        'SALES_WEIGHT': 10,
+        'REFRESH_INTERVAL': 600,
+        'BACKGROUND_BUILD': True,
+    }
+    config.update(getattr(settings, 'PRODUCT_SUGGEST', {}))
+    return config
+
+
+def suggestion_keys(text):
+    """key สำหรับค้น prefix: ข้อความเต็ม และข้อความที่เริ่มจากต้นคำถัดๆ ไป"""
+    text = ' '.join(normalize(text).split())
+    if not text:
+        return []
+
+    starts = []
+    for match in TOKEN_RE.finditer(text):
+        starts.append(match.start())
+        if THAI_RE.match(match.group()):
+            # ภาษาไทย: ใช้ขอบคำจากการตัดคำ
+            position = match.start()
+            for word in get_thai_tokenizer().segment(match.group())[:-1]:
+                position += len(word)
+                starts.append(position)
+
+    keys = []
+    for start in [0] + starts:
+        key = text[start:]
+        if key and key not in keys:
+            keys.append(key)
+        if len(keys) >= MAX_KEYS_PER_ENTRY:
+            break
+    return keys
+
+
+class SuggestIndex:
+    """prefix index แบบ sorted array (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.keys = []          # sorted list ของ (key, entry_id)
+        self.entries = {}       # entry_id -> dict ข้อมูลที่ส่งกลับ + weight
+        self.entry_keys = {}    # entry_id -> keys ของรายการนั้น
+        self.top = {}           # prefix -> {(types, limit): ผลลัพธ์} ของ prefix ที่ต้อง scan key จำนวนมาก
+        self.is_built = False
+        self._building = False
+        self.built_at = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry_id, text, weight, **data):
+        with self._lock:
+            self._remove(entry_id)
+            keys = self._store(entry_id, text, weight, data)
+            self._invalidate(keys)
+            for key in keys:
+                insort(self.keys, (key, entry_id))
+
+    def _store(self, entry_id, text, weight, data):
+        """เก็บข้อมูลรายการ คืนค่า keys (ผู้เรียกต้องใส่ keys ลง self.keys เอง)"""
+        keys = suggestion_keys(text)
+        if keys:
+            self.entries[entry_id] = {'text': text, 'type': entry_id[0], 'weight': weight, **data}
+            self.entry_keys[entry_id] = keys
+        return keys
+
+    def remove(self, entry_id):
+        with self._lock:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id):
+        keys = self.entry_keys.pop(entry_id, None) or []
+        self.entries.pop(entry_id, None)
+        self._invalidate(keys)
+        for key in keys:
+            position = bisect_left(self.keys, (key, entry_id))
+            if position < len(self.keys) and self.keys[position] == (key, entry_id):
+                del self.keys[position]
+
+    def update_weight(self, entry_id, weight):
+        with self._lock:
+            if entry_id in self.entries:
+                self.entries[entry_id]['weight'] = weight
+                self._invalidate(self.entry_keys[entry_id])
+
+    def _invalidate(self, keys):
+        """ล้างผล top-k ของทุก prefix ที่ครอบ keys"""
+        if not self.top:
+            return
+        for key in keys:
+            for end in range(1, len(key) + 1):
+                self.top.pop(key[:end], None)
+
+    def get(self, entry_id):
+        return self.entries.get(entry_id)
+
+    def lookup(self, prefix, limit=8, types=None):
+        """
+        รายการที่มี key ขึ้นต้นด้วย prefix เรียงตาม weight มากไปน้อย
+        scan ทุก key ใต้ prefix (ผลจึงเป็น top-k จริง) แต่ prefix ที่ต้อง scan ตั้งแต่
+        TOP_CACHE_MIN_SCAN key ขึ้นไปเก็บผลไว้ใน self.top จนกว่ารายการใต้ prefix จะเปลี่ยน
+        """
+        prefix = ' '.join(normalize(prefix).split())
+        if not prefix:
+            return []
+        cache_key = (frozenset(types) if types is not None else None, limit)
+
+        with self._lock:
+            cached = self.top.get(prefix, {}).get(cache_key)
+            if cached is not None:
+                return list(cached)
+
+            position = bisect_left(self.keys, (prefix,))
+            seen = set()
+            scanned = 0
+            while position < len(self.keys):
+                key, entry_id = self.keys[position]
+                if not key.startswith(prefix):
+                    break
+                if types is None or entry_id[0] in types:
+                    seen.add(entry_id)
+                position += 1
+                scanned += 1
+            candidates = [self.entries[entry_id] for entry_id in seen]
+
+            top = heapq.nlargest(limit, candidates, key=lambda entry: (entry['weight'], -len(entry['text'])))
+            result = [{k: v for k, v in entry.items() if k != 'weight'} for entry in top]
+            if scanned >= TOP_CACHE_MIN_SCAN:
+                self.top.setdefault(prefix, {})[cache_key] = result
+        return list(result)
+
+    def build(self):
+        """สร้าง index ใหม่จากฐานข้อมูล (สร้างแยกแล้วสลับเข้ามา)"""
+        from django.contrib.auth import get_user_model
+
+        from .models import Category, Product
+
+        fresh = SuggestIndex()
+
+        products = (
+            Product.objects.filter(is_active=True)
+            .annotate(sold=Sum('order_items__quantity'))
+            .values_list('id', 'name', 'slug', 'views_count', 'sold')
+        )
+        for product_id, name, slug, views_count, sold in products.iterator(chunk_size=2000):
+            fresh._bulk_add(
+                ('product', product_id), name, product_weight(views_count, sold or 0),
+                id=product_id, slug=slug, sold=sold or 0,
+            )
+
+        categories = Category.objects.filter(is_active=True).annotate(
+            active_products=Count('products', filter=Q(products__is_active=True))
+        ).values_list('id', 'name', 'slug', 'active_products')
+        for category_id, name, slug, active_products in categories:
+            fresh._bulk_add(('category', category_id), name, active_products, id=category_id, slug=slug)
+
+        User = get_user_model()
+        shops = User.objects.filter(role=User.Role.SELLER).exclude(shop_name__isnull=True).exclude(
+            shop_name=''
+        ).annotate(
+            active_products=Count('products', filter=Q(products__is_active=True))
+        ).values_list('id', 'shop_name', 'active_products')
+        for seller_id, shop_name, active_products in shops:
+            fresh._bulk_add(('shop', seller_id), shop_name, active_products, id=seller_id)
+
+        fresh.keys.sort()
+
+        with self._lock:
+            self.keys = fresh.keys
+            self.top = {}
+            self.entries = fresh.entries
+            self.entry_keys = fresh.entry_keys
+            self.is_built = True
+            self.built_at = time.monotonic()
+
+    def _bulk_add(self, entry_id, text, weight, **data):
+        """เพิ่มรายการตอน build (ยังไม่เรียง keys เรียงครั้งเดียวตอนจบ)"""
+        for key in self._store(entry_id, text, weight, data):
+            self.keys.append((key, entry_id))
+
+    def ensure_fresh(self, refresh_interval, background=False):
+        """เตรียม index คืนค่า False ถ้ายังสร้างไม่เสร็จ"""
+        if self.is_built:
+            if time.monotonic() - self.built_at >= refresh_interval:
+                # รีเฟรช weight (ยอดขาย) เป็นระยะ ระหว่างนั้นใช้ index เดิมไปก่อน
+                self.built_at = time.monotonic()
+                if background:
+                    self.build_in_background()
+                else:
+                    self.build()
+            return True
+        if not background:
+            self.build()
+            return True
+        self.build_in_background()
+        return False
+
+    def build_in_background(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._background_build, name='product-suggest-index', daemon=True).start()
+
+    def _background_build(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Failed to build product suggest index')
+        finally:
+            self._building = False
+            connection.close()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_suggest_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SuggestIndex()
+    return _index
+
+
+def reset_suggest_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def product_weight(views_count, sold):
+    return views_count + sold * get_suggest_settings()['SALES_WEIGHT']
+
+
+def get_suggestions(query, limit=None, types=None):
+    config = get_suggest_settings()
+    index = get_suggest_index()
+    if not index.ensure_fresh(config['REFRESH_INTERVAL'], background=config['BACKGROUND_BUILD']):
+        return []
+    limit = min(limit or config['LIMIT'], config['MAX_LIMIT'])
+    return index.lookup(query, limit=limit, types=types)
@@ -0,0 +1,50 @@
+"""
+===========================================
+Products App - Celery Tasks
+===========================================
+"""
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from .importer import import_products
+from .view_counter import flush_view_counts
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_product_views():
+    """
+    Celery Task: เขียนยอดวิวสินค้าที่ค้างใน Redis buffer ลงฐานข้อมูล (รันเป็น periodic task)
+    memory backend เป็น buffer ของแต่ละ gunicorn worker ซึ่ง flush เอง task นี้จึงไม่ทำอะไร
+    """
+    if getattr(settings, 'PRODUCT_VIEW_BUFFER', {}).get('BACKEND', 'memory') != 'redis':
+        return 0
+    flushed = flush_view_counts()
+    if flushed:
+        logger.info(f"[Celery Task] Flushed {flushed} product views")
+    return flushed
+
+
+@shared_task
+def import_products_file(path, seller_id, file_format='csv'):
+    """
+    Celery Task: นำเข้าสินค้าจากไฟล์ที่อัพโหลดไว้ใน storage (ไฟล์ใหญ่จาก POST /api/products/import/)
+    ลบไฟล์ทิ้งเมื่อเสร็จ ผลลัพธ์ดูได้ที่ GET /api/products/import/<task_id>/
+    """
+    from django.contrib.auth import get_user_model
+    from django.core.files.storage import default_storage
+
+    seller = get_user_model().objects.get(pk=seller_id)
+    try:
+        with default_storage.open(path, 'rb') as fileobj:
+            result = import_products(fileobj, seller, file_format)
+    finally:
+        default_storage.delete(path)
+
+    logger.info(
+        f"[Celery Task] Imported {result['created']}/{result['total']} products for seller {seller_id}"
+    )
+    return {'seller_id': seller_id, **result}
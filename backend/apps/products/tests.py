@@ -3,13 +3,32 @@
 Products App - Tests
 ===========================================
 """
+import io
+import json
+
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.text import slugify
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from .models import Category, Product
+from apps.reviews.models import Review
+
+from . import slugs, view_counter
+from .cache import get_cache_stats
+from .importer import get_task_owner, import_products, remember_task_owner
+from .models import Category, Product, ProductImage
+from .search import tokenize
+from .suggest import SuggestIndex
+from .tasks import flush_product_views
+from .view_counter import flush_view_counts, get_view_buffer
 
 User = get_user_model()
 
@@ -124,4 +143,737 @@ class TestProductCreate:
         
         response = api_client.post(url, data)
         
-        assert response.status_code == status.HTTP_403_FORBIDDEN
\ No newline at end of file
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestProductMainImage:
+    """ทดสอบ main_image_url ที่เก็บไว้บน Product"""
+    
+    def test_create_with_image_urls_sets_main_image(self, api_client, seller_user, category):
+        """ทดสอบสร้างสินค้าพร้อมรูปแล้ว main_image_url ถูกตั้งค่า"""
+        api_client.force_authenticate(user=seller_user)
+        data = {
+            'name': 'Camera',
+            'price': 500,
+            'stock': 1,
+            'category_id': category.id,
+            'image_urls': ['https://example.com/a.jpg', 'https://example.com/b.jpg']
+        }
+        
+        response = api_client.post(reverse('product-list'), data, format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        product = Product.objects.get(name='Camera')
+        assert product.main_image_url == 'https://example.com/a.jpg'
+    
+    def test_image_save_and_delete_maintain_main_image(self, product):
+        """ทดสอบ ProductImage.save/delete อัพเดท main_image_url"""
+        first = ProductImage.objects.create(product=product, image_url='https://example.com/1.jpg', order=0)
+        second = ProductImage.objects.create(
+            product=product, image_url='https://example.com/2.jpg', is_main=True, order=1
+        )
+        product.refresh_from_db()
+        assert product.main_image_url == second.image_url
+        
+        second.delete()
+        product.refresh_from_db()
+        assert product.main_image_url == first.image_url
+    
+    def test_list_query_count_is_constant(self, api_client, seller_user, category, django_assert_max_num_queries):
+        """ทดสอบจำนวน query ของ list ไม่ขึ้นกับจำนวนสินค้า"""
+        for i in range(10):
+            product = Product.objects.create(
+                seller=seller_user, category=category, name=f'P{i}', price=10, stock=1
+            )
+            ProductImage.objects.create(product=product, image_url=f'https://example.com/{i}.jpg')
+        
+        with django_assert_max_num_queries(3):
+            response = api_client.get(reverse('product-list'))
+        
+        assert all(item['main_image'] for item in response.data['results'])
+
+
+@pytest.mark.django_db
+class TestProductCursorPagination:
+    """ทดสอบ cursor pagination ของรายการสินค้า"""
+    
+    @pytest.fixture
+    def products(self, seller_user, category):
+        return [
+            Product.objects.create(
+                seller=seller_user, category=category, name=f'P{i}', price=i % 3, stock=1
+            )
+            for i in range(7)
+        ]
+    
+    def collect_pages(self, api_client, params):
+        url = reverse('product-list')
+        ids = []
+        response = api_client.get(url, params)
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            ids += [item['id'] for item in response.data['results']]
+            if not response.data['next']:
+                return ids
+            response = api_client.get(response.data['next'])
+    
+    @pytest.mark.parametrize('ordering', ['price', '-price', 'created_at', '-views_count'])
+    def test_walk_all_pages(self, api_client, products, ordering):
+        """ทดสอบเดินครบทุกหน้าแล้วได้สินค้าครบไม่ซ้ำ (ราคาซ้ำกันต้องใช้ id เป็น tiebreaker)"""
+        ids = self.collect_pages(api_client, {'pagination': 'cursor', 'page_size': 2, 'ordering': ordering})
+        
+        assert sorted(ids) == sorted(p.id for p in products)
+        if ordering == 'price':
+            prices = [Product.objects.get(id=i).price for i in ids]
+            assert prices == sorted(prices)
+    
+    def test_no_count_query(self, api_client, products, django_assert_max_num_queries):
+        """ทดสอบว่า cursor pagination ไม่มี COUNT query"""
+        with django_assert_max_num_queries(1) as captured:
+            response = api_client.get(reverse('product-list'), {'pagination': 'cursor'})
+        
+        assert 'count' not in response.data
+        assert not any('COUNT' in q['sql'] for q in captured.captured_queries)
+    
+    def test_invalid_cursor(self, api_client, products):
+        """ทดสอบ cursor ที่ไม่ถูกต้อง"""
+        response = api_client.get(reverse('product-list'), {'cursor': 'not-a-cursor'})
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestProductViewCounter:
+    """ทดสอบการนับยอดวิวแบบ buffer"""
+    
+    @pytest.fixture
+    def view_buffer(self, settings):
+        settings.PRODUCT_VIEW_BUFFER = {'BACKEND': 'memory', 'FLUSH_INTERVAL': 3600, 'DEDUP_WINDOW': 0}
+        get_view_buffer.cache_clear()
+        buffer = get_view_buffer()
+        yield buffer
+        buffer.drain()
+        get_view_buffer.cache_clear()
+    
+    def test_retrieve_does_not_write(self, api_client, product, view_buffer, django_assert_max_num_queries):
+        """ทดสอบว่า GET detail ไม่ UPDATE ตาราง product"""
+        url = reverse('product-detail', args=[product.id])
+        
+        with django_assert_max_num_queries(10) as captured:
+            for _ in range(3):
+                api_client.get(url)
+        
+        assert not any(q['sql'].startswith('UPDATE') for q in captured.captured_queries)
+        assert view_buffer.pending(product.id) == 3
+        
+        assert flush_view_counts() == 3
+        product.refresh_from_db()
+        assert product.views_count == 3
+        assert view_buffer.pending(product.id) == 0
+    
+    def test_dedup_window(self, api_client, buyer_user, product, view_buffer):
+        """ทดสอบว่า client เดิมดูซ้ำใน dedup window ไม่นับเพิ่ม"""
+        view_buffer.dedup_window = 60
+        url = reverse('product-detail', args=[product.id])
+        
+        api_client.get(url)
+        api_client.get(url)
+        api_client.force_authenticate(user=buyer_user)
+        api_client.get(url)
+        
+        assert view_buffer.pending(product.id) == 2
+    
+    def test_flush_failure_keeps_buffer(self, api_client, product, view_buffer, monkeypatch):
+        """ทดสอบฐานข้อมูลมีปัญหาระหว่าง flush: ไม่ raise และยอดกลับเข้า buffer"""
+        api_client.get(reverse('product-detail', args=[product.id]))
+        
+        def broken_atomic(*args, **kwargs):
+            raise DatabaseError('database is down')
+        
+        monkeypatch.setattr(view_counter.transaction, 'atomic', broken_atomic)
+        
+        assert flush_view_counts() == 0
+        assert view_buffer.pending(product.id) == 1
+    
+    def test_celery_task_skips_memory_backend(self, api_client, product, view_buffer):
+        """ทดสอบ task flush ไม่แตะ buffer ในหน่วยความจำ (เป็นของ gunicorn worker)"""
+        api_client.get(reverse('product-detail', args=[product.id]))
+        
+        assert flush_product_views() == 0
+        assert view_buffer.pending(product.id) == 1
+
+
+@pytest.mark.django_db
+class TestProductSearch:
+    """ทดสอบการค้นหาสินค้า (ภาษาไทย + BM25)"""
+    
+    @pytest.fixture
+    def catalog(self, seller_user, category):
+        names = [
+            'เสื้อยืดคอกลมสีดำ',
+            'เสื้อเชิ้ตแขนยาว',
+            'กางเกงยีนส์ขาสั้น',
+            'Apple iPhone 15 เคสใส',
+        ]
+        return {
+            name: Product.objects.create(seller=seller_user, category=category, name=name, price=100, stock=1)
+            for name in names
+        }
+    
+    def search(self, api_client, query, **params):
+        response = api_client.get(reverse('product-list'), {'search': query, **params})
+        assert response.status_code == status.HTTP_200_OK
+        return [item['name'] for item in response.data['results']]
+    
+    def test_thai_segmentation(self):
+        """ทดสอบตัดคำไทยด้วยพจนานุกรม"""
+        tokens = tokenize('เสื้อยืดคอกลม', for_query=True)
+        
+        assert tokens == ['เสื้อ', 'ยืด', 'คอกลม']
+    
+    def test_ranked_thai_search(self, api_client, catalog):
+        """ทดสอบค้นหาคำไทยที่ไม่มีช่องว่าง เรียงตามความเกี่ยวข้อง"""
+        names = self.search(api_client, 'เสื้อยืด')
+        
+        assert names[0] == 'เสื้อยืดคอกลมสีดำ'
+        assert 'เสื้อเชิ้ตแขนยาว' in names
+        assert 'กางเกงยีนส์ขาสั้น' not in names
+    
+    def test_latin_search_is_case_insensitive(self, api_client, catalog):
+        """ทดสอบค้นหาภาษาอังกฤษ"""
+        assert self.search(api_client, 'IPHONE') == ['Apple iPhone 15 เคสใส']
+    
+    def test_index_follows_product_changes(self, api_client, catalog):
+        """ทดสอบ index อัพเดทเมื่อแก้ไข/ลบสินค้า"""
+        assert self.search(api_client, 'ยีนส์') == ['กางเกงยีนส์ขาสั้น']
+        
+        product = catalog['กางเกงยีนส์ขาสั้น']
+        product.name = 'กางเกงผ้าฝ้าย'
+        product.save()
+        catalog['เสื้อยืดคอกลมสีดำ'].delete()
+        
+        assert self.search(api_client, 'ยีนส์') == []
+        assert self.search(api_client, 'ผ้าฝ้าย') == ['กางเกงผ้าฝ้าย']
+        assert 'เสื้อยืดคอกลมสีดำ' not in self.search(api_client, 'เสื้อยืด')
+    
+    def test_explicit_ordering_overrides_rank(self, api_client, catalog):
+        """ทดสอบส่ง ordering มาแล้วใช้ ordering นั้นแทนคะแนน"""
+        names = self.search(api_client, 'เสื้อ', ordering='created_at')
+        
+        assert names == ['เสื้อยืดคอกลมสีดำ', 'เสื้อเชิ้ตแขนยาว']
+    
+    def test_ranked_results_paginated_by_id(self, api_client, seller_user, category, django_assert_max_num_queries):
+        """ทดสอบแบ่งหน้าผลค้นหาตามคะแนน โหลดเฉพาะสินค้าของหน้านั้น ไม่ ORDER BY CASE"""
+        Product.objects.create(
+            seller=seller_user, category=category, name='ถุงเท้า ถุงเท้า ถุงเท้า', price=100, stock=1
+        )
+        for index in range(12):
+            Product.objects.create(
+                seller=seller_user, category=category, name=f'ถุงเท้าข้อสั้นลายทางสีพื้น {index}', price=100, stock=1
+            )
+        second_page = self.search(api_client, 'ถุงเท้า', page=2)
+        
+        with django_assert_max_num_queries(10) as captured:
+            first_page = self.search(api_client, 'ถุงเท้า')
+        
+        assert captured.captured_queries
+        assert first_page[0] == 'ถุงเท้า ถุงเท้า ถุงเท้า'
+        assert len(first_page) == 12 and len(second_page) == 1
+        assert not set(first_page) & set(second_page)
+        assert not any('CASE' in query['sql'] for query in captured.captured_queries)
+
+
+@pytest.mark.django_db
+class TestProductSuggest:
+    """ทดสอบคำแนะนำขณะพิมพ์ (prefix index ในหน่วยความจำ)"""
+    
+    @pytest.fixture
+    def catalog(self, seller_user, category):
+        popular = Product.objects.create(
+            seller=seller_user, category=category, name='เสื้อยืดคอกลม', price=100, stock=1, views_count=500
+        )
+        quiet = Product.objects.create(
+            seller=seller_user, category=category, name='เสื้อเชิ้ตแขนยาว', price=100, stock=1, views_count=5
+        )
+        phone = Product.objects.create(
+            seller=seller_user, category=category, name='Apple iPhone 15', price=100, stock=1
+        )
+        return {'popular': popular, 'quiet': quiet, 'phone': phone}
+    
+    def suggest(self, api_client, query, **params):
+        response = api_client.get(reverse('product-suggest'), {'q': query, **params})
+        assert response.status_code == status.HTTP_200_OK
+        return [item['text'] for item in response.data]
+    
+    def test_prefix_ranked_by_popularity(self, api_client, catalog):
+        """ทดสอบ prefix ภาษาไทยเรียงตามความนิยม"""
+        assert self.suggest(api_client, 'เสื้') == ['เสื้อยืดคอกลม', 'เสื้อเชิ้ตแขนยาว']
+    
+    def test_matches_word_inside_name(self, api_client, catalog):
+        """ทดสอบพิมพ์คำกลางชื่อ (ไทย/อังกฤษ) ก็เจอ"""
+        assert self.suggest(api_client, 'คอก') == ['เสื้อยืดคอกลม']
+        assert self.suggest(api_client, 'IPHO') == ['Apple iPhone 15']
+    
+    def test_includes_categories_and_shops(self, api_client, catalog):
+        """ทดสอบแนะนำชื่อหมวดหมู่และร้านค้า"""
+        response = api_client.get(reverse('product-suggest'), {'q': 'te'})
+        
+        assert {(item['type'], item['text']) for item in response.data} == {('shop', 'Test Shop')}
+        assert self.suggest(api_client, 'elec', type='category') == ['Electronics']
+    
+    def test_served_without_database(self, api_client, catalog, django_assert_num_queries):
+        """ทดสอบเมื่อ index พร้อมแล้วไม่ query ฐานข้อมูลเลย"""
+        self.suggest(api_client, 'เสื้')
+        
+        with django_assert_num_queries(0):
+            self.suggest(api_client, 'apple')
+    
+    def test_index_follows_product_changes(self, api_client, catalog):
+        """ทดสอบ index อัพเดทเมื่อแก้ไข/ปิดการขาย/ลบสินค้า"""
+        self.suggest(api_client, 'เสื้')
+        
+        catalog['quiet'].views_count = 1000
+        catalog['quiet'].save()
+        catalog['phone'].is_active = False
+        catalog['phone'].save()
+        catalog['popular'].delete()
+        
+        assert self.suggest(api_client, 'เสื้') == ['เสื้อเชิ้ตแขนยาว']
+        assert self.suggest(api_client, 'apple') == []
+    
+    def test_short_prefix_ranks_all_matches(self):
+        """ทดสอบ prefix ที่ครอบคลุม key จำนวนมากยังได้ top-k ตามความนิยมจริง และผลที่เก็บไว้ถูกล้างเมื่อมีรายการใหม่"""
+        index = SuggestIndex()
+        for i in range(6000):
+            index._bulk_add(('product', i), f'a{i:05d}', i, id=i)
+        index.keys.sort()
+        
+        assert [item['id'] for item in index.lookup('a', limit=2)] == [5999, 5998]
+        assert 'a' in index.top
+        
+        index.add(('product', 9000), 'a09000', 10 ** 6, id=9000)
+        assert [item['id'] for item in index.lookup('a', limit=2)] == [9000, 5999]
+
+
+@pytest.mark.django_db
+class TestCatalogCache:
+    """ทดสอบ cache response ของแคตตาล็อก (version counter + single-flight)"""
+    
+    def get(self, api_client, url, params=None):
+        response = api_client.get(url, params or {})
+        assert response.status_code == status.HTTP_200_OK
+        return response
+    
+    def test_list_hit_skips_database(self, api_client, product, django_assert_num_queries):
+        """ทดสอบ request ซ้ำ (params เดิมแต่สลับลำดับ) ได้จาก cache โดยไม่ query"""
+        url = reverse('product-list')
+        assert self.get(api_client, url, {'ordering': 'price', 'page': 1})['X-Cache'] == 'MISS'
+        
+        with django_assert_num_queries(0):
+            response = self.get(api_client, f'{url}?page=1&ordering=price')
+        
+        assert response['X-Cache'] == 'HIT'
+        assert response.data['results'][0]['name'] == 'Test Product'
+    
+    def test_product_change_invalidates_list(self, api_client, product):
+        """ทดสอบแก้ไขสินค้าแล้ว cache รายการสินค้าหมดอายุ"""
+        url = reverse('product-list')
+        self.get(api_client, url)
+        
+        product.name = 'Renamed Product'
+        product.save()
+        response = self.get(api_client, url)
+        
+        assert response['X-Cache'] == 'MISS'
+        assert response.data['results'][0]['name'] == 'Renamed Product'
+    
+    def test_detail_cached_and_still_counts_views(self, api_client, product, django_assert_num_queries):
+        """ทดสอบหน้ารายละเอียดได้จาก cache แต่ยังนับยอดวิวทุกครั้ง"""
+        url = reverse('product-detail', kwargs={'pk': product.pk})
+        self.get(api_client, url)
+        
+        with django_assert_num_queries(0):
+            response = self.get(api_client, url)
+        
+        assert response['X-Cache'] == 'HIT'
+        assert get_view_buffer().pending(product.pk) == 2
+    
+    def test_detail_with_cache_disabled(self, api_client, product, settings):
+        """ทดสอบปิด cache แล้วหน้ารายละเอียดยังทำงานและนับยอดวิวครั้งเดียวต่อ request"""
+        settings.CATALOG_CACHE = {**settings.CATALOG_CACHE, 'ENABLED': False}
+        url = reverse('product-detail', kwargs={'pk': product.pk})
+        
+        response = self.get(api_client, url)
+        self.get(api_client, url)
+        
+        assert response['X-Cache'] == 'BYPASS'
+        assert get_view_buffer().pending(product.pk) == 2
+    
+    def test_review_invalidates_only_its_product(self, api_client, product, buyer_user, seller_user, category):
+        """ทดสอบรีวิวใหม่ทำให้ cache ของสินค้านั้นหมดอายุ แต่สินค้าอื่นยังใช้ cache เดิม"""
+        other = Product.objects.create(seller=seller_user, category=category, name='Other', price=10, stock=1)
+        urls = [reverse('product-detail', kwargs={'pk': p.pk}) for p in (product, other)]
+        for url in urls * 2:
+            self.get(api_client, url)
+        
+        Review.objects.create(product=product, user=buyer_user, rating=4, comment='ดี')
+        
+        reviewed = self.get(api_client, urls[0])
+        assert reviewed['X-Cache'] == 'MISS'
+        assert reviewed.data['review_count'] == 1
+        assert self.get(api_client, urls[1])['X-Cache'] == 'HIT'
+    
+    def test_category_list_invalidation(self, api_client, category):
+        """ทดสอบแก้ไขหมวดหมู่แล้ว cache หมวดหมู่หมดอายุ"""
+        url = reverse('category-list')
+        self.get(api_client, url)
+        assert self.get(api_client, url)['X-Cache'] == 'HIT'
+        
+        category.name = 'Gadgets'
+        category.save()
+        response = self.get(api_client, url)
+        
+        assert response['X-Cache'] == 'MISS'
+        assert response.data['results'][0]['name'] == 'Gadgets'
+    
+    def test_cache_stats_for_admin(self, api_client, product):
+        """ทดสอบสถิติ hit / miss ดูได้เฉพาะ admin"""
+        url = reverse('product-list')
+        self.get(api_client, url)
+        self.get(api_client, url)
+        
+        assert api_client.get(reverse('product-cache-stats')).status_code in (
+            status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN
+        )
+        admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='adminpass123')
+        api_client.force_authenticate(user=admin)
+        stats = self.get(api_client, reverse('product-cache-stats')).data
+        
+        assert stats['products'] == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+        assert get_cache_stats()['products']['hits'] == 1
+
+
+@pytest.mark.django_db
+class TestCategoryCounts:
+    """ทดสอบนับสินค้าในหมวดหมู่ด้วย query เดียว และ cache ข้อมูลหมวดหมู่"""
+    
+    def count_queries(self, api_client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        return len(context.captured_queries), response
+    
+    def test_category_list_constant_queries(self, api_client, seller_user, category):
+        """ทดสอบจำนวน query ไม่เพิ่มตามจำนวนหมวดหมู่"""
+        Product.objects.create(seller=seller_user, category=category, name='A', price=1, stock=1)
+        Product.objects.create(seller=seller_user, category=category, name='B', price=1, stock=1, is_active=False)
+        url = reverse('category-list')
+        baseline, response = self.count_queries(api_client, url)
+        assert response.data['results'][0]['product_count'] == 1
+        
+        for index in range(5):
+            Category.objects.create(name=f'Category {index}')
+        
+        assert self.count_queries(api_client, url)[0] == baseline
+    
+    def test_counted_categories_keep_name_order(self):
+        """ทดสอบ queryset ที่นับสินค้ายังเรียงตามชื่อ (แบ่งหน้าได้ลำดับคงที่)"""
+        for name in ('Toys', 'Books', 'Garden'):
+            Category.objects.create(name=name)
+        
+        queryset = Category.objects.with_product_count()
+        
+        assert queryset.ordered
+        assert [category.name for category in queryset] == ['Books', 'Garden', 'Toys']
+    
+    def test_product_detail_constant_queries(self, api_client, product, category):
+        """ทดสอบหน้ารายละเอียดสินค้าไม่ COUNT สินค้าในหมวดหมู่ทุกครั้ง"""
+        url = reverse('product-detail', kwargs={'pk': product.pk})
+        api_client.get(url)
+        
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(f'{url}?fresh=1')
+        
+        assert response.data['category']['product_count'] == 1
+        assert not any('COUNT(' in query['sql'].upper() for query in context.captured_queries)
+    
+    def test_payload_follows_category_changes(self, api_client, product, seller_user, category):
+        """ทดสอบย้ายหมวดหมู่/ปิดการขายแล้วจำนวนสินค้าอัพเดท แต่แก้ราคาไม่ทำให้ cache หมวดหมู่หมดอายุ"""
+        url = reverse('category-list')
+        other = Category.objects.create(name='Books')
+        api_client.get(url)
+        
+        product.price = 1
+        product.save()
+        assert api_client.get(url)['X-Cache'] == 'HIT'
+        
+        product.category = other
+        product.save()
+        counts = {item['name']: item['product_count'] for item in api_client.get(url).data['results']}
+        assert counts == {'Books': 1, 'Electronics': 0}
+        
+        product.is_active = False
+        product.save()
+        counts = {item['name']: item['product_count'] for item in api_client.get(url).data['results']}
+        assert counts == {'Books': 0, 'Electronics': 0}
+
+
+@pytest.mark.django_db
+class TestProductFacets:
+    """ทดสอบ facet ของผลลัพธ์รายการสินค้า"""
+    
+    @pytest.fixture
+    def catalog(self, seller_user, buyer_user, category):
+        books = Category.objects.create(name='Books')
+        other_seller = User.objects.create_user(
+            email='shop2@example.com', username='shop2', password='pass12345', role='seller', shop_name='Shop Two'
+        )
+        Product.objects.create(seller=seller_user, category=category, name='Phone', price=9000, stock=3)
+        Product.objects.create(seller=seller_user, category=category, name='Cable', price=50, stock=0)
+        Product.objects.create(seller=other_seller, category=books, name='Novel', price=250, stock=5)
+        Product.objects.create(seller=other_seller, category=books, name='Hidden', price=250, stock=5, is_active=False)
+        return {'books': books}
+    
+    def count(self, api_client, url, params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(url, params)
+        assert response.status_code == status.HTTP_200_OK
+        return len(context.captured_queries), response
+    
+    def test_facets_grouped_per_dimension(self, api_client, catalog, category):
+        """ทดสอบ facet ทุกแบบ: GROUP BY หมวดหมู่ / ร้านค้าแยกกัน ราคาและสต็อกรวมใน query เดียว"""
+        url = reverse('product-list')
+        plain, _ = self.count(api_client, url, {'page': 1})
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(url, {'page': 1, 'facets': 'all'})
+        
+        facet_queries = context.captured_queries[plain:]
+        assert len(facet_queries) == 3
+        assert ['GROUP BY' in query['sql'] for query in facet_queries] == [True, False, True]
+        facets = response.data['facets']
+        assert [(entry['name'], entry['count']) for entry in facets['category']] == [
+            ('Electronics', 2), ('Books', 1)
+        ]
+        assert {(entry['min'], entry['count']) for entry in facets['price'] if entry['count']} == {
+            (0, 1), (100, 1), (5000, 1)
+        }
+        assert facets['in_stock'] == {'true': 2, 'false': 1}
+        assert [(entry['shop_name'], entry['count']) for entry in facets['seller']] == [
+            ('Test Shop', 2), ('Shop Two', 1)
+        ]
+    
+    def test_facets_follow_current_filters(self, api_client, catalog, category):
+        """ทดสอบ facet นับเฉพาะผลลัพธ์ที่ผ่านตัวกรอง"""
+        response = api_client.get(reverse('product-list'), {'category': category.pk, 'facets': 'in_stock,price'})
+        
+        assert set(response.data['facets']) == {'in_stock', 'price'}
+        assert response.data['facets']['in_stock'] == {'true': 1, 'false': 1}
+        assert response.data['count'] == 2
+    
+    def test_unknown_facet(self, api_client, catalog):
+        """ทดสอบขอ facet ที่ไม่รู้จัก"""
+        response = api_client.get(reverse('product-list'), {'facets': 'colour'})
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestProductImport:
+    """ทดสอบนำเข้าสินค้าจำนวนมากจาก CSV / JSONL"""
+    
+    CSV = (
+        'name,description,price,stock,category,image_urls\n'
+        'เสื้อยืด,ผ้าฝ้าย,199,10,electronics,https://cdn.example.com/a.jpg|https://cdn.example.com/b.jpg\n'
+        'เสื้อยืด,,249,5,electronics,\n'
+        'ไม่มีราคา,,,5,electronics,\n'
+        'หมวดผิด,,10,1,no-such-category,\n'
+    )
+    
+    def upload(self, api_client, content, name):
+        return api_client.post(
+            reverse('product-bulk-import'),
+            {'file': SimpleUploadedFile(name, content.encode('utf-8'))},
+            format='multipart',
+        )
+    
+    def test_import_csv_reports_row_errors(self, api_client, seller_user, category):
+        """ทดสอบนำเข้า CSV: สร้างสินค้า/รูปภาพ จอง slug ไม่ซ้ำ และรายงานแถวที่ผิด"""
+        api_client.force_authenticate(user=seller_user)
+        
+        response = self.upload(api_client, self.CSV, 'products.csv')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total'] == 4
+        assert response.data['created'] == 2
+        assert [error['row'] for error in response.data['errors']] == [4, 5]
+        assert 'price' in response.data['errors'][0]['errors']
+        assert 'category' in response.data['errors'][1]['errors']
+        
+        first, second = Product.objects.filter(name='เสื้อยืด').order_by('pk')
+        base = slugify('เสื้อยืด', allow_unicode=True)
+        assert [first.slug, second.slug] == [base, f'{base}-1']
+        assert first.main_image_url == 'https://cdn.example.com/a.jpg'
+        assert first.images.count() == 2
+        assert first.seller == seller_user
+    
+    def test_import_queries_do_not_grow_per_row(self, seller_user, category):
+        """ทดสอบจำนวน query ต่อชุดคงที่ ไม่ขึ้นกับจำนวนแถว"""
+        def run(count):
+            rows = ''.join(
+                f'Item {index},,10,1,{category.pk},https://cdn.example.com/{index}.jpg\n' for index in range(count)
+            )
+            content = io.BytesIO(f'name,description,price,stock,category,image_urls\n{rows}'.encode('utf-8'))
+            with CaptureQueriesContext(connection) as context:
+                import_products(content, seller_user, 'csv')
+            return len(context.captured_queries)
+        
+        assert run(3) == run(30)
+    
+    def test_import_jsonl_command(self, seller_user, category, tmp_path):
+        """ทดสอบ management command กับไฟล์ JSONL และแถวที่อ่านไม่ได้"""
+        path = tmp_path / 'products.jsonl'
+        rows = [
+            json.dumps({'name': 'Lamp', 'price': '350.00', 'stock': 2, 'category': category.slug,
+                        'image_urls': ['https://cdn.example.com/lamp.jpg']}),
+            '{broken',
+        ]
+        path.write_text('\n'.join(rows), encoding='utf-8')
+        out = io.StringIO()
+        
+        call_command('import_products', str(path), seller=seller_user.email, stdout=out)
+        
+        assert Product.objects.get(name='Lamp').category == category
+        assert 'แถว 2' in out.getvalue()
+        assert '1/2' in out.getvalue()
+    
+    def test_large_file_is_queued(self, api_client, seller_user, category, settings, monkeypatch):
+        """ทดสอบไฟล์ใหญ่ส่งให้ Celery แทนการนำเข้าทันที"""
+        from . import views
+        
+        queued = {}
+        
+        class FakeResult:
+            id = 'task-123'
+        
+        def fake_delay(path, seller_id, file_format):
+            queued.update(path=path, seller_id=seller_id, file_format=file_format)
+            return FakeResult()
+        
+        monkeypatch.setattr(views.import_products_file, 'delay', fake_delay)
+        settings.PRODUCT_IMPORT = {**settings.PRODUCT_IMPORT, 'ASYNC_THRESHOLD': 10}
+        api_client.force_authenticate(user=seller_user)
+        
+        response = self.upload(api_client, self.CSV, 'products.csv')
+        
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['task_id'] == 'task-123'
+        assert queued['seller_id'] == seller_user.pk and queued['file_format'] == 'csv'
+        assert get_task_owner('task-123') == seller_user.pk
+        assert not Product.objects.exists()
+        default_storage.delete(queued['path'])
+    
+    def test_import_status_only_for_owner(self, api_client, seller_user, monkeypatch):
+        """ทดสอบสถานะงานนำเข้าดูได้เฉพาะผู้ส่งงาน ไม่ว่างานจะอยู่สถานะไหน"""
+        from . import views
+        
+        class FakeAsyncResult:
+            status = 'FAILURE'
+            result = ValueError('แถว 3: ราคาไม่ถูกต้อง')
+            
+            def __init__(self, task_id):
+                self.task_id = task_id
+            
+            def successful(self):
+                return False
+            
+            def failed(self):
+                return True
+        
+        monkeypatch.setattr(views, 'AsyncResult', FakeAsyncResult)
+        other_seller = User.objects.create_user(
+            email='shop2@example.com', username='shop2', password='pass12345', role='seller', shop_name='Shop Two'
+        )
+        remember_task_owner('task-123', seller_user.pk)
+        url = reverse('product-bulk-import-status', kwargs={'task_id': 'task-123'})
+        
+        api_client.force_authenticate(user=other_seller)
+        assert api_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+        assert api_client.get(reverse('product-bulk-import-status', kwargs={'task_id': 'unknown'})).status_code == (
+            status.HTTP_404_NOT_FOUND
+        )
+        
+        api_client.force_authenticate(user=seller_user)
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['error'] == 'แถว 3: ราคาไม่ถูกต้อง'
+    
+    def test_buyer_cannot_import(self, api_client, buyer_user):
+        """ทดสอบ buyer นำเข้าสินค้าไม่ได้"""
+        api_client.force_authenticate(user=buyer_user)
+        
+        assert self.upload(api_client, self.CSV, 'products.csv').status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestSlugAllocation:
+    """ทดสอบการจอง slug ด้วย prefix scan"""
+    
+    def create(self, seller_user, category, name='เสื้อยืด'):
+        return Product.objects.create(seller=seller_user, category=category, name=name, price=1, stock=1)
+    
+    def test_duplicate_names_get_next_suffix(self, seller_user, category):
+        """ทดสอบชื่อซ้ำได้ suffix ต่อจากเลขที่มากที่สุด และไม่สับสนกับ slug ที่ขึ้นต้นเหมือนกัน"""
+        base = slugify('Phone Case', allow_unicode=True)
+        self.create(seller_user, category, 'Phone Case Pro')
+        products = [self.create(seller_user, category, 'Phone Case') for _ in range(3)]
+        
+        assert [product.slug for product in products] == [base, f'{base}-1', f'{base}-2']
+        assert slugs.allocate_slugs(Product, ['Phone Case', 'Phone Case']) == [f'{base}-3', f'{base}-4']
+    
+    def test_long_names_keep_full_slug(self, seller_user, category):
+        """ทดสอบชื่อยาวได้ slug เต็มความยาว field และ suffix ตัดท้าย base ให้พอดี"""
+        name = 'x' * 300
+        products = [self.create(seller_user, category, name) for _ in range(3)]
+        
+        assert [product.slug for product in products] == ['x' * 255, 'x' * 253 + '-1', 'x' * 253 + '-2']
+    
+    def test_query_count_flat_with_many_duplicates(self, seller_user, category):
+        """ทดสอบจำนวน query ตอนสร้างสินค้าไม่เพิ่มตามจำนวนชื่อซ้ำ"""
+        def queries_for_next_create():
+            with CaptureQueriesContext(connection) as context:
+                self.create(seller_user, category)
+            return len(context.captured_queries)
+        
+        first = queries_for_next_create()
+        for _ in range(20):
+            self.create(seller_user, category)
+        
+        assert queries_for_next_create() == first
+    
+    def test_retry_on_concurrent_slug(self, seller_user, category, monkeypatch):
+        """ทดสอบชน unique constraint (มีคนจอง slug เดียวกันไปก่อน) แล้วจองใหม่"""
+        existing = self.create(seller_user, category)
+        real_allocate = slugs.allocate_slugs
+        calls = []
+        
+        def racy_allocate(model, names, field='slug'):
+            calls.append(names)
+            if len(calls) == 1:
+                return [existing.slug]
+            return real_allocate(model, names, field)
+        
+        monkeypatch.setattr(slugs, 'allocate_slugs', racy_allocate)
+        product = self.create(seller_user, category)
+        
+        assert len(calls) == 2
+        assert product.slug == f'{existing.slug}-1'
+    
+    def test_category_slug(self):
+        """ทดสอบ Category ใช้ตัวจอง slug เดียวกัน"""
+        first = Category.objects.create(name='Home')
+        second = Category.objects.create(name='Home')
+        
+        assert (first.slug, second.slug) == ('home', 'home-1')
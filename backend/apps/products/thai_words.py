@@ -0,0 +1,50 @@
+"""
+===========================================
+Products App - Thai Word List
+===========================================
+คำศัพท์ภาษาไทยพื้นฐานสำหรับตัดคำชื่อ/รายละเอียดสินค้า (ใช้โดย apps.products.search)
+เพิ่มคำเฉพาะร้านได้ผ่าน settings.PRODUCT_SEARCH['DICTIONARY_PATH'] (ไฟล์ละหนึ่งคำต่อบรรทัด)
+"""
+
+THAI_WORDS = frozenset([
+    # เสื้อผ้า / แฟชั่น
+    'เสื้อ', 'ยืด', 'เชิ้ต', 'โปโล', 'แจ็คเก็ต', 'ฮู้ด', 'กันหนาว', 'กางเกง', 'ขาสั้น', 'ขายาว',
+    'ยีนส์', 'กระโปรง', 'ชุด', 'เดรส', 'ชุดนอน', 'ชุดชั้นใน', 'ถุงเท้า', 'รองเท้า', 'ผ้าใบ',
+    'แตะ', 'ส้นสูง', 'บูท', 'กระเป๋า', 'สตางค์', 'เป้', 'สะพาย', 'หมวก', 'แว่นตา', 'กันแดด',
+    'นาฬิกา', 'สร้อย', 'แหวน', 'ต่างหู', 'กำไล', 'เข็มขัด', 'ผ้า', 'ฝ้าย', 'ไหม', 'หนัง',
+    'คอกลม', 'คอวี', 'แขนสั้น', 'แขนยาว', 'ผู้ชาย', 'ผู้หญิง', 'เด็ก', 'ผู้ใหญ่', 'แฟชั่น',
+    # อิเล็กทรอนิกส์
+    'มือถือ', 'โทรศัพท์', 'สมาร์ทโฟน', 'แท็บเล็ต', 'คอมพิวเตอร์', 'โน้ตบุ๊ค', 'จอ', 'หน้าจอ',
+    'คีย์บอร์ด', 'เมาส์', 'หูฟัง', 'ลำโพง', 'ไมค์', 'กล้อง', 'เลนส์', 'ที่ชาร์จ', 'สายชาร์จ',
+    'แบตเตอรี่', 'พาวเวอร์แบงค์', 'เคส', 'ฟิล์ม', 'กระจก', 'ไร้สาย', 'บลูทูธ', 'อิเล็กทรอนิกส์',
+    'ทีวี', 'โทรทัศน์', 'วิทยุ', 'เครื่อง', 'เกม', 'จอย', 'ปลั๊ก', 'สาย', 'ไฟ', 'หลอดไฟ',
+    # เครื่องใช้ไฟฟ้า / ของใช้ในบ้าน
+    'ตู้เย็น', 'พัดลม', 'แอร์', 'เครื่องซักผ้า', 'ไมโครเวฟ', 'เตา', 'หม้อ', 'หุงข้าว', 'กระทะ',
+    'ไฟฟ้า', 'กาต้มน้ำ', 'เครื่องปั่น', 'ดูดฝุ่น', 'เตารีด', 'โต๊ะ', 'เก้าอี้', 'โซฟา', 'เตียง',
+    'ที่นอน', 'หมอน', 'ผ้าห่ม', 'ผ้าปู', 'ตู้', 'ชั้นวาง', 'ชั้น', 'ของ', 'บ้าน', 'ครัว', 'จาน',
+    'ชาม', 'แก้ว', 'ช้อน', 'ส้อม', 'มีด', 'ขวด', 'กล่อง', 'ถัง', 'ตะกร้า', 'ผ้าม่าน', 'พรม',
+    'ห้องน้ำ', 'ห้องนอน', 'สวน', 'ต้นไม้', 'กระถาง', 'เฟอร์นิเจอร์', 'ตกแต่ง', 'อุปกรณ์',
+    # ความงาม / สุขภาพ
+    'ครีม', 'โลชั่น', 'เซรั่ม', 'สบู่', 'แชมพู', 'ครีมนวด', 'ยาสีฟัน', 'แปรง', 'ลิปสติก', 'แป้ง',
+    'น้ำหอม', 'มาส์ก', 'หน้ากาก', 'อนามัย', 'วิตามิน', 'อาหารเสริม', 'ผิว', 'ผม', 'หน้า', 'เล็บ',
+    'เครื่องสำอาง', 'สุขภาพ', 'ความงาม',
+    # อาหาร / เครื่องดื่ม
+    'อาหาร', 'ขนม', 'เครื่องดื่ม', 'กาแฟ', 'ชา', 'นม', 'น้ำ', 'น้ำผึ้ง', 'ข้าว', 'ข้าวสาร', 'เส้น',
+    'บะหมี่', 'ซอส', 'น้ำปลา', 'น้ำตาล', 'เกลือ', 'พริก', 'ผลไม้', 'ผัก', 'เนื้อ', 'หมู', 'ไก่',
+    'ปลา', 'กุ้ง', 'สด', 'แห้ง', 'กรอบ', 'ทอด', 'อบ',
+    # แม่และเด็ก / สัตว์เลี้ยง / กีฬา
+    'ผ้าอ้อม', 'ขวดนม', 'ของเล่น', 'ตุ๊กตา', 'รถเข็น', 'สัตว์เลี้ยง', 'สุนัข', 'แมว', 'ทราย',
+    'กีฬา', 'ฟุตบอล', 'ลูกบอล', 'จักรยาน', 'โยคะ', 'ดัมเบล', 'เต็นท์', 'ตกปลา',
+    # ยานยนต์ / เครื่องมือ
+    'รถ', 'รถยนต์', 'มอเตอร์ไซค์', 'ยาง', 'น้ำมัน', 'เครื่องมือ', 'สว่าน', 'ไขควง', 'ค้อน', 'ประแจ',
+    'ตะปู', 'สี', 'กาว', 'เทป',
+    # หนังสือ / เครื่องเขียน
+    'หนังสือ', 'สมุด', 'ปากกา', 'ดินสอ', 'ยางลบ', 'กระดาษ', 'เครื่องเขียน', 'การ์ด',
+    # คำขยายที่พบบ่อยในชื่อสินค้า
+    'ใหม่', 'มือสอง', 'แท้', 'ของแท้', 'ราคา', 'ถูก', 'ลด', 'ลดราคา', 'โปรโมชั่น', 'ส่งฟรี',
+    'พร้อมส่ง', 'ขนาด', 'ใหญ่', 'เล็ก', 'กลาง', 'สั้น', 'ยาว', 'สีดำ', 'สีขาว', 'สีแดง', 'สีฟ้า',
+    'สีน้ำเงิน', 'สีเขียว', 'สีเหลือง', 'สีชมพู', 'สีเทา', 'สีน้ำตาล', 'ดำ', 'ขาว', 'แดง', 'ฟ้า',
+    'เขียว', 'เหลือง', 'ชมพู', 'เทา', 'ชิ้น', 'คู่', 'แพ็ค', 'ถุง', 'อัน',
+    'กันน้ำ', 'พกพา', 'อัตโนมัติ', 'ดิจิตอล', 'พลาสติก', 'เหล็ก', 'ไม้', 'สแตนเลส',
+    'สำหรับ', 'และ', 'กับ', 'แบบ', 'รุ่น', 'ยี่ห้อ', 'คุณภาพ', 'ดี', 'สวย', 'น่ารัก', 'นุ่ม',
+])
@@ -0,0 +1,197 @@
+"""
+===========================================
+Products App - View Counter Buffer
+===========================================
+นับยอดเข้าชมสินค้าแบบ write-behind:
+หน้า detail แค่บวกตัวนับใน buffer (memory หรือ Redis) แล้ว Celery task
+flush_product_views จะรวมยอดต่อสินค้าและเขียนลงฐานข้อมูลเป็นชุดด้วย F()
+
+ตั้งค่าใน settings.PRODUCT_VIEW_BUFFER:
+    BACKEND         'memory' (ต่อ process) หรือ 'redis' (ใช้ร่วมกันทุก worker)
+    FLUSH_INTERVAL  วินาที ระหว่างการ flush อัตโนมัติของ memory backend
+    DEDUP_WINDOW    วินาที ที่ client เดิมดูสินค้าเดิมซ้ำแล้วไม่นับเพิ่ม (0 = ปิด)
+
+memory backend: แต่ละ process มี thread เบื้องหลัง flush ทุก FLUSH_INTERVAL วินาที (และตอนปิด process)
+Celery task มองไม่เห็น buffer ของ gunicorn worker จึงไม่ทำอะไร ถ้า process ถูก kill ยอดที่ยังไม่ flush
+(ไม่เกิน FLUSH_INTERVAL วินาที) จะหายไป ใช้ 'redis' + Celery beat ใน production
+request ไม่เคยเขียนฐานข้อมูลเอง flush ที่ล้มเหลวจะ log และคืนยอดเข้า buffer ไว้ลองรอบถัดไป
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryViewBuffer:
+    """buffer ในหน่วยความจำของ process (เหมาะกับ dev หรือ server ที่มี worker เดียว)"""
+
+    def __init__(self, flush_interval=10, dedup_window=0):
+        self.flush_interval = flush_interval
+        self.dedup_window = dedup_window
+        self._lock = threading.Lock()
+        self._deltas = Counter()
+        self._seen = {}
+        self._flusher_pid = None
+
+    def record(self, product_id, client_key=None):
+        """บวกยอดวิว 1 ครั้ง คืนค่า False ถ้าถูกกรองออกเพราะดูซ้ำใน dedup window"""
+        now = time.monotonic()
+        with self._lock:
+            if self.dedup_window and client_key:
+                key = (product_id, client_key)
+                if self._seen.get(key, 0) > now:
+                    return False
+                self._seen[key] = now + self.dedup_window
+                if len(self._seen) > 10000:
+                    self._seen = {k: v for k, v in self._seen.items() if v > now}
+
+            self._deltas[product_id] += 1
+            if self._flusher_pid != os.getpid():
+                # เริ่ม thread ใน process ที่รับ request จริง (หลัง gunicorn fork)
+                self._flusher_pid = os.getpid()
+                self._start_flusher()
+        return True
+
+    def _start_flusher(self):
+        threading.Thread(target=self._flush_loop, name='product-view-flusher', daemon=True).start()
+        atexit.register(self._flush_pending)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self._flush_pending()
+
+    def _flush_pending(self):
+        if not self._deltas:
+            return
+        try:
+            flush_view_counts(self)
+        finally:
+            # connection ของ thread นี้ไม่ได้ถูกจัดการโดย request cycle
+            connection.close()
+
+    def pending(self, product_id):
+        with self._lock:
+            return self._deltas.get(product_id, 0)
+
+    def drain(self):
+        """ดึงยอดที่ค้างอยู่ทั้งหมดออกมาและล้าง buffer"""
+        with self._lock:
+            deltas, self._deltas = self._deltas, Counter()
+        return dict(deltas)
+
+    def restore(self, deltas):
+        """คืนยอดกลับเข้า buffer (กรณี flush ลงฐานข้อมูลไม่สำเร็จ)"""
+        with self._lock:
+            self._deltas.update(deltas)
+
+
+class RedisViewBuffer:
+    """buffer ใน Redis hash ใช้ร่วมกันทุก gunicorn worker และ Celery"""
+
+    key = 'product_views:pending'
+    seen_key = 'product_views:seen:{product_id}:{client}'
+
+    def __init__(self, url, dedup_window=0):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.dedup_window = dedup_window
+        self.response_error = redis.exceptions.ResponseError
+
+    def record(self, product_id, client_key=None):
+        if self.dedup_window and client_key:
+            seen_key = self.seen_key.format(product_id=product_id, client=client_key)
+            if not self.client.set(seen_key, 1, nx=True, ex=self.dedup_window):
+                return False
+        self.client.hincrby(self.key, product_id, 1)
+        return True
+
+    def pending(self, product_id):
+        return int(self.client.hget(self.key, product_id) or 0)
+
+    def drain(self):
+        # RENAME เป็น atomic: view ที่เข้ามาระหว่าง flush จะไปอยู่ใน hash ใหม่
+        processing_key = f'{self.key}:flushing:{uuid.uuid4().hex}'
+        try:
+            self.client.rename(self.key, processing_key)
+        except self.response_error:
+            # ไม่มี key = ไม่มียอดค้าง
+            return {}
+        data = self.client.hgetall(processing_key)
+        self.client.delete(processing_key)
+        return {int(product_id): int(delta) for product_id, delta in data.items()}
+
+    def restore(self, deltas):
+        pipe = self.client.pipeline()
+        for product_id, delta in deltas.items():
+            pipe.hincrby(self.key, product_id, delta)
+        pipe.execute()
+
+
+@lru_cache(maxsize=None)
+def get_view_buffer():
+    config = getattr(settings, 'PRODUCT_VIEW_BUFFER', {})
+    dedup_window = config.get('DEDUP_WINDOW', 0)
+    if config.get('BACKEND', 'memory') == 'redis':
+        return RedisViewBuffer(settings.REDIS_URL, dedup_window=dedup_window)
+    return MemoryViewBuffer(
+        flush_interval=config.get('FLUSH_INTERVAL', 10),
+        dedup_window=dedup_window,
+    )
+
+
+def get_client_key(request):
+    """ระบุตัว client สำหรับ dedup: user id หรือ IP"""
+    if request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded:
+        return f'ip{forwarded.split(",")[0].strip()}'
+    return f'ip{request.META.get("REMOTE_ADDR", "")}'
+
+
+def record_product_view(product_id, request=None):
+    """บันทึกยอดวิวลง buffer (ไม่แตะฐานข้อมูล)"""
+    buffer = get_view_buffer()
+    client_key = get_client_key(request) if request is not None and buffer.dedup_window else None
+    return buffer.record(product_id, client_key)
+
+
+def flush_view_counts(buffer=None):
+    """
+    เขียนยอดวิวที่ค้างอยู่ลงฐานข้อมูล คืนค่าจำนวนวิวที่เขียน
+    สินค้าที่มียอดเพิ่มเท่ากันจะถูกรวมเป็น UPDATE เดียว (WHERE id IN (...))
+    ถ้าฐานข้อมูลมีปัญหา: log แล้วคืนยอดเข้า buffer (ไม่ raise) คืนค่า 0
+    """
+    from .models import Product
+
+    buffer = buffer or get_view_buffer()
+    deltas = buffer.drain()
+    if not deltas:
+        return 0
+
+    by_delta = defaultdict(list)
+    for product_id, delta in deltas.items():
+        by_delta[delta].append(product_id)
+
+    try:
+        with transaction.atomic():
+            for delta, product_ids in by_delta.items():
+                Product.objects.filter(pk__in=product_ids).update(views_count=F('views_count') + delta)
+    except DatabaseError:
+        logger.exception('Failed to flush product view counts, restoring buffer')
+        buffer.restore(deltas)
+        return 0
+
+    return sum(deltas.values())
@@ -3,15 +3,34 @@
 Products App - Views
 ===========================================
 """
+import uuid
+
+from celery.result import AsyncResult
+from django.core.files.storage import default_storage
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework.parsers import FormParser, MultiPartParser, JSONParser
 from rest_framework.response import Response
 
+from .cache import cached_response, get_cache_stats
+from .facets import compute_facets, parse_facets
 from .filters import ProductFilter
+from .importer import (
+    FORMATS,
+    detect_format,
+    get_import_settings,
+    get_task_owner,
+    import_products,
+    remember_task_owner,
+)
 from .models import Category, Product, ProductImage
+from .pagination import ProductCursorPagination, wants_cursor_pagination
+from .search import ProductSearchFilter
+from .suggest import get_suggestions
+from .tasks import import_products_file
+from .view_counter import record_product_view
 from .serializers import (
     CategorySerializer,
     ProductCreateSerializer,
@@ -44,7 +63,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
     - list: GET /api/products/categories/
     - retrieve: GET /api/products/categories/{id}/
     """
-    queryset = Category.objects.filter(is_active=True)
+    queryset = Category.objects.filter(is_active=True).with_product_count()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
@@ -53,25 +72,40 @@ class CategoryViewSet(viewsets.ModelViewSet):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
+    
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request, 'categories', ['categories'],
+            lambda: super(CategoryViewSet, self).list(request, *args, **kwargs),
+        )
 
 
 class ProductViewSet(viewsets.ModelViewSet):
     """
     API สำหรับจัดการสินค้า
-    - list: GET /api/products/
+    - list: GET /api/products/ (ใส่ ?pagination=cursor เพื่อใช้ cursor pagination)
+    - search: GET /api/products/?search=คำค้น (เรียงตามความเกี่ยวข้อง)
+    - facets: GET /api/products/?facets=category,price,in_stock,seller (จำนวนสินค้าแต่ละตัวกรอง)
     - retrieve: GET /api/products/{id}/
     - create: POST /api/products/
     - update: PUT /api/products/{id}/
     - destroy: DELETE /api/products/{id}/
+    - import: POST /api/products/import/ (นำเข้าสินค้าจากไฟล์ CSV / JSONL)
     """
     queryset = Product.objects.filter(is_active=True).select_related('category', 'seller')
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    # ProductSearchFilter ต้องอยู่หลัง OrderingFilter เพื่อเรียงตามความเกี่ยวข้อง
+    filter_backends = [DjangoFilterBackend, OrderingFilter, ProductSearchFilter]
     filterset_class = ProductFilter
-    search_fields = ['name', 'description']
-    ordering_fields = ['price', 'created_at', 'views_count']
+    ordering_fields = ['price', 'created_at', 'views_count', 'rating_average', 'rating_count']
     ordering = ['-created_at']
     parser_classes = [JSONParser, MultiPartParser, FormParser]
     
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.action == 'list' and wants_cursor_pagination(self.request):
+            self._paginator = ProductCursorPagination()
+        return super().paginator
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return ProductListSerializer
@@ -82,10 +116,12 @@ class ProductViewSet(viewsets.ModelViewSet):
         return ProductDetailSerializer
     
     def get_permissions(self):
-        if self.action == 'create':
+        if self.action in ['create', 'bulk_import', 'bulk_import_status']:
             return [IsSeller()]
         if self.action in ['update', 'partial_update', 'destroy']:
             return [IsSeller(), IsOwnerOrReadOnly()]
+        if self.action == 'cache_stats':
+            return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
     
     def get_queryset(self):
@@ -93,20 +129,133 @@ class ProductViewSet(viewsets.ModelViewSet):
         
         # ถ้าเป็น seller และดู products ของตัวเอง
         if self.request.query_params.get('my_products') and self.request.user.is_authenticated:
-            queryset = Product.objects.filter(seller=self.request.user)
+            queryset = Product.objects.filter(seller=self.request.user).select_related('category', 'seller')
         
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        # รายการสินค้าของ seller เอง (my_products) ขึ้นกับผู้ใช้ จึงไม่ใช้ cache
+        if request.query_params.get('my_products'):
+            return self.list_uncached(request)
+        return cached_response(request, 'products', ['products'], lambda: self.list_uncached(request))
+    
+    def list_uncached(self, request):
+        facets = parse_facets(request.query_params.get('facets'))
+        queryset = self.filter_queryset(self.get_queryset())
+        
+        ranking = getattr(self, 'search_ranking', None)
+        if ranking is not None and not wants_cursor_pagination(request):
+            page = self.ranked_page(queryset, ranking)
+        else:
+            page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        else:
+            response = Response(self.get_serializer(queryset, many=True).data)
+        
+        # facet แนบไปกับ response แบบแบ่งหน้า (ทั้ง page number และ cursor)
+        if facets and isinstance(response.data, dict):
+            response.data['facets'] = compute_facets(queryset, facets)
+        return response
+    
+    def ranked_page(self, queryset, ranking):
+        """
+        แบ่งหน้าผลค้นหาตามคะแนน: ดึงแค่ id ที่ผ่านตัวกรองอื่น แบ่งหน้าบน list ของ id
+        แล้วโหลดเฉพาะสินค้าในหน้านั้น
+        """
+        matched = set(queryset.order_by().values_list('pk', flat=True))
+        ordered_ids = [product_id for product_id in ranking if product_id in matched]
+        
+        page_ids = self.paginate_queryset(ordered_ids)
+        if page_ids is None:
+            page_ids = ordered_ids
+        products = queryset.in_bulk(page_ids)
+        return [products[product_id] for product_id in page_ids]
+    
     def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not str(lookup).isdigit() or request.query_params.get('my_products'):
+            return self.retrieve_uncached(request)
+        
+        product_id = int(lookup)
+        response = cached_response(
+            request, 'product', [f'product:{product_id}', 'categories'],
+            lambda: self.retrieve_uncached(request),
+        )
+        if response.get('X-Cache') == 'HIT':
+            record_product_view(product_id, request)
+        return response
+    
+    def retrieve_uncached(self, request):
         instance = self.get_object()
         
-        # เพิ่ม view count
-        instance.views_count += 1
-        instance.save(update_fields=['views_count'])
+        # เพิ่ม view count ผ่าน buffer (flush ลงฐานข้อมูลเป็นชุดโดย Celery)
+        record_product_view(instance.pk, request)
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def bulk_import(self, request):
+        """
+        นำเข้าสินค้าจากไฟล์ (field: file, format = csv / jsonl)
+        ไฟล์เล็กนำเข้าทันทีและตอบผลสรุป ไฟล์ใหญ่ส่งให้ Celery แล้วตอบ 202 พร้อม task_id
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'กรุณาแนบไฟล์'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        file_format = request.data.get('format') or detect_format(upload.name)
+        if file_format not in FORMATS:
+            return Response(
+                {'error': f'รองรับเฉพาะไฟล์ {", ".join(FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if upload.size > get_import_settings()['ASYNC_THRESHOLD']:
+            path = default_storage.save(f'imports/{uuid.uuid4().hex}.{file_format}', upload)
+            task = import_products_file.delay(path, request.user.pk, file_format)
+            remember_task_owner(task.id, request.user.pk)
+            return Response({'task_id': task.id, 'status': 'PENDING'}, status=status.HTTP_202_ACCEPTED)
+        
+        result = import_products(upload, request.user, file_format)
+        return Response(result)
+    
+    @action(detail=False, methods=['get'], url_path=r'import/(?P<task_id>[\w-]+)')
+    def bulk_import_status(self, request, task_id=None):
+        """สถานะการนำเข้าที่ทำผ่าน Celery (เฉพาะงานของผู้ใช้เอง)"""
+        if get_task_owner(task_id) != request.user.pk:
+            return Response({'error': 'ไม่พบงานนำเข้านี้'}, status=status.HTTP_404_NOT_FOUND)
+        
+        task = AsyncResult(task_id)
+        data = {'task_id': task_id, 'status': task.status}
+        if task.successful():
+            data['result'] = task.result
+        elif task.failed():
+            data['error'] = str(task.result)
+        return Response(data)
+    
+    @action(detail=False, methods=['get'], url_path='cache-stats', pagination_class=None, filter_backends=[])
+    def cache_stats(self, request):
+        """สถิติ hit / miss ของ catalog cache (admin)"""
+        return Response(get_cache_stats())
+    
+    @action(detail=False, methods=['get'], url_path='suggest', pagination_class=None, filter_backends=[])
+    def suggest(self, request):
+        """
+        คำแนะนำขณะพิมพ์ (ตอบจาก index ในหน่วยความจำ ไม่ query ฐานข้อมูล)
+        GET /api/products/suggest/?q=เสื้&limit=8&type=product,category,shop
+        """
+        try:
+            limit = int(request.query_params.get('limit', 0))
+        except ValueError:
+            limit = 0
+        types = request.query_params.get('type')
+        types = {t.strip() for t in types.split(',') if t.strip()} if types else None
+
+        results = get_suggestions(request.query_params.get('q', ''), limit=max(limit, 0), types=types)
+        return Response(results)
+    
     @action(detail=False, methods=['get'], url_path='my-products')
     def my_products(self, request):
         """ดึงสินค้าของ seller ปัจจุบัน"""
@@ -116,7 +265,7 @@ class ProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        queryset = Product.objects.filter(seller=request.user)
+        queryset = Product.objects.filter(seller=request.user).select_related('category', 'seller')
         serializer = ProductListSerializer(queryset, many=True, context={'request': request})
         return Response(serializer.data)
 
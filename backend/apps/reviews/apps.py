@@ -0,0 +1,15 @@
+"""
+===========================================
+Reviews App Config
+===========================================
+"""
+from django.apps import AppConfig
+
+
+class ReviewsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.reviews'
+    verbose_name = 'รีวิว'
+
+    def ready(self):
+        from . import signals  # noqa: F401
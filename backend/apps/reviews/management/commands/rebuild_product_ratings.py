@@ -0,0 +1,55 @@
+"""
+===========================================
+Rebuild Product Ratings Command
+===========================================
+คำนวณคะแนนรีวิวที่เก็บไว้บน Product ใหม่ทั้งหมดจากตาราง Review
+(ใช้เมื่อข้อมูลไม่ตรงกัน เช่น หลัง import ข้อมูลหรือแก้ไขผ่าน SQL โดยตรง)
+
+การใช้งาน:
+    python manage.py rebuild_product_ratings
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from apps.products.models import Product
+from apps.reviews.models import Review
+
+RATING_FIELDS = [
+    'rating_sum', 'rating_count', 'rating_average',
+    'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+]
+
+
+class Command(BaseCommand):
+    help = 'คำนวณคะแนนรีวิวของสินค้าใหม่ทั้งหมด'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        stats = Review.objects.values('product_id').annotate(
+            total=Sum('rating'),
+            count=Count('id'),
+            **{f'star_{star}': Count('id', filter=Q(rating=star)) for star in range(1, 6)}
+        )
+
+        # รีเซ็ตทุกสินค้าก่อน แล้วค่อยใส่ค่าให้สินค้าที่มีรีวิว
+        Product.objects.update(**{field: 0 for field in RATING_FIELDS})
+
+        products = []
+        for row in stats.order_by('product_id'):
+            product = Product(pk=row['product_id'])
+            product.rating_sum = row['total']
+            product.rating_count = row['count']
+            product.rating_average = row['total'] / row['count']
+            for star in range(1, 6):
+                setattr(product, f'rating_{star}_count', row[f'star_{star}'])
+            products.append(product)
+
+        Product.objects.bulk_update(products, RATING_FIELDS, batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ อัพเดทคะแนนสินค้า {len(products)} รายการ'))
@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+
+
+def backfill_product_ratings(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    Review = apps.get_model("reviews", "Review")
+
+    stats = Review.objects.values("product_id").annotate(
+        total=Sum("rating"),
+        count=Count("id"),
+        **{f"star_{star}": Count("id", filter=Q(rating=star)) for star in range(1, 6)},
+    )
+    for row in stats:
+        Product.objects.filter(pk=row["product_id"]).update(
+            rating_sum=row["total"],
+            rating_count=row["count"],
+            rating_average=row["total"] / row["count"],
+            **{f"rating_{star}_count": row[f"star_{star}"] for star in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0003_product_rating_aggregates"),
+        ("reviews", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_product_ratings, migrations.RunPython.noop),
+    ]
@@ -5,7 +5,7 @@ Reviews App - Models
 """
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
 
 from apps.products.models import Product
 
@@ -40,4 +40,9 @@ class Review(models.Model):
         unique_together = ['product', 'user']  # 1 user รีวิวได้ 1 ครั้งต่อสินค้า
     
     def __str__(self):
-        return f"Review by {self.user.email} - {self.product.name}"
\ No newline at end of file
+        return f"Review by {self.user.email} - {self.product.name}"
+    
+    def save(self, *args, **kwargs):
+        # ให้ signal ที่อัพเดทคะแนนสินค้าอยู่ใน transaction เดียวกับการบันทึกรีวิว
+        with transaction.atomic():
+            super().save(*args, **kwargs)
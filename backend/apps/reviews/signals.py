@@ -0,0 +1,87 @@
+"""
+===========================================
+Reviews App - Signals
+===========================================
+อัพเดทคะแนนรีวิวที่เก็บไว้บน Product แบบ incremental
+(rating_sum / rating_count / rating_average / rating_N_count)
+"""
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.products.cache import bump_products
+from apps.products.models import Product
+
+from .models import Review
+
+
+def update_product_rating(product_id, sum_delta, count_delta, histogram_delta):
+    """
+    ปรับคะแนนของสินค้าด้วย UPDATE เดียว (ใช้ F() เพื่อไม่ให้เกิด race condition)
+    histogram_delta: dict {คะแนน: จำนวนที่เปลี่ยน}
+    """
+    new_sum = F('rating_sum') + sum_delta
+    new_count = F('rating_count') + count_delta
+
+    updates = {
+        'rating_sum': new_sum,
+        'rating_count': new_count,
+        'rating_average': Case(
+            When(
+                rating_count__gt=-count_delta,
+                then=Cast(new_sum, FloatField()) / Cast(new_count, FloatField()),
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+    }
+    for star, delta in histogram_delta.items():
+        if delta:
+            field = f'rating_{star}_count'
+            updates[field] = F(field) + delta
+
+    Product.objects.filter(pk=product_id).update(**updates)
+    bump_products(product_id)
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    """เก็บคะแนนเดิมไว้ก่อนแก้ไข เพื่อคำนวณส่วนต่าง"""
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk)
+            .values('product_id', 'rating')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def apply_review_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+
+    if created or previous is None:
+        update_product_rating(instance.product_id, instance.rating, 1, {instance.rating: 1})
+        return
+
+    if previous['product_id'] != instance.product_id:
+        # ย้ายรีวิวไปสินค้าอื่น: หักออกจากสินค้าเดิมแล้วเพิ่มให้สินค้าใหม่
+        update_product_rating(
+            previous['product_id'], -previous['rating'], -1, {previous['rating']: -1}
+        )
+        update_product_rating(instance.product_id, instance.rating, 1, {instance.rating: 1})
+        return
+
+    if previous['rating'] != instance.rating:
+        update_product_rating(
+            instance.product_id,
+            instance.rating - previous['rating'],
+            0,
+            {previous['rating']: -1, instance.rating: 1},
+        )
+
+
+@receiver(post_delete, sender=Review)
+def apply_review_deleted(sender, instance, **kwargs):
+    update_product_rating(instance.product_id, -instance.rating, -1, {instance.rating: -1})
@@ -0,0 +1,127 @@
+"""
+===========================================
+Reviews App - Tests
+===========================================
+"""
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.products.models import Category, Product
+
+from .models import Review
+
+User = get_user_model()
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def seller_user():
+    return User.objects.create_user(
+        email='seller@example.com',
+        username='seller',
+        password='sellerpass123',
+        role='seller',
+        shop_name='Test Shop'
+    )
+
+
+@pytest.fixture
+def buyers():
+    return [
+        User.objects.create_user(
+            email=f'buyer{i}@example.com',
+            username=f'buyer{i}',
+            password='buyerpass123',
+            role='buyer'
+        )
+        for i in range(3)
+    ]
+
+
+@pytest.fixture
+def product(seller_user):
+    category = Category.objects.create(name='Test', slug='test')
+    return Product.objects.create(
+        seller=seller_user,
+        category=category,
+        name='Test Product',
+        slug='test-product',
+        price=100,
+        stock=10
+    )
+
+
+@pytest.mark.django_db
+class TestProductRatingAggregates:
+    """ทดสอบคะแนนรีวิวที่เก็บไว้บน Product"""
+    
+    def test_create_review_updates_product(self, api_client, buyers, product):
+        """ทดสอบสร้างรีวิวผ่าน API แล้วคะแนนสินค้าอัพเดท"""
+        api_client.force_authenticate(user=buyers[0])
+        response = api_client.post(reverse('review-list'), {
+            'product_id': product.id,
+            'rating': 4,
+            'comment': 'ดี'
+        })
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        product.refresh_from_db()
+        assert product.review_count == 1
+        assert product.average_rating == 4
+        assert product.rating_histogram == {1: 0, 2: 0, 3: 0, 4: 1, 5: 0}
+    
+    def test_update_and_delete_review(self, buyers, product):
+        """ทดสอบแก้ไขและลบรีวิว"""
+        first = Review.objects.create(product=product, user=buyers[0], rating=5, comment='a')
+        Review.objects.create(product=product, user=buyers[1], rating=2, comment='b')
+        
+        first.rating = 3
+        first.save()
+        product.refresh_from_db()
+        assert product.rating_sum == 5
+        assert product.rating_average == 2.5
+        assert product.rating_5_count == 0
+        assert product.rating_3_count == 1
+        
+        first.delete()
+        product.refresh_from_db()
+        assert product.review_count == 1
+        assert product.average_rating == 2
+        
+        Review.objects.filter(product=product).delete()
+        product.refresh_from_db()
+        assert product.review_count == 0
+        assert product.average_rating == 0
+    
+    def test_rebuild_command(self, buyers, product):
+        """ทดสอบคำสั่ง rebuild_product_ratings"""
+        for buyer, rating in zip(buyers, [5, 4, 4]):
+            Review.objects.create(product=product, user=buyer, rating=rating, comment='x')
+        Product.objects.filter(pk=product.pk).update(rating_sum=0, rating_count=0, rating_average=0)
+        
+        call_command('rebuild_product_ratings', stdout=StringIO())
+        
+        product.refresh_from_db()
+        assert product.rating_count == 3
+        assert product.rating_sum == 13
+        assert product.rating_4_count == 2
+    
+    def test_list_does_not_query_reviews(self, api_client, buyers, product, django_assert_max_num_queries):
+        """ทดสอบว่า list สินค้าไม่ query ตาราง review"""
+        Review.objects.create(product=product, user=buyers[0], rating=5, comment='x')
+        
+        with django_assert_max_num_queries(6) as captured:
+            response = api_client.get(reverse('product-list'))
+        
+        assert response.data['results'][0]['average_rating'] == 5
+        assert not any('reviews_review' in q['sql'] for q in captured.captured_queries)
@@ -16,12 +16,13 @@ django_asgi_app = get_asgi_application()
 
 # Import after Django setup
 from chat.routing import websocket_urlpatterns
+from apps.orders.routing import websocket_urlpatterns as order_websocket_urlpatterns  # noqa: E402
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AllowedHostsOriginValidator(
         AuthMiddlewareStack(
-            URLRouter(websocket_urlpatterns)
+            URLRouter(websocket_urlpatterns + order_websocket_urlpatterns)
         )
     ),
 })
\ No newline at end of file
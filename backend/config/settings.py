@@ -7,6 +7,8 @@ import os
 from datetime import timedelta
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -189,6 +191,138 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 12,
 }
 
+# ===========================================
+# Cache
+# ===========================================
+# ใช้ Redis ถ้าตั้ง REDIS_URL ไว้ (ใช้ร่วมกันทุก worker) ไม่งั้นใช้ memory ของ process
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# cache response ของแคตตาล็อก (ดู apps/products/cache.py)
+CATALOG_CACHE = {
+    'ENABLED': os.environ.get('CATALOG_CACHE_ENABLED', 'True').lower() in ('true', '1', 'yes'),
+    'TIMEOUT': int(os.environ.get('CATALOG_CACHE_TIMEOUT', 60)),
+    'LOCK_TIMEOUT': 10,
+    'WAIT_TIMEOUT': 2,
+    'CATEGORY_TIMEOUT': 3600,
+}
+
+# ===========================================
+# Product Search (in-memory index, ดู apps/products/search.py)
+# ===========================================
+PRODUCT_SEARCH = {
+    # จำนวนผลค้นหาสูงสุดต่อคำค้น (อันดับที่เกินจากนี้ไม่แสดงในทุกหน้า)
+    'MAX_RESULTS': 1000,
+    'SYNC_INTERVAL': int(os.environ.get('PRODUCT_SEARCH_SYNC_INTERVAL', 30)),
+    'DESCRIPTION_CHARS': 300,
+    'DICTIONARY_PATH': os.environ.get('PRODUCT_SEARCH_DICTIONARY_PATH') or None,
+    'BACKGROUND_BUILD': True,
+}
+
+# ===========================================
+# Product Facets (ดู apps/products/facets.py)
+# ===========================================
+PRODUCT_FACETS = {
+    # ขอบล่างของช่วงราคา (บาท) ช่วงสุดท้ายไม่มีขอบบน
+    'PRICE_BUCKETS': [0, 100, 500, 1000, 5000, 10000],
+}
+
+# ===========================================
+# Product Import (ดู apps/products/importer.py)
+# ===========================================
+PRODUCT_IMPORT = {
+    'CHUNK_SIZE': 500,
+    # ไฟล์ที่ใหญ่กว่านี้ (bytes) จะนำเข้าผ่าน Celery
+    'ASYNC_THRESHOLD': int(os.environ.get('PRODUCT_IMPORT_ASYNC_THRESHOLD', 1024 * 1024)),
+    'MAX_IMAGES': 10,
+    # วินาทีที่จำเจ้าของงานนำเข้า (ดูสถานะได้เฉพาะผู้ส่งงาน)
+    'TASK_OWNER_TTL': 24 * 60 * 60,
+}
+
+# ===========================================
+# Product Suggest (typeahead, ดู apps/products/suggest.py)
+# ===========================================
+PRODUCT_SUGGEST = {
+    'LIMIT': 8,
+    'MAX_LIMIT': 20,
+    'SALES_WEIGHT': 10,  # ขาย 1 ชิ้น = น้ำหนักเท่ากับ 10 views
+    'REFRESH_INTERVAL': int(os.environ.get('PRODUCT_SUGGEST_REFRESH_INTERVAL', 600)),
+    'BACKGROUND_BUILD': True,
+}
+
+# ===========================================
+# Stock Reservation (flash sale, ดู apps/orders/reservations.py)
+# ===========================================
+STOCK_RESERVATION = {
+    'TTL': int(os.environ.get('STOCK_RESERVATION_TTL', 600)),  # วินาทีที่จองไว้ระหว่าง checkout
+    'PAYMENT_TTL': int(os.environ.get('STOCK_RESERVATION_PAYMENT_TTL', 1800)),  # รอชำระเงินหลังสร้าง Order
+    # 'memory' = ต่อ process, 'redis' = ตัวนับร่วมกันทุก worker
+    'GATE_BACKEND': os.environ.get('STOCK_GATE_BACKEND', 'memory'),
+    'GATE_TTL': 30,
+    'SWEEP_BATCH': 500,
+}
+
+# ===========================================
+# Checkout Queue (sale_mode, ดู apps/orders/checkout_queue.py)
+# ===========================================
+CHECKOUT_QUEUE = {
+    'ENABLED': os.environ.get('CHECKOUT_QUEUE_ENABLED', 'True').lower() in ('true', '1', 'yes'),
+    'BATCH_SIZE': 50,
+    'LOCK_TIMEOUT': 60,
+    'STALE_AFTER': 10,
+}
+
+# ===========================================
+# Idempotency-Key (checkout / ชำระเงิน, ดู apps/orders/idempotency.py)
+# ===========================================
+IDEMPOTENCY = {
+    'TTL': 24 * 60 * 60,
+    'LOCK_TIMEOUT': 60,
+    'WAIT_TIMEOUT': 30,
+}
+
+# ===========================================
+# Invoice PDF (ดู apps/orders/pdf_generator.py)
+# ===========================================
+ORDER_PDF = {
+    # ต้องอยู่ใน volume ที่ api กับ invoice worker ใช้ร่วมกัน (None = ไม่ cache และปิดโหมด async)
+    'CACHE_DIR': os.environ.get('ORDER_PDF_CACHE_DIR', str(BASE_DIR / 'media' / 'invoices')),
+    'FONT_PATH': os.environ.get('ORDER_PDF_FONT_PATH') or None,
+    'BOLD_FONT_PATH': os.environ.get('ORDER_PDF_BOLD_FONT_PATH') or None,
+    'ASYNC': os.environ.get('ORDER_PDF_ASYNC', 'False').lower() in ('true', '1', 'yes'),
+    'PENDING_TTL': 60,
+}
+
+# ===========================================
+# Invoice export (ZIP หลายใบ, ดู apps/orders/invoice_export.py)
+# ===========================================
+INVOICE_EXPORT = {
+    'PROCESSES': int(os.environ.get('INVOICE_EXPORT_PROCESSES', 2)),
+    'SYNC_LIMIT': 20,
+    'MAX_ORDERS': 1000,
+    # invoice worker เขียนไฟล์ api อ่านไฟล์: ต้องอยู่ใน volume ที่ใช้ร่วมกัน (media_data ใน docker-compose)
+    'EXPORT_DIR': os.environ.get('INVOICE_EXPORT_DIR', str(BASE_DIR / 'media' / 'invoice_exports')),
+    'PROGRESS_EVERY': 10,
+}
+
+# ===========================================
+# Cart summary (badge ตะกร้า, ดู apps/cart/summary.py)
+# ===========================================
+CART_SUMMARY = {
+    'TIMEOUT': 60 * 60,
+}
+
 # ===========================================
 # JWT Settings
 # ===========================================
@@ -224,6 +358,7 @@ CORS_ALLOWED_ORIGINS = os.environ.get(
 ).split(',')
 
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 # ===========================================
 # Celery Settings
@@ -239,6 +374,38 @@ CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_RESULT_EXTENDED = True
 
+CELERY_BEAT_SCHEDULE = {
+    'flush-product-views': {
+        'task': 'apps.products.tasks.flush_product_views',
+        'schedule': 10.0,
+    },
+    'release-expired-reservations': {
+        'task': 'apps.orders.tasks.release_expired_reservations',
+        'schedule': 30.0,
+    },
+    'drain-checkout-queues': {
+        'task': 'apps.orders.tasks.drain_checkout_queues',
+        'schedule': 10.0,
+    },
+}
+
+# checkout ของสินค้า sale_mode ทำงานบน worker แยก: celery -A config worker -Q checkout
+CELERY_TASK_ROUTES = {
+    'apps.orders.tasks.process_checkout_queue': {'queue': 'checkout'},
+    'apps.orders.tasks.export_invoices': {'queue': 'invoices'},
+    'apps.orders.tasks.render_invoice_pdf': {'queue': 'invoices'},
+}
+
+# ===========================================
+# Product View Counter (write-behind buffer)
+# ===========================================
+PRODUCT_VIEW_BUFFER = {
+    # 'memory' = ต่อ process (flush เอง), 'redis' = ใช้ร่วมกันทุก worker แล้ว flush โดย Celery beat
+    'BACKEND': os.environ.get('PRODUCT_VIEW_BUFFER_BACKEND', 'memory'),
+    'FLUSH_INTERVAL': int(os.environ.get('PRODUCT_VIEW_FLUSH_INTERVAL', 10)),
+    'DEDUP_WINDOW': int(os.environ.get('PRODUCT_VIEW_DEDUP_WINDOW', 0)),
+}
+
 # ===========================================
 # Email Settings
 # ===========================================
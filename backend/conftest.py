@@ -0,0 +1,33 @@
+"""
+===========================================
+Pytest Configuration (shared fixtures)
+===========================================
+"""
+import pytest
+from django.core.cache import cache
+
+from apps.orders.reservations import get_stock_gate
+from apps.products.search import reset_search_index
+from apps.products.suggest import reset_suggest_index
+from apps.products.view_counter import get_view_buffer
+
+
+@pytest.fixture(autouse=True)
+def in_process_indexes(settings):
+    """ล้าง index และ cache ในหน่วยความจำระหว่างเทส และสร้าง index แบบ synchronous"""
+    settings.PRODUCT_SEARCH = {**settings.PRODUCT_SEARCH, 'BACKGROUND_BUILD': False}
+    settings.PRODUCT_SUGGEST = {**settings.PRODUCT_SUGGEST, 'BACKGROUND_BUILD': False}
+    # ยอดวิวค้างใน buffer ของแต่ละเทส (thread flush ไม่ตื่นระหว่างรันเทส)
+    settings.PRODUCT_VIEW_BUFFER = {**settings.PRODUCT_VIEW_BUFFER, 'BACKEND': 'memory', 'FLUSH_INTERVAL': 3600}
+    get_view_buffer.cache_clear()
+    reset_search_index()
+    reset_suggest_index()
+    get_stock_gate.cache_clear()
+    cache.clear()
+    yield
+    get_view_buffer().drain()
+    get_view_buffer.cache_clear()
+    reset_search_index()
+    reset_suggest_index()
+    get_stock_gate.cache_clear()
+    cache.clear()